@@ -364,10 +364,15 @@ class AutoKBUpdater:
         for i in range(0, len(devices_to_update), self.config.batch_size):
             batch_devices = devices_to_update[i:i + self.config.batch_size]
             
-            # バッチの並行処理
-            batch_results = await asyncio.gather(*[
-                self.update_single_device(device) for device in batch_devices
-            ], return_exceptions=True)
+            # バッチの並行処理（KBへの書き込みはバッチごとに1回のグループコミットにまとめる）
+            try:
+                with self.kb_updater.writer.batch():
+                    batch_results = await asyncio.gather(*[
+                        self.update_single_device(device) for device in batch_devices
+                    ], return_exceptions=True)
+            except Exception as e:
+                self.logger.error(f"Failed to commit batch updates: {e}")
+                continue
             
             # 結果の処理
             for result in batch_results:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# benchmark_metadata.py
+"""コンフィグのメタデータ抽出の性能比較
+
+従来の実装（1行ごとに8つの正規表現を試す）と、先頭語で振り分けて高々1つの
+パターンだけを適用する現在の実装（parse_config_metadata）を、合成した大きな
+コンフィグで比較する。現在の実装は、ツリーの解析を含む場合（cold）と、
+検証などで解析済みのツリーを共有する場合（warm）の両方を測る。
+
+    python examples/benchmark_metadata.py --sizes 10000 50000 100000 200000
+"""
+import gc
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from knowledge_updater import parse_config_metadata
+from src.config_parser import clear_config_tree_cache, iter_config_lines, parse_config_tree
+
+
+def legacy_parse_config_metadata(config_content: str) -> Dict[str, Any]:
+    """従来の実装（比較用、1行ごとに全パターンを試す）"""
+    metadata = {
+        'interfaces': [],
+        'ip_addresses': [],
+        'routing_protocols': [],
+        'vlans': [],
+        'access_lists': [],
+        'users': [],
+        'snmp_communities': [],
+        'ntp_servers': []
+    }
+
+    current_interface = None
+
+    for line in iter_config_lines(config_content):
+        line = line.strip()
+        if not line or line.startswith('!') or line.startswith('#'):
+            continue
+
+        interface_match = re.match(r'^interface\s+(\S+)', line, re.IGNORECASE)
+        if interface_match:
+            current_interface = interface_match.group(1)
+            metadata['interfaces'].append(current_interface)
+            continue
+
+        ip_match = re.search(r'ip address\s+(\d+\.\d+\.\d+\.\d+)\s+(\d+\.\d+\.\d+\.\d+)', line, re.IGNORECASE)
+        if ip_match:
+            metadata['ip_addresses'].append({
+                'interface': current_interface,
+                'ip': ip_match.group(1),
+                'subnet': ip_match.group(2)
+            })
+
+        if line.startswith('router '):
+            metadata['routing_protocols'].append(line.split()[1])
+
+        vlan_match = re.match(r'^vlan\s+(\d+)', line, re.IGNORECASE)
+        if vlan_match:
+            metadata['vlans'].append(vlan_match.group(1))
+
+        acl_match = re.search(r'ip access-list\s+(\w+)', line, re.IGNORECASE)
+        if acl_match:
+            metadata['access_lists'].append(acl_match.group(1))
+
+        user_match = re.match(r'^username\s+(\w+)\s+privilege\s+(\d+)', line, re.IGNORECASE)
+        if user_match:
+            metadata['users'].append({
+                'username': user_match.group(1),
+                'privilege': user_match.group(2)
+            })
+
+        snmp_match = re.search(r'snmp-server\s+community\s+"?([^"\s]+)"?', line, re.IGNORECASE)
+        if snmp_match:
+            metadata['snmp_communities'].append(snmp_match.group(1))
+
+        ntp_match = re.search(r'ntp server\s+(\d+\.\d+\.\d+\.\d+)', line, re.IGNORECASE)
+        if ntp_match:
+            metadata['ntp_servers'].append(ntp_match.group(1))
+
+    return metadata
+
+
+def build_config(line_count: int) -> str:
+    """合成コンフィグ（インターフェース・VLAN・ACL・ユーザー・管理設定の繰り返し）"""
+    lines = ['hostname BENCH', 'router ospf 1', ' router-id 10.255.255.1']
+    i = 0
+    while len(lines) < line_count:
+        lines += [
+            f"interface GigabitEthernet{i // 48}/{i % 48}",
+            f" description access port {i}",
+            f" ip address 10.{i // 256 % 256}.{i % 256}.1 255.255.255.0",
+            " no shutdown",
+            "!",
+        ]
+        if i % 10 == 0:
+            lines += [
+                f"vlan {i % 4000 + 1}",
+                f" name users{i}",
+                f"ip access-list extended ACL{i}",
+                " permit ip any any",
+                f"username user{i} privilege 15 secret 0 password",
+                f"snmp-server community community{i} RO",
+                f"ntp server 10.0.{i % 256}.1",
+            ]
+        i += 1
+    return '\n'.join(lines[:line_count])
+
+
+def measure(func, repeat: int) -> float:
+    """repeat回の実行のうち最短の時間（秒）
+
+    測定中は循環参照のGCを止め、実装の違いだけを比べる（このスクリプトは単一スレッド）。
+    """
+    best = float('inf')
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="メタデータ抽出の性能比較")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000, 200000],
+                        help="コンフィグの行数")
+    parser.add_argument('--repeat', type=int, default=3, help="各測定の繰り返し回数")
+    args = parser.parse_args(argv)
+
+    print(f"{'lines':>8} {'legacy(ms)':>11} {'cold(ms)':>9} {'warm(ms)':>9} "
+          f"{'legacy(us/line)':>16} {'cold(us/line)':>14} {'warm(us/line)':>14}")
+    for size in args.sizes:
+        config = build_config(size)
+
+        # 結果が従来の実装と同じであることの確認
+        expected = legacy_parse_config_metadata(config)
+        actual = parse_config_metadata(config)
+        actual.pop('extracted_at')
+        if actual != expected:
+            raise SystemExit(f"Metadata mismatch for {size} lines")
+
+        def cold():
+            clear_config_tree_cache()
+            parse_config_metadata(config)
+
+        tree = parse_config_tree(config)
+        legacy = measure(lambda: legacy_parse_config_metadata(config), args.repeat)
+        cold_time = measure(cold, args.repeat)
+        warm_time = measure(lambda: parse_config_metadata(tree), args.repeat)
+        print(f"{size:>8} {legacy * 1000:>11.1f} {cold_time * 1000:>9.1f} {warm_time * 1000:>9.1f} "
+              f"{legacy / size * 1e6:>16.2f} {cold_time / size * 1e6:>14.2f} {warm_time / size * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,13 @@ Knowledge Base Updater for Network RAG System
 OpenHandsからKBの装置情報を更新するための実装
 """
 
-import os
-import re
 import json
 import yaml
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
@@ -36,6 +35,59 @@ except ImportError:
     print("Warning: Network RAG System not available. Using dummy implementation.")
     RAG_AVAILABLE = False
 
+# コンフィグの階層ツリー（検証・メタデータ抽出・セクション分割で共有）
+from src.config_parser import (
+    ConfigNodeStream, ConfigTree, config_fingerprint, config_nodes, iter_config_lines, parse_config_tree
+)
+from src.command_grammar import load_command_grammar
+# プラットフォームごとの解析処理（メタデータ抽出・セクション分類・構文チェック）
+from src.platforms import PlatformPlugin, detect_platform, detect_platform_lines
+from src.snapshot_store import SnapshotStore
+from src.kb_writer import KBWriter
+
+
+def parse_config_metadata(config_content: Union[str, Iterable[str], ConfigTree],
+                          platform: Union[str, PlatformPlugin, None] = None) -> Dict[str, Any]:
+    """コンフィグからメタデータを解析する（文字列・行イテレータ・解析済みのツリー）
+
+    各行は先頭語で振り分け、高々1つのパターンだけを適用するため、
+    処理時間はコンフィグの行数にほぼ比例する。platform（プラットフォーム名・
+    device_type）を省略した場合はコンフィグの先頭から判定する。
+    """
+    plugin, source = _config_source(config_content, platform)
+    metadata = {
+        'extracted_at': datetime.now().isoformat(),
+        'interfaces': [],
+        'ip_addresses': [],
+        'routing_protocols': [],
+        'vlans': [],
+        'access_lists': [],
+        'users': [],
+        'snmp_communities': [],
+        'ntp_servers': []
+    }
+    
+    for name, value in plugin.metadata.dispatch(source):
+        metadata[name].append(value)
+    
+    return metadata
+
+def _config_source(config_content: Union[str, Iterable[str], ConfigTree],
+                   platform: Union[str, PlatformPlugin, None] = None
+                   ) -> Tuple[PlatformPlugin, Union[ConfigTree, Iterable[str]]]:
+    """コンフィグのプラットフォームと解析対象
+
+    文字列・ツリーは解析済みのツリー（キャッシュを共有）、行イテレータはツリーを作らず
+    行のまま返す（プラットフォームの判定には先頭の行だけを読む）。
+    """
+    if isinstance(config_content, (str, ConfigTree)):
+        tree = parse_config_tree(config_content)
+        plugin = platform if isinstance(platform, PlatformPlugin) else detect_platform(tree, platform)
+        return plugin, tree
+    if isinstance(platform, PlatformPlugin):
+        return platform, config_content
+    return detect_platform_lines(config_content, platform)
+
 @dataclass
 class DeviceConfig:
     """装置コンフィグデータクラス"""
@@ -53,28 +105,48 @@ class UpdateResult:
     message: str
     updated_files: List[str]
     errors: List[str]
+    unchanged: bool = False  # 前回の更新からコンフィグが変わっていない（更新を省略した）
 
 class KnowledgeBaseUpdater(ABC):
     """知識ベース更新の抽象基底クラス"""
     
     @abstractmethod
-    def update_device_info(self, device_config: DeviceConfig) -> UpdateResult:
+    def update_device_info(self, device_config: DeviceConfig, force: bool = False) -> UpdateResult:
         """装置情報を更新する抽象メソッド"""
         pass
     
     @abstractmethod
-    def validate_config(self, config_content: str) -> bool:
+    def validate_config(self, config_content: Union[str, Iterable[str], ConfigTree],
+                        platform: Union[str, PlatformPlugin, None] = None) -> bool:
         """コンフィグの妥当性を検証する抽象メソッド"""
         pass
 
 class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
     """Network RAG System用の知識ベース更新クラス"""
     
-    def __init__(self, knowledge_base_path: str = "knowledge-base"):
+    def __init__(self, knowledge_base_path: str = "knowledge-base", snapshot_delta: bool = False):
         self.knowledge_base_path = Path(knowledge_base_path)
         self.devices_path = self.knowledge_base_path / "devices"
         self.logger = self._setup_logger()
         
+        # KBへの書き込み（1回の更新で書くファイルをまとめてアトミックにコミットする）
+        self.writer = KBWriter(self.knowledge_base_path)
+        
+        # 装置ごとの前回のコンフィグの指紋（変更のないコンフィグの更新を省略する）
+        self.fingerprints_file = self.devices_path / "device_configs" / "config_fingerprints.json"
+        
+        # コンフィグスナップショットのストア（内容が変わったときだけ増える）
+        # （snapshot_delta=True で前のバージョンとの差分として保存）
+        self.snapshot_store = SnapshotStore(self.devices_path / "device_configs" / "store",
+                                            delta=snapshot_delta, writer=self.writer)
+        self._fingerprints = None
+        self._fingerprints_lock = threading.Lock()
+        
+        # プラットフォームごとのコマンド文法（ファイルがなければ従来の判定のみ）
+        self.command_grammar = load_command_grammar(
+            self.knowledge_base_path / "automation" / "command-grammar.yaml"
+        )
+        
         # Network RAG Systemの初期化
         if RAG_AVAILABLE:
             try:
@@ -104,58 +176,21 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
         
         return logger
     
-    def update_device_info(self, device_config: DeviceConfig) -> UpdateResult:
-        """装置情報を更新する"""
+    def update_device_info(self, device_config: DeviceConfig, force: bool = False) -> UpdateResult:
+        """装置情報を更新する
+
+        正規化したコンフィグの指紋が前回の更新時と同じで、そのとき書き込んだファイルが
+        残っていれば、検証以降の処理を行わずに unchanged=True の結果を返す（force=True で常に更新）。
+        書き込むファイルは1回のグループコミットでまとめて置き換え、途中で失敗した場合は
+        どのファイルも書き換えない。
+        """
         try:
-            self.logger.info(f"Updating device info for: {device_config.device_name}")
-            
-            # コンフィグの検証
-            if not self.validate_config(device_config.config_content):
-                return UpdateResult(
-                    device_name=device_config.device_name,
-                    success=False,
-                    message="Invalid configuration format",
-                    updated_files=[],
-                    errors=["Configuration validation failed"]
-                )
-            
-            # メタデータの解析
-            parsed_metadata = self._parse_config_metadata(device_config.config_content)
-            
-            # 装置ポリシーの更新
-            policy_updated = self._update_device_policy(
-                device_config.device_name, 
-                parsed_metadata
-            )
-            
-            # 設定テンプレートの更新
-            template_updated = self._update_config_template(
-                device_config.device_name,
-                device_config.config_content,
-                parsed_metadata
-            )
-            
-            # デバイスコンフィグの保存
-            config_saved = self._save_device_config(device_config)
-            
-            updated_files = []
-            if policy_updated:
-                updated_files.append(f"devices/{device_config.device_name}_policy.md")
-            if template_updated:
-                updated_files.append(f"devices/{device_config.device_name}_config_template.yml")
-            if config_saved:
-                updated_files.append(f"devices/device_configs/{device_config.device_name}_running_config_{device_config.timestamp.strftime('%Y-%m-%d')}.txt")
-            
-            return UpdateResult(
-                device_name=device_config.device_name,
-                success=True,
-                message="Device information updated successfully",
-                updated_files=updated_files,
-                errors=[]
-            )
+            with self.writer.batch():
+                return self._update_device_info(device_config, force)
             
         except Exception as e:
             self.logger.error(f"Error updating device info: {e}")
+            self._reset_fingerprints()
             return UpdateResult(
                 device_name=device_config.device_name,
                 success=False,
@@ -164,164 +199,255 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
                 errors=[str(e)]
             )
     
-    def validate_config(self, config_content: str) -> bool:
-        """コンフィグの妥当性を検証する"""
+    def update_devices(self, device_configs: Iterable[DeviceConfig], force: bool = False) -> List[UpdateResult]:
+        """複数の装置情報をまとめて更新する
+
+        すべての装置の書き込みを1回のグループコミットにまとめる（KBの世代番号は1つだけ進み、
+        読み手の再読み込みも1回で済む）。コミットに失敗した場合は全装置を失敗とする。
+        """
+        results = []
         try:
-            # 基本的なCisco IOSコンフィグの検証
-            lines = config_content.strip().split('\n')
-            
-            # 空のコンフィグは無効
-            if not lines or len(lines) < 2:
-                return False
-            
-            # ホスト名の存在確認
-            has_hostname = any(line.strip().startswith('hostname ') for line in lines)
-            if not has_hostname:
-                return False
-            
-            # IP設定の存在確認（少なくとも1つは必要）
-            has_ip_config = any(
-                'ip address ' in line.lower() and 'no shutdown' in line.lower()
-                for line in lines
-            )
-            
-            # 基本的な構文チェック
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('!') and not line.startswith('#'):
-                    # コメント以外の行は基本的なコマンド構文をチェック
-                    if not self._validate_command_syntax(line):
-                        return False
-            
-            return True
-            
+            with self.writer.batch():
+                for device_config in device_configs:
+                    results.append(self.update_device_info(device_config, force))
         except Exception as e:
-            self.logger.error(f"Config validation error: {e}")
-            return False
-    
-    def _validate_command_syntax(self, command: str) -> bool:
-        """コマンド構文の検証"""
-        # 基本的なCisco IOSコマンドの構文チェック
-        common_patterns = [
-            r'^hostname\s+\w+$',
-            r'^interface\s+\w+',
-            r'^ip address\s+\d+\.\d+\.\d+\.\d+\s+\d+\.\d+\.\d+\.\d+$',
-            r'^router\s+\w+',
-            r'^vlan\s+\d+$',
-            r'^ip access-list\s+\w+',
-            r'^line\s+\w+',
-            r'^username\s+\w+\s+privilege\s+\d+',
-            r'^snmp-server\s+community',
-            r'^ntp server\s+\d+\.\d+\.\d+\.\d+',
-        ]
+            self.logger.error(f"Failed to commit device updates: {e}")
+            self._reset_fingerprints()
+            return [
+                result if result.unchanged or not result.success else UpdateResult(
+                    device_name=result.device_name,
+                    success=False,
+                    message=f"Update failed: {str(e)}",
+                    updated_files=[],
+                    errors=[str(e)]
+                )
+                for result in results
+            ]
+        return results
+    
+    def _update_device_info(self, device_config: DeviceConfig, force: bool) -> UpdateResult:
+        """装置情報の更新（書き込みは self.writer にステージする）"""
+        # 変更の有無の確認（取得時刻などの行を除いたハッシュ1回）
+        config_content, fingerprint = self._fingerprint_config(device_config)
+        if not force:
+            unchanged = self._unchanged_result(device_config, fingerprint)
+            if unchanged is not None:
+                return unchanged
         
-        for pattern in common_patterns:
-            if re.match(pattern, command, re.IGNORECASE):
-                return True
+        self.logger.info(f"Updating device info for: {device_config.device_name}")
         
-        # 上記パターンにマッチしない場合は、一般的なコマンド形式をチェック
-        if ' ' in command and not command.startswith(' '):
-            return True
+        # コンフィグは1回だけ解析し、検証・メタデータ抽出・テンプレート生成で共有する
+        tree = parse_config_tree(config_content)
         
-        return False
-    
-    def _parse_config_metadata(self, config_content: str) -> Dict[str, Any]:
-        """コンフィグからメタデータを解析する"""
-        metadata = {
-            'extracted_at': datetime.now().isoformat(),
-            'interfaces': [],
-            'ip_addresses': [],
-            'routing_protocols': [],
-            'vlans': [],
-            'access_lists': [],
-            'users': [],
-            'snmp_communities': [],
-            'ntp_servers': []
-        }
+        # プラットフォームの判定（以降はそのプラットフォームの処理だけを使う）
+        plugin = self.detect_platform(tree, device_config.metadata)
         
-        lines = config_content.strip().split('\n')
-        current_interface = None
+        # コンフィグの検証（構文エラーは行・桁の位置付きで返す）
+        errors = self._check_config(tree, plugin)
+        if errors:
+            return UpdateResult(
+                device_name=device_config.device_name,
+                success=False,
+                message="Invalid configuration format",
+                updated_files=[],
+                errors=errors
+            )
         
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('!') or line.startswith('#'):
-                continue
-            
-            # インターフェース情報の抽出
-            interface_match = re.match(r'^interface\s+(\S+)', line, re.IGNORECASE)
-            if interface_match:
-                current_interface = interface_match.group(1)
-                metadata['interfaces'].append(current_interface)
-                continue
-            
-            # IPアドレス情報の抽出
-            ip_match = re.search(r'ip address\s+(\d+\.\d+\.\d+\.\d+)\s+(\d+\.\d+\.\d+\.\d+)', line, re.IGNORECASE)
-            if ip_match:
-                metadata['ip_addresses'].append({
-                    'interface': current_interface,
-                    'ip': ip_match.group(1),
-                    'subnet': ip_match.group(2)
-                })
-            
-            # ルーティングプロトコルの抽出
-            if line.startswith('router '):
-                protocol = line.split()[1]
-                metadata['routing_protocols'].append(protocol)
-            
-            # VLAN情報の抽出
-            vlan_match = re.match(r'^vlan\s+(\d+)', line, re.IGNORECASE)
-            if vlan_match:
-                metadata['vlans'].append(vlan_match.group(1))
-            
-            # ACL情報の抽出
-            acl_match = re.search(r'ip access-list\s+(\w+)', line, re.IGNORECASE)
-            if acl_match:
-                metadata['access_lists'].append(acl_match.group(1))
+        # メタデータの解析
+        parsed_metadata = self._parse_config_metadata(tree, plugin)
+        parsed_metadata['platform'] = plugin.name
+        
+        # 以降の書き込みはどれかが失敗すると例外になり、batch() がすべて取り消す
+        # 装置ポリシーの更新
+        self._update_device_policy(
+            device_config.device_name, 
+            parsed_metadata
+        )
+        
+        # 設定テンプレートの更新
+        self._update_config_template(
+            device_config.device_name,
+            tree,
+            parsed_metadata,
+            plugin
+        )
+        
+        # デバイスコンフィグの保存
+        config_saved = self._save_device_config(device_config, plugin, config_content)
+        
+        updated_files = [
+            f"devices/{device_config.device_name}_policy.md",
+            f"devices/{device_config.device_name}_config_template.yml",
+            config_saved
+        ]
+        
+        # 指紋も同じコミットで記録する
+        self._set_fingerprint(device_config.device_name, device_config.config_type,
+                              fingerprint, updated_files)
+        
+        return UpdateResult(
+            device_name=device_config.device_name,
+            success=True,
+            message="Device information updated successfully",
+            updated_files=updated_files,
+            errors=[]
+        )
+    
+    def detect_platform(self, config_content: Union[str, Iterable[str], ConfigTree],
+                        metadata: Optional[Dict[str, Any]] = None) -> PlatformPlugin:
+        """コンフィグのプラットフォーム（metadata の platform・device_type を優先）"""
+        metadata = metadata or {}
+        return detect_platform(config_content, metadata.get('platform') or metadata.get('device_type'))
+    
+    def check_unchanged(self, device_config: DeviceConfig) -> Optional[UpdateResult]:
+        """コンフィグが前回の更新から変わっていなければ unchanged=True の結果（変わっていればNone）
+
+        行イテレータの本文は指紋を求める際に読み終えるため、device_config.config_content を
+        読み出した文字列に置き換え、続くプロンプト作成や更新で同じ本文を使えるようにする。
+        """
+        config_content, fingerprint = self._fingerprint_config(device_config)
+        device_config.config_content = config_content
+        return self._unchanged_result(device_config, fingerprint)
+    
+    def _fingerprint_config(self, device_config: DeviceConfig) -> Tuple[str, str]:
+        """コンフィグの本文と正規化した指紋
+
+        更新ではスナップショットに本文全体を保存するため、行イテレータは1回だけ読んで
+        文字列にし、以降の検証・メタデータ抽出・保存で共有する。
+        """
+        config_content = device_config.config_content
+        if not isinstance(config_content, str):
+            texts = config_content.texts if isinstance(config_content, ConfigTree) else iter_config_lines(config_content)
+            config_content = '\n'.join(texts)
+        return config_content, config_fingerprint(config_content)
+    
+    def _unchanged_result(self, device_config: DeviceConfig, fingerprint: str) -> Optional[UpdateResult]:
+        """指紋が前回と同じで、前回書き込んだファイルが残っていれば省略の結果"""
+        previous = self._get_fingerprint(device_config.device_name, device_config.config_type)
+        if not previous or previous['fingerprint'] != fingerprint:
+            return None
+        if not all(self.writer.exists(path) for path in previous['files']):
+            return None
+        
+        self.logger.info(f"Configuration unchanged for: {device_config.device_name}")
+        return UpdateResult(
+            device_name=device_config.device_name,
+            success=True,
+            message="Configuration unchanged",
+            updated_files=[],
+            errors=[],
+            unchanged=True
+        )
+    
+    def _load_fingerprints(self) -> Dict[str, Dict[str, Any]]:
+        """記録済みの指紋（初回のみ読み込む、ロック内で呼ぶ）
+
+        コミット前の記録も含めるため writer 経由で読む。
+        """
+        if self._fingerprints is None:
+            try:
+                self._fingerprints = json.loads(self.writer.read_text(self.fingerprints_file) or '{}')
+            except ValueError:
+                self._fingerprints = {}
+        return self._fingerprints
+    
+    def _reset_fingerprints(self):
+        """指紋のキャッシュの破棄（書き込みを取り消した後に呼ぶ）"""
+        with self._fingerprints_lock:
+            self._fingerprints = None
+    
+    def _get_fingerprint(self, device_name: str, config_type: str) -> Optional[Dict[str, Any]]:
+        """前回の更新時のコンフィグの指紋と書き込んだファイル"""
+        with self._fingerprints_lock:
+            return self._load_fingerprints().get(device_name, {}).get(config_type)
+    
+    def _set_fingerprint(self, device_name: str, config_type: str, fingerprint: str, files: List[str]):
+        """指紋の記録（他のファイルと同じグループコミットで書き込む）"""
+        with self._fingerprints_lock:
+            fingerprints = self._load_fingerprints()
+            fingerprints.setdefault(device_name, {})[config_type] = {
+                'fingerprint': fingerprint,
+                'files': files,
+                'updated_at': datetime.now().isoformat()
+            }
+            self.writer.stage(self.fingerprints_file,
+                              json.dumps(fingerprints, indent=2, ensure_ascii=False))
+    
+    def validate_config(self, config_content: Union[str, Iterable[str], ConfigTree],
+                        platform: Union[str, PlatformPlugin, None] = None) -> bool:
+        """コンフィグの妥当性を検証する
+
+        文字列のほか、ファイルオブジェクトなどの行イテレータや解析済みのツリーを渡せる。
+        platform（プラットフォーム名・device_type）を省略した場合はコンフィグの先頭から判定する。
+        """
+        return not self._check_config(config_content, platform)
+    
+    def _check_config(self, config_content: Union[str, Iterable[str], ConfigTree],
+                      platform: Union[str, PlatformPlugin, None] = None) -> List[str]:
+        """コンフィグの検証エラーの一覧（空なら妥当）"""
+        try:
+            plugin, source = _config_source(config_content, platform)
+            if not isinstance(source, ConfigTree):
+                return self._check_config_lines(source, plugin)
             
-            # ユーザー情報の抽出
-            user_match = re.match(r'^username\s+(\w+)\s+privilege\s+(\d+)', line, re.IGNORECASE)
-            if user_match:
-                metadata['users'].append({
-                    'username': user_match.group(1),
-                    'privilege': user_match.group(2)
-                })
+            # 空のコンフィグ（前後の空行を除いて2行未満）・ホスト名のないコンフィグは無効
+            if source.span < 2:
+                return ["Configuration is empty"]
+            if not plugin.hostname_nodes(source):
+                return ["Configuration has no hostname"]
             
-            # SNMPコミュニティの抽出
-            snmp_match = re.search(r'snmp-server\s+community\s+"?([^"\s]+)"?', line, re.IGNORECASE)
-            if snmp_match:
-                metadata['snmp_communities'].append(snmp_match.group(1))
+            # コマンドの構文チェック（全階層の行をモードごとの文法で1回ずつ検査）
+            return [str(error) for error in self.command_grammar.check(source, plugin.grammar)]
             
-            # NTPサーバーの抽出
-            ntp_match = re.search(r'ntp server\s+(\d+\.\d+\.\d+\.\d+)', line, re.IGNORECASE)
-            if ntp_match:
-                metadata['ntp_servers'].append(ntp_match.group(1))
+        except Exception as e:
+            self.logger.error(f"Config validation error: {e}")
+            return [f"Config validation error: {e}"]
+    
+    def _check_config_lines(self, lines: Iterable[str], plugin: PlatformPlugin) -> List[str]:
+        """行イテレータの検証（ツリーを作らず、構文チェックと同じ1回の読み出しで空・ホスト名も判定）"""
+        stream = ConfigNodeStream(lines)
+        has_hostname = False
         
-        return metadata
+        def nodes():
+            nonlocal has_hostname
+            for node in stream:
+                has_hostname = has_hostname or plugin.is_hostname(node.stripped)
+                yield node
+        
+        errors = self.command_grammar.check_nodes(nodes(), plugin.grammar)
+        # 空行以外が2行未満なら、前後の空行を除いた行数も2行未満
+        if stream.content_lines < 2:
+            return ["Configuration is empty"]
+        if not has_hostname:
+            return ["Configuration has no hostname"]
+        return [str(error) for error in errors]
+    
+    def _parse_config_metadata(self, config_content: Union[str, Iterable[str], ConfigTree],
+                               platform: Union[str, PlatformPlugin, None] = None) -> Dict[str, Any]:
+        """コンフィグからメタデータを解析する（文字列・行イテレータ・解析済みのツリー）"""
+        return parse_config_metadata(config_content, platform)
     
     def _update_device_policy(self, device_name: str, metadata: Dict[str, Any]) -> bool:
-        """装置ポリシーを更新する"""
+        """装置ポリシーを更新する（失敗時は例外を送出する）"""
         try:
             policy_file = self.devices_path / f"{device_name}_policy.md"
             
             # 既存のポリシーファイルがあれば読み込む
-            existing_policy = ""
-            if policy_file.exists():
-                with open(policy_file, 'r', encoding='utf-8') as f:
-                    existing_policy = f.read()
+            existing_policy = self.writer.read_text(policy_file) or ""
             
             # 新しいポリシーコンテンツを作成
             new_policy = self._generate_device_policy(device_name, metadata, existing_policy)
             
-            # ポリシーファイルを保存
-            with open(policy_file, 'w', encoding='utf-8') as f:
-                f.write(new_policy)
+            # ポリシーファイルを保存（コミット時にアトミックに置き換える）
+            self.writer.stage(policy_file, new_policy)
             
             self.logger.info(f"Updated device policy: {policy_file}")
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to update device policy: {e}")
-            return False
+            # 呼び出し元の batch() がこの更新でステージした内容を取り消す
+            raise
     
     def _generate_device_policy(self, device_name: str, metadata: Dict[str, Any], existing_policy: str) -> str:
         """装置ポリシーコンテンツを生成する"""
@@ -351,6 +477,7 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
 - **装置名**: {device_name}
 - **更新日時**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - **コンフィグタイプ**: 実行コンフィグ
+- **プラットフォーム**: {metadata.get('platform', 'ios')}
 - **状態**: 運用中
 
 ### ハードウェア情報
@@ -359,7 +486,7 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
 - **VLAN数**: {len(metadata['vlans'])}
 
 ### ネットワーク設定
-- **ルーティングプロトコル**: {', '.join(metadata['routing_protocols']) if metadata['routing_protocols'] = 'なし'}
+- **ルーティングプロトコル**: {', '.join(metadata['routing_protocols']) if metadata['routing_protocols'] else 'なし'}
 - **SNMPコミュニティ数**: {len(metadata['snmp_communities'])}
 - **NTPサーバー**: {', '.join(metadata['ntp_servers']) if metadata['ntp_servers'] else 'なし'}
 
@@ -403,34 +530,38 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
         
         return new_policy
     
-    def _update_config_template(self, device_name: str, config_content: str, metadata: Dict[str, Any]) -> bool:
-        """設定テンプレートを更新する"""
+    def _update_config_template(self, device_name: str, config_content: Union[str, ConfigTree],
+                                metadata: Dict[str, Any], platform: Optional[PlatformPlugin] = None) -> bool:
+        """設定テンプレートを更新する（失敗時は例外を送出する）"""
         try:
             template_file = self.devices_path / f"{device_name}_config_template.yml"
             
             # テンプレートデータを作成
+            plugin = platform or detect_platform(config_content)
             template_data = {
                 'device_name': device_name,
                 'created_at': datetime.now().isoformat(),
-                'template_type': 'cisco_ios',
+                'template_type': plugin.template_type,
                 'based_on_config': True,
                 'metadata': metadata,
-                'config_sections': self._extract_config_sections(config_content)
+                'config_sections': self._extract_config_sections(config_content, plugin)
             }
             
-            # テンプレートファイルを保存
-            with open(template_file, 'w', encoding='utf-8') as f:
-                yaml.dump(template_data, f, default_flow_style=False, allow_unicode=True)
+            # テンプレートファイルを保存（コミット時にアトミックに置き換える）
+            self.writer.stage(template_file, yaml.dump(template_data, default_flow_style=False,
+                                                       allow_unicode=True))
             
             self.logger.info(f"Updated config template: {template_file}")
             return True
             
         except Exception as e:
             self.logger.error(f"Failed to update config template: {e}")
-            return False
+            raise
     
-    def _extract_config_sections(self, config_content: str) -> Dict[str, List[str]]:
-        """コンフィグセクションを抽出する"""
+    def _extract_config_sections(self, config_content: Union[str, Iterable[str], ConfigTree],
+                                 platform: Union[str, PlatformPlugin, None] = None) -> Dict[str, List[str]]:
+        """コンフィグセクションを抽出する（トップレベルのブロック単位で分類、行イテレータはツリーを作らない）"""
+        plugin, source = _config_source(config_content, platform)
         sections = {
             'basic': [],
             'interfaces': [],
@@ -440,64 +571,49 @@ class NetworkRAGKnowledgeUpdater(KnowledgeBaseUpdater):
             'other': []
         }
         
-        lines = config_content.strip().split('\n')
         current_section = 'basic'
         
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('!') or line.startswith('#'):
-                continue
-            
-            # セクションの判定
-            if line.startswith('hostname '):
-                current_section = 'basic'
-            elif line.startswith('interface '):
-                current_section = 'interfaces'
-            elif line.startswith('router '):
-                current_section = 'routing'
-            elif line.startswith('ip access-list ') or line.startswith('access-list '):
-                current_section = 'security'
-            elif any(keyword in line.lower() for keyword in ['snmp', 'ntp', 'ssh', 'telnet', 'logging']):
-                current_section = 'management'
+        for node in config_nodes(source):
+            # セクションの判定（判定できないブロックは直前のセクションに含める）
+            if node.parent is None:
+                current_section = plugin.section_of(node.stripped) or current_section
             
-            sections[current_section].append(line)
+            # 配下の行はブロックと同じセクションに含める
+            sections[current_section].append(node.stripped)
         
         return sections
     
-    def _save_device_config(self, device_config: DeviceConfig) -> bool:
-        """デバイスコンフィグを保存する"""
+    def _save_device_config(self, device_config: DeviceConfig,
+                            platform: Optional[PlatformPlugin] = None,
+                            content: Optional[str] = None) -> str:
+        """デバイスコンフィグをスナップショットストアに保存する
+
+        本文は内容のハッシュで重複を除いて圧縮保存し、メタデータはタイムラインに記録する。
+        content を省略した場合は device_config の本文を保存する。
+        保存したオブジェクトのKBからの相対パスを返す（失敗時は例外を送出する）。
+        """
         try:
-            config_dir = self.devices_path / "device_configs"
-            config_dir.mkdir(parents=True, exist_ok=True)
-            
-            # ファイル名の生成
-            filename = f"{device_config.device_name}_{device_config.config_type}_{device_config.timestamp.strftime('%Y-%m-%d')}.txt"
-            config_file = config_dir / filename
-            
-            # メタデータを追加
-            config_with_metadata = f"""# Device Configuration Metadata
-# Device: {device_config.device_name}
-# Type: Router/Switch
-# OS: Cisco IOS
-# Config Type: {device_config.config_type}
-# Date: {device_config.timestamp.strftime('%Y-%m-%d')}
-# Version: Auto-detected
-# Contact: network-admin@company.com
-# Description: Production configuration from actual device
-
-{device_config.config_content}
-"""
+            if content is None:
+                content, _ = self._fingerprint_config(device_config)
             
-            # コンフィグファイルを保存
-            with open(config_file, 'w', encoding='utf-8') as f:
-                f.write(config_with_metadata)
+            record = self.snapshot_store.put(
+                device_config.device_name,
+                device_config.config_type,
+                content,
+                timestamp=device_config.timestamp,
+                metadata={
+                    **device_config.metadata,
+                    'platform': platform.name if platform else None,
+                }
+            )
             
-            self.logger.info(f"Saved device config: {config_file}")
-            return True
+            object_path = self.snapshot_store.object_path(record.hash)
+            self.logger.info(f"Saved device config: {object_path} ({record.timestamp})")
+            return object_path.relative_to(self.knowledge_base_path).as_posix()
             
         except Exception as e:
             self.logger.error(f"Failed to save device config: {e}")
-            return False
+            raise
 
 class OpenHandsKnowledgeUpdater:
     """OpenHands用の知識ベース更新クラス"""
@@ -548,7 +664,7 @@ Please analyze the above device configuration and update the Network RAG System
 4. Knowledge Base Files to Update:
    - Update device policy: knowledge-base/devices/{device_config.device_name}_policy.md
    - Update config template: knowledge-base/devices/{device_config.device_name}_config_template.yml
-   - Save raw config: knowledge-base/devices/device_configs/{device_config.device_name}_running_config_{device_config.timestamp.strftime('%Y-%m-%d')}.txt
+   - Save raw config snapshot: knowledge-base/devices/device_configs/store (content-addressed; timeline/{device_config.device_name}.jsonl)
 
 Please provide the updated content for each file and confirm the update was successful.
 """
@@ -557,6 +673,13 @@ Please provide the updated content for each file and confirm the update was succ
     def process_update_request(self, device_config: DeviceConfig) -> UpdateResult:
         """更新リクエストを処理する"""
         try:
+            # 前回の更新からコンフィグが変わっていなければプロンプトも作らずに終える
+            check_unchanged = getattr(self.kb_updater, 'check_unchanged', None)
+            if check_unchanged is not None:
+                unchanged = check_unchanged(device_config)
+                if unchanged is not None:
+                    return unchanged
+            
             # 更新用プロンプトの作成
             prompt = self.create_update_prompt(device_config)
             
@@ -616,7 +739,7 @@ Please provide the updated content for each file and confirm the update was succ
             updated_files=[
                 f"devices/{device_config.device_name}_policy.md",
                 f"devices/{device_config.device_name}_config_template.yml",
-                f"devices/device_configs/{device_config.device_name}_running_config_{device_config.timestamp.strftime('%Y-%m-%d')}.txt"
+                f"devices/device_configs/store/timeline/{device_config.device_name}.jsonl"
             ],
             errors=[]
         )
@@ -7,10 +7,13 @@ Network RAG System + OpenHands Integration Example
 
 import sys
 import os
+import asyncio
 sys.path.append('/workspace/network-rag-system')
 
 from src.rag_system import NetworkRAGSystem
 from src.config_generator import NetworkConfigGenerator
+from src.llm_backend import LLMBackend, HTTPLLMBackend
+from src.config_archive import DirectorySink, JSONLArchiveSink
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Any
 import json
@@ -25,73 +28,133 @@ class OpenHandsIntegrationConfig:
     max_retries: int = 3
     timeout: int = 30
     enable_validation: bool = True
+    use_llm_api: bool = False
+    llm_model: str = "default"
+    max_concurrency: int = 4
 
 class OpenHandsNetworkAgent:
     """OpenHandsネットワークエージェント"""
     
-    def __init__(self, config: OpenHandsIntegrationConfig):
+    def __init__(self, config: OpenHandsIntegrationConfig, llm_backend: Optional[LLMBackend] = None):
         self.config = config
         self.rag_system = NetworkRAGSystem()
         self.config_generator = NetworkConfigGenerator()
         self.query_history = []
         
+        # LLMバックエンド（未指定かつuse_llm_api=Falseの場合はダミー生成）
+        if llm_backend is None and config.use_llm_api:
+            llm_backend = HTTPLLMBackend(
+                api_url=config.llm_api_url,
+                api_key=config.llm_api_key,
+                model=config.llm_model,
+                max_concurrency=config.max_concurrency,
+                timeout=config.timeout,
+                max_retries=config.max_retries
+            )
+        self.llm_backend = llm_backend
+        
     def process_network_request(self, query: str, device_name: str = None, config_type: str = None) -> Dict[str, Any]:
         """ネットワークリクエストの処理"""
         print(f"Processing network request: {query}")
         print(f"Device: {device_name}, Config Type: {config_type}")
         
         try:
-            # 1. RAGシステムで関連情報を検索
-            relevant_info = self.rag_system.retrieve_relevant_info(query)
-            print(f"Found relevant devices: {relevant_info['relevant_devices']}")
-            print(f"Found relevant policies: {relevant_info['relevant_policies']}")
-            print(f"Found relevant templates: {relevant_info['relevant_templates']}")
-            
-            # 2. プロンプトを生成
-            prompt = self.rag_system.generate_config_prompt(query)
-            print(f"Generated prompt length: {len(prompt)}")
+            # 1-2. 関連情報の検索とプロンプト生成
+            relevant_info, prompt = self._prepare_request(query)
             
-            # 3. LLM APIでコンフィグを生成（実際のAPI呼び出し）
+            # 3. LLM APIでコンフィグを生成
             config_content = self._call_llm_api(prompt)
             print(f"Generated config length: {len(config_content)}")
             
-            # 4. コンフィグの検証
-            validation_result = None
-            if self.config.enable_validation:
-                validation_result = self.config_generator._validate_config(config_content)
-                print(f"Validation result: {validation_result['is_valid']}")
+            # 4-6. 検証・結果の整形・履歴への追加
+            return self._build_result(query, device_name, config_type, config_content, relevant_info)
             
-            # 5. 結果の整形
-            result = {
-                'query': query,
-                'device_name': device_name or self._extract_device_name(query),
-                'config_type': config_type or self._extract_config_type(query),
-                'config_content': config_content,
-                'validation_result': validation_result,
-                'relevant_info': relevant_info,
-                'timestamp': datetime.now().isoformat(),
-                'status': 'success'
-            }
+        except Exception as e:
+            return self._build_error_result(query, e)
+    
+    async def aprocess_network_request(self, query: str, device_name: str = None, config_type: str = None) -> Dict[str, Any]:
+        """ネットワークリクエストの処理（非同期版）"""
+        print(f"Processing network request: {query}")
+        print(f"Device: {device_name}, Config Type: {config_type}")
+        
+        try:
+            relevant_info, prompt = self._prepare_request(query)
             
-            # 6. クエリ履歴に追加
-            self.query_history.append(result)
+            # LLM応答待ちの間は他のリクエストを進める
+            config_content = await self._acall_llm_api(prompt)
+            print(f"Generated config length: {len(config_content)}")
             
-            return result
+            return self._build_result(query, device_name, config_type, config_content, relevant_info)
             
         except Exception as e:
-            print(f"Error processing request: {str(e)}")
-            return {
-                'query': query,
-                'error': str(e),
-                'timestamp': datetime.now().isoformat(),
-                'status': 'error'
-            }
+            return self._build_error_result(query, e)
+    
+    def _prepare_request(self, query: str) -> tuple:
+        """関連情報の検索とプロンプトの生成"""
+        # 1. RAGシステムで関連情報を検索
+        relevant_info = self.rag_system.retrieve_relevant_info(query)
+        print(f"Found relevant devices: {relevant_info['relevant_devices']}")
+        print(f"Found relevant policies: {relevant_info['relevant_policies']}")
+        print(f"Found relevant templates: {relevant_info['relevant_templates']}")
+        
+        # 2. プロンプトを生成
+        prompt = self.rag_system.generate_config_prompt(query)
+        print(f"Generated prompt length: {len(prompt)}")
+        
+        return relevant_info, prompt
+    
+    def _build_result(self, query: str, device_name: Optional[str], config_type: Optional[str],
+                      config_content: str, relevant_info: Dict[str, Any]) -> Dict[str, Any]:
+        """検証と結果の整形"""
+        # 4. コンフィグの検証
+        validation_result = None
+        if self.config.enable_validation:
+            validation_result = self.config_generator._validate_config(config_content)
+            print(f"Validation result: {validation_result['is_valid']}")
+        
+        # 5. 結果の整形
+        result = {
+            'query': query,
+            'device_name': device_name or self._extract_device_name(query),
+            'config_type': config_type or self._extract_config_type(query),
+            'config_content': config_content,
+            'validation_result': validation_result,
+            'relevant_info': relevant_info,
+            'timestamp': datetime.now().isoformat(),
+            'status': 'success'
+        }
+        
+        # 6. クエリ履歴に追加
+        self.query_history.append(result)
+        
+        return result
+    
+    def _build_error_result(self, query: str, error: Exception) -> Dict[str, Any]:
+        """エラー結果の整形"""
+        print(f"Error processing request: {str(error)}")
+        return {
+            'query': query,
+            'error': str(error),
+            'timestamp': datetime.now().isoformat(),
+            'status': 'error'
+        }
     
     def _call_llm_api(self, prompt: str) -> str:
-        """LLM APIの呼び出し（ダミー実装）"""
-        # 実際にはここでLLM APIを呼び出す
-        # 今回はダミーのコンフィグを返す
+        """LLM APIの呼び出し"""
+        if self.llm_backend is not None:
+            return self.llm_backend.generate(prompt)
         
+        return self._generate_dummy_response(prompt)
+    
+    async def _acall_llm_api(self, prompt: str) -> str:
+        """LLM APIの呼び出し（非同期版）"""
+        if self.llm_backend is not None:
+            return await self.llm_backend.agenerate(prompt)
+        
+        return self._generate_dummy_response(prompt)
+    
+    def _generate_dummy_response(self, prompt: str) -> str:
+        """LLM未設定時のダミー応答"""
         device_name = self._extract_device_name(prompt)
         config_type = self._extract_config_type(prompt)
         
@@ -214,25 +277,29 @@ class OpenHandsNetworkAgent:
     
     def batch_process_requests(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """バッチ処理の実行"""
-        print(f"Processing {len(requests)} requests in batch...")
-        results = []
+        return asyncio.run(self.abatch_process_requests(requests))
+    
+    async def abatch_process_requests(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """バッチ処理の実行（非同期版）
+
+        待機による直列化の代わりに、最大max_concurrency件のリクエストを
+        同時に実行してLLMバックエンドの応答待ちを重ねる。
+        """
+        print(f"Processing {len(requests)} requests in batch "
+              f"(max concurrency: {self.config.max_concurrency})...")
+        semaphore = asyncio.Semaphore(self.config.max_concurrency)
         
-        for i, request in enumerate(requests, 1):
-            print(f"Processing request {i}/{len(requests)}: {request['query']}")
-            
-            result = self.process_network_request(
-                query=request['query'],
-                device_name=request.get('device_name'),
-                config_type=request.get('config_type')
-            )
-            
-            results.append(result)
-            
-            # レートリミットのための待機
-            import time
-            time.sleep(0.5)
+        async def run(i: int, request: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                print(f"Processing request {i}/{len(requests)}: {request['query']}")
+                return await self.aprocess_network_request(
+                    query=request['query'],
+                    device_name=request.get('device_name'),
+                    config_type=request.get('config_type')
+                )
         
-        return results
+        # 結果はリクエストと同じ順序で返す
+        return list(await asyncio.gather(*(run(i, request) for i, request in enumerate(requests, 1))))
     
     def generate_report(self, results: List[Dict[str, Any]]) -> str:
         """処理結果のレポート生成"""
@@ -281,41 +348,27 @@ class OpenHandsNetworkAgent:
         
         return '\n'.join(report_lines)
     
-    def save_results(self, results: List[Dict[str, Any]], output_dir: str = "/tmp/network_configs"):
-        """結果の保存"""
-        import os
+    def save_results(self, results: List[Dict[str, Any]], output_dir: str = "/tmp/network_configs",
+                     archive: bool = False):
+        """結果の保存
+        
+        archive=Trueの場合は個別ファイルの代わりに、全結果を
+        インデックス付きのJSONLアーカイブ（results_{timestamp}-*.jsonl）にまとめて保存する。
+        """
         os.makedirs(output_dir, exist_ok=True)
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # 各結果を個別ファイルに保存
-        for i, result in enumerate(results):
-            if result.get('status') == 'success':
-                # コンフィグファイル
-                config_filename = f"config_{i+1}_{result.get('device_name', 'unknown')}_{timestamp}.txt"
-                config_filepath = os.path.join(output_dir, config_filename)
-                
-                with open(config_filepath, 'w', encoding='utf-8') as f:
-                    f.write(f"! Network Configuration\n")
-                    f.write(f"! Device: {result.get('device_name', 'unknown')}\n")
-                    f.write(f"! Type: {result.get('config_type', 'unknown')}\n")
-                    f.write(f"! Generated: {result.get('timestamp', '')}\n")
-                    f.write(f"! Query: {result.get('query', '')}\n")
-                    f.write("\n")
-                    f.write(result.get('config_content', ''))
-                
-                # 検証結果ファイル
-                if result.get('validation_result'):
-                    validation_filename = f"validation_{i+1}_{result.get('device_name', 'unknown')}_{timestamp}.json"
-                    validation_filepath = os.path.join(output_dir, validation_filename)
-                    
-                    with open(validation_filepath, 'w', encoding='utf-8') as f:
-                        json.dump({
-                            'device_name': result.get('device_name'),
-                            'config_type': result.get('config_type'),
-                            'validation_result': result.get('validation_result'),
-                            'timestamp': result.get('timestamp')
-                        }, f, indent=2, ensure_ascii=False)
+        if archive:
+            sink = JSONLArchiveSink(output_dir, prefix=f"results_{timestamp}")
+        else:
+            sink = DirectorySink(output_dir)
+        
+        # 各結果を保存
+        with sink:
+            for i, result in enumerate(results):
+                if result.get('status') == 'success':
+                    sink.write_record(f"result_{i+1}", self._render_result_files(result, i, timestamp))
         
         # 全体のレポートファイル
         report_filename = f"report_{timestamp}.md"
@@ -326,6 +379,34 @@ class OpenHandsNetworkAgent:
             f.write(report_content)
         
         return output_dir
+    
+    def _render_result_files(self, result: Dict[str, Any], index: int, timestamp: str) -> Dict[str, str]:
+        """1件の結果について保存するファイル名と内容"""
+        device_name = result.get('device_name', 'unknown')
+        
+        # コンフィグファイル
+        files = {
+            f"config_{index+1}_{device_name}_{timestamp}.txt": (
+                f"! Network Configuration\n"
+                f"! Device: {device_name}\n"
+                f"! Type: {result.get('config_type', 'unknown')}\n"
+                f"! Generated: {result.get('timestamp', '')}\n"
+                f"! Query: {result.get('query', '')}\n"
+                "\n"
+                f"{result.get('config_content', '')}"
+            )
+        }
+        
+        # 検証結果ファイル
+        if result.get('validation_result'):
+            files[f"validation_{index+1}_{device_name}_{timestamp}.json"] = json.dumps({
+                'device_name': result.get('device_name'),
+                'config_type': result.get('config_type'),
+                'validation_result': result.get('validation_result'),
+                'timestamp': result.get('timestamp')
+            }, indent=2, ensure_ascii=False)
+        
+        return files
 
 def main():
     """メイン関数 - 実行例"""
@@ -13,11 +13,59 @@ __email__ = "team@network-rag.com"
 
 from .rag_system import NetworkRAGSystem
 from .config_generator import NetworkConfigGenerator
+from .config_sections import ConfigSection
+from .config_parser import ConfigTree, ConfigNodeStream, parse_config_tree
+from .command_grammar import CommandGrammar, CommandError, load_command_grammar
+from .platforms import PlatformPlugin, PlatformRegistry, detect_platform
 from .knowledge_base import KnowledgeBase, DevicePolicy
+from .build_cache import BuildCache
+from .llm_backend import LLMBackend, HTTPLLMBackend
+from .llm_cache import LLMResponseCache
+from .validation import ConfigValidator, RuleVisitor
+from .fleet_validation import validate_many
+from .validation_cache import ValidationCache
+from .address_index import AddressIndex, AddressConflict
+from .prefix_trie import PrefixTrie
+from .snapshot_store import SnapshotStore, SnapshotRecord
+from .kb_writer import KBWriter, read_kb_generation
+from .config_archive import ConfigSink, DirectorySink, JSONLArchiveSink
+from .config_store import ConfigStore, MemoryConfigStore, SQLiteConfigStore, TieredConfigStore
 
 __all__ = [
     "NetworkRAGSystem",
     "NetworkConfigGenerator", 
+    "ConfigSection",
+    "ConfigTree",
+    "ConfigNodeStream",
+    "parse_config_tree",
+    "CommandGrammar",
+    "CommandError",
+    "load_command_grammar",
+    "PlatformPlugin",
+    "PlatformRegistry",
+    "detect_platform",
     "KnowledgeBase",
     "DevicePolicy",
+    "BuildCache",
+    "LLMBackend",
+    "HTTPLLMBackend",
+    "LLMResponseCache",
+    "ConfigStore",
+    "MemoryConfigStore",
+    "SQLiteConfigStore",
+    "TieredConfigStore",
+    "ConfigValidator",
+    "RuleVisitor",
+    "validate_many",
+    "ValidationCache",
+    "AddressIndex",
+    "AddressConflict",
+    "PrefixTrie",
+    "SnapshotStore",
+    "SnapshotRecord",
+    "KBWriter",
+    "read_kb_generation",
+    "ConfigSink",
+    "DirectorySink",
+    "JSONLArchiveSink",
 ]
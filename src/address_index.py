@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# address_index.py
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from .config_parser import ConfigTree, parse_config_tree
+from .ipaddr import broadcast_address, int_to_ip, ip_to_int, network_address, parse_address
+
+# インターフェース配下の「ip address A.B.C.D M.M.M.M」「ip address A.B.C.D/len」
+IP_ADDRESS_LINE_PATTERN = re.compile(
+    r'^\s+ip address\s+(\d+\.\d+\.\d+\.\d+)(?:/(\d+)|\s+(\d+\.\d+\.\d+\.\d+))'
+)
+# HSRPの仮想IP（グループ番号は省略可能）
+STANDBY_IP_PATTERN = re.compile(r'^\s+standby\s+(?:(\d+)\s+)?ip\s+(\d+\.\d+\.\d+\.\d+)')
+INTERFACE_PATTERN = re.compile(r'^interface\s+(\S+)')
+
+CONFLICT_KINDS = ('duplicate_ip', 'subnet_overlap', 'hsrp_conflict')
+
+
+@dataclass(frozen=True)
+class AddressEntry:
+    """デバイスに設定された1つのアドレス"""
+    device_name: str
+    interface: Optional[str]
+    address: int
+    prefix_len: int
+    kind: str = 'interface'  # 'interface' | 'hsrp'
+    group: Optional[str] = None
+    source: str = 'config'  # 'config' | 'policy' | 'generated'
+
+    @property
+    def network(self) -> int:
+        """ネットワークアドレス（区間の先頭）"""
+        return network_address(self.address, self.prefix_len)
+
+    @property
+    def broadcast(self) -> int:
+        """ブロードキャストアドレス（区間の末尾）"""
+        return broadcast_address(self.address, self.prefix_len)
+
+    @property
+    def ip(self) -> str:
+        return int_to_ip(self.address)
+
+    @property
+    def subnet(self) -> str:
+        return f"{int_to_ip(self.network)}/{self.prefix_len}"
+
+    @property
+    def location(self) -> str:
+        """「デバイス/インターフェース」形式の表示名"""
+        return f"{self.device_name}/{self.interface}" if self.interface else self.device_name
+
+    def same_port(self, other: 'AddressEntry') -> bool:
+        """同じデバイスの同じインターフェース（インターフェース不明は同一とみなす）"""
+        if self.device_name != other.device_name:
+            return False
+        return self.interface is None or other.interface is None or self.interface == other.interface
+
+
+@dataclass
+class AddressConflict:
+    """アドレスの競合（entryが検査対象、otherが既存のアドレス）"""
+    kind: str  # 'duplicate_ip' | 'subnet_overlap' | 'hsrp_conflict'
+    entry: AddressEntry
+    other: AddressEntry
+
+    @property
+    def message(self) -> str:
+        if self.kind == 'duplicate_ip':
+            return f"Duplicate IP address {self.entry.ip}: {self.entry.location} and {self.other.location}"
+        if self.kind == 'subnet_overlap':
+            return (f"Subnet {self.entry.subnet} on {self.entry.location} overlaps "
+                    f"{self.other.subnet} on {self.other.location}")
+        if self.entry.kind == 'hsrp' and self.other.kind == 'hsrp':
+            return (f"HSRP virtual IP {self.entry.ip} is used by group {self.entry.group} on "
+                    f"{self.entry.location} and group {self.other.group} on {self.other.location}")
+        virtual, interface = (self.entry, self.other) if self.entry.kind == 'hsrp' else (self.other, self.entry)
+        return (f"HSRP virtual IP {virtual.ip} on {virtual.location} is assigned "
+                f"to interface {interface.location}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'message': self.message,
+            'device_name': self.entry.device_name,
+            'interface': self.entry.interface,
+            'address': f"{self.entry.ip}/{self.entry.prefix_len}",
+            'other_device_name': self.other.device_name,
+            'other_interface': self.other.interface,
+            'other_address': f"{self.other.ip}/{self.other.prefix_len}",
+        }
+
+
+def extract_addresses(device_name: str, config: Union[str, Iterable[str], ConfigTree],
+                      source: str = 'config') -> Iterator[AddressEntry]:
+    """コンフィグのインターフェースブロックからアドレスとHSRPの仮想IPを抽出"""
+    interface_prefix = {}
+    for block in parse_config_tree(config).blocks('interface'):
+        match = INTERFACE_PATTERN.match(block.text)
+        if match is None:
+            continue
+        interface = match.group(1)
+        for node in block.children:
+            match = IP_ADDRESS_LINE_PATTERN.match(node.text)
+            if match:
+                parsed = parse_address(match.group(0).split('ip address', 1)[1])
+                if parsed:
+                    interface_prefix.setdefault(interface, parsed[1])
+                    yield AddressEntry(device_name, interface, parsed[0], parsed[1], source=source)
+                continue
+
+            match = STANDBY_IP_PATTERN.match(node.text)
+            if match:
+                try:
+                    address = ip_to_int(match.group(2))
+                except ValueError:
+                    continue
+                # 仮想IPはインターフェースのサブネットに属する（マスクがなければ/32）
+                yield AddressEntry(device_name, interface, address, interface_prefix.get(interface, 32),
+                                   kind='hsrp', group=match.group(1) or '0', source=source)
+
+
+class AddressIndex:
+    """全デバイスのアドレスの区間インデックス
+
+    各アドレスをサブネットの整数区間 [ネットワーク, ブロードキャスト] として保持する。
+    CIDRの区間は互いに素か入れ子のいずれかなので、先頭の昇順（同じ先頭なら長い順）に
+    並べて1回走査すると各区間の直近の親（包含する区間）が求まる。全競合の列挙は
+    ソートと走査でO(n log n + 競合数)、新しいアドレスの検査は二分探索と親をたどる
+    処理（入れ子の深さは高々33）でO(log n + 競合数)となる。
+    同じサブネットを共有するアドレス（同一セグメント上のデバイス）は競合としない。
+    """
+
+    def __init__(self, entries: Iterable[AddressEntry] = ()):
+        self._entries = list(entries)
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: AddressEntry):
+        """アドレスの追加"""
+        self._entries.append(entry)
+        self._built = False
+
+    def add_config(self, device_name: str, config: Union[str, Iterable[str], ConfigTree],
+                   source: str = 'config') -> int:
+        """コンフィグ内の全アドレスの追加（追加した件数を返す）"""
+        count = 0
+        for entry in extract_addresses(device_name, config, source):
+            self.add(entry)
+            count += 1
+        return count
+
+    def _build(self):
+        """ソート済み配列と包含関係の構築（追加後の最初の参照時に1回だけ行う）"""
+        if self._built:
+            return
+
+        # ホストアドレスの昇順（重複IP・HSRP仮想IPの照合用）
+        self._hosts = sorted(dict.fromkeys(self._entries), key=lambda entry: entry.address)
+        self._host_keys = [entry.address for entry in self._hosts]
+
+        # インターフェースのサブネット（同じ区間のアドレスは1つのノードにまとめる）
+        networks = {}
+        for entry in self._hosts:
+            if entry.kind == 'interface':
+                networks.setdefault((entry.network, entry.broadcast), []).append(entry)
+        self._intervals = sorted(networks, key=lambda interval: (interval[0], -interval[1]))
+        self._starts = [start for start, _ in self._intervals]
+        self._members = [networks[interval] for interval in self._intervals]
+
+        # 直近の親（自身を包含する最小の区間）
+        self._parents = []
+        stack = []
+        for index, (start, end) in enumerate(self._intervals):
+            while stack and self._intervals[stack[-1]][1] < start:
+                stack.pop()
+            self._parents.append(stack[-1] if stack else None)
+            stack.append(index)
+
+        self._built = True
+
+    def _ancestors(self, index: Optional[int]) -> Iterator[int]:
+        while index is not None:
+            yield index
+            index = self._parents[index]
+
+    def find_conflicts(self) -> List[AddressConflict]:
+        """全アドレスの競合の列挙"""
+        self._build()
+        conflicts = []
+
+        # 同じアドレスを持つエントリ（ホストアドレスの昇順で隣接する）
+        start = 0
+        while start < len(self._hosts):
+            end = start
+            while end < len(self._hosts) and self._host_keys[end] == self._host_keys[start]:
+                end += 1
+            group = self._hosts[start:end]
+            for i, entry in enumerate(group):
+                for other in group[i + 1:]:
+                    kind = self._same_address_conflict(entry, other)
+                    if kind:
+                        conflicts.append(AddressConflict(kind, entry, other))
+            start = end
+
+        # 他の区間に包含されるサブネット
+        for index, members in enumerate(self._members):
+            for ancestor in self._ancestors(self._parents[index]):
+                for entry in members:
+                    for other in self._members[ancestor]:
+                        if not entry.same_port(other):
+                            conflicts.append(AddressConflict('subnet_overlap', entry, other))
+
+        return conflicts
+
+    def check(self, entry: AddressEntry, exclude_device: Optional[str] = None) -> List[AddressConflict]:
+        """新しいアドレスと既存のアドレスの競合（exclude_deviceのアドレスは対象外）"""
+        self._build()
+        conflicts = []
+
+        def candidates(entries: Iterable[AddressEntry]) -> Iterator[AddressEntry]:
+            for other in entries:
+                if other.device_name != exclude_device and not entry.same_port(other):
+                    yield other
+
+        # 同じアドレス
+        lo = bisect_left(self._host_keys, entry.address)
+        hi = bisect_right(self._host_keys, entry.address, lo)
+        for other in candidates(self._hosts[lo:hi]):
+            kind = self._same_address_conflict(entry, other)
+            if kind:
+                conflicts.append(AddressConflict(kind, entry, other))
+
+        if entry.kind != 'interface':
+            return conflicts
+
+        start, end = entry.network, entry.broadcast
+
+        # 新しいサブネットに包含される区間（先頭が [start, end] にあるもの）
+        index = bisect_left(self._starts, start)
+        while index < len(self._intervals) and self._starts[index] <= end:
+            if self._intervals[index][1] < end or self._intervals[index][0] > start:
+                for other in candidates(self._members[index]):
+                    conflicts.append(AddressConflict('subnet_overlap', entry, other))
+            index += 1
+
+        # 新しいサブネットを包含する区間（先頭がstart以下で最後の区間の祖先）
+        index = bisect_right(self._starts, start) - 1
+        for ancestor in self._ancestors(index if index >= 0 else None):
+            interval_start, interval_end = self._intervals[ancestor]
+            if interval_end < end or (interval_start, interval_end) == (start, end):
+                continue
+            for other in candidates(self._members[ancestor]):
+                conflicts.append(AddressConflict('subnet_overlap', entry, other))
+
+        return conflicts
+
+    def _same_address_conflict(self, entry: AddressEntry, other: AddressEntry) -> Optional[str]:
+        """同じアドレスを持つ2つのエントリの競合の種類"""
+        if entry.kind == 'interface' and other.kind == 'interface':
+            return None if entry.same_port(other) else 'duplicate_ip'
+        if entry.kind == 'hsrp' and other.kind == 'hsrp':
+            # 同じグループの仮想IPを複数のデバイスで共有するのはHSRPの正しい構成
+            return None if entry.group == other.group else 'hsrp_conflict'
+        return 'hsrp_conflict'
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# build_cache.py
+import os
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from .utils import compute_content_hash, normalize_query
+
+
+class BuildCache:
+    """生成済みコンフィグのコンテンツアドレス型ビルドキャッシュ
+
+    キーは (ポリシーハッシュ, テンプレートハッシュ, 検証ルールハッシュ, 正規化済み要件)
+    から計算する。メモリ上のLRUを一次キャッシュとし、cache_dirが指定されていれば
+    ディスク上のJSONファイル（キー先頭2文字でシャーディング）を二次キャッシュとして使う。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_entries: int = 256):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(policy_hash: Optional[str], template_hash: Optional[str],
+                 rules_hash: Optional[str], requirements: str, **extra: Any) -> str:
+        """キャッシュキーの計算"""
+        key_data = {
+            'policy': policy_hash,
+            'template': template_hash,
+            'rules': rules_hash,
+            'requirements': normalize_query(requirements)
+        }
+        key_data.update(extra)
+        return compute_content_hash(key_data)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キャッシュエントリの取得"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return entry
+
+        entry = self._read_disk_entry(key)
+
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            # ディスクヒットはメモリに昇格
+            self._stats['disk_hits'] += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """キャッシュエントリの保存"""
+        with self._lock:
+            self._remember(key, entry)
+            self._stats['stores'] += 1
+
+        self._write_disk_entry(key, entry)
+
+    def invalidate(self, key: Optional[str] = None, device_name: Optional[str] = None) -> int:
+        """キャッシュの無効化
+
+        keyもdevice_nameも指定しない場合はキャッシュ全体を無効化する。
+        戻り値は無効化したエントリ数。
+        """
+        with self._lock:
+            if key is None and device_name is None:
+                removed_keys = set(self._memory.keys())
+                self._memory.clear()
+            else:
+                removed_keys = {
+                    k for k, entry in self._memory.items()
+                    if k == key or (device_name is not None and entry.get('device_name') == device_name)
+                }
+                for k in removed_keys:
+                    del self._memory[k]
+
+        for entry_file in self._iter_disk_entries():
+            entry_key = entry_file.stem
+            if key is None and device_name is None:
+                matched = True
+            elif entry_key == key:
+                matched = True
+            elif device_name is not None:
+                entry = self._load_entry_file(entry_file)
+                matched = entry is not None and entry.get('device_name') == device_name
+            else:
+                matched = False
+
+            if not matched:
+                continue
+            try:
+                entry_file.unlink()
+                removed_keys.add(entry_key)
+            except FileNotFoundError:
+                pass
+
+        with self._lock:
+            self._stats['invalidations'] += len(removed_keys)
+
+        return len(removed_keys)
+
+    def clear(self) -> int:
+        """キャッシュ全体のクリア"""
+        return self.invalidate()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計の取得"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['lookups'] = lookups
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['disk_entries'] = sum(1 for _ in self._iter_disk_entries())
+        return stats
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """メモリLRUへの登録（ロック取得済みで呼ぶこと）"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _entry_path(self, key: str) -> Path:
+        """エントリファイルのパス"""
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _iter_disk_entries(self) -> List[Path]:
+        """ディスク上のエントリファイル一覧"""
+        if not self.cache_dir:
+            return []
+        return list(self.cache_dir.glob("*/*.json"))
+
+    def _load_entry_file(self, entry_file: Path) -> Optional[Dict[str, Any]]:
+        """エントリファイルの読み込み"""
+        try:
+            with open(entry_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_disk_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """ディスクからのエントリ読み込み"""
+        if not self.cache_dir:
+            return None
+        return self._load_entry_file(self._entry_path(key))
+
+    def _write_disk_entry(self, key: str, entry: Dict[str, Any]):
+        """ディスクへのエントリ書き込み（一時ファイル経由のアトミック書き込み）"""
+        if not self.cache_dir:
+            return
+
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=str(entry_path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            print(f"Error writing build cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
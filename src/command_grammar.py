@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# command_grammar.py
+"""プラットフォームごとのコマンド文法による構文チェック
+
+knowledge-base/automation/command-grammar.yaml のコマンド定義をモードごとの
+キーワードトライにコンパイルし、各行を1回の走査で検査する。トライの各ノードは
+リテラルの子（辞書引き）と引数の子（型ごとの検査関数）を持ち、行のトークンを
+先頭から順にたどるだけで一致・不一致と誤りの位置が決まる。
+"""
+import re
+import threading
+import weakref
+import yaml
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from .config_parser import ConfigNode, ConfigTree, config_nodes
+from .ipaddr import ip_to_int, is_valid_mask, parse_prefix
+from .platforms import normalize_platform
+from .utils import compute_content_hash
+
+# コンフィグの行のトークン（引用符で囲んだ文字列は1トークン）
+TOKEN_PATTERN = re.compile(r'"[^"]*"|\S+')
+# 文法の記法のトークン
+SPEC_TOKEN_PATTERN = re.compile(r'\{[^}]*\}|\[|\]|\.\.\.|<[^>]+>|[^\s\[\]]+')
+INTERFACE_NAME_PATTERN = re.compile(r'^[A-Za-z][A-Za-z\-]*\d+(?:[/.:]\d+)*$')
+HOSTNAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9.\-_]*$')
+VLAN_LIST_PATTERN = re.compile(r'^\d+(?:-\d+)?(?:,\d+(?:-\d+)?)*$')
+ASN_PATTERN = re.compile(r'^\d+(?:\.\d+)?$')
+
+# 否定・既定値に戻すコマンドの接頭辞（引数を省略できる）
+NEGATION_KEYWORDS = ('no', 'default')
+
+
+def _is_ipv4(token: str) -> bool:
+    try:
+        ip_to_int(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_mask(token: str) -> bool:
+    try:
+        return is_valid_mask(ip_to_int(token))
+    except ValueError:
+        return False
+
+
+def _is_prefix(token: str) -> bool:
+    try:
+        parse_prefix(token)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_host(token: str) -> bool:
+    if token.replace('.', '').isdigit():
+        return _is_ipv4(token)
+    return HOSTNAME_PATTERN.match(token) is not None
+
+
+def _is_vlan_list(token: str) -> bool:
+    if not VLAN_LIST_PATTERN.match(token):
+        return False
+    return all(1 <= int(vlan) <= 4094 for vlan in re.split(r'[,\-]', token))
+
+
+def _is_asn(token: str) -> bool:
+    if not ASN_PATTERN.match(token):
+        return False
+    if '.' in token:
+        high, low = token.split('.')
+        return int(high) <= 65535 and int(low) <= 65535
+    return 1 <= int(token) <= 4294967295
+
+
+def _is_area(token: str) -> bool:
+    return (token.isdigit() and int(token) <= 4294967295) or _is_ipv4(token)
+
+
+# 引数の型 → (検査関数, エラーメッセージ用の名前)
+ARGUMENT_TYPES: Dict[str, Tuple[Callable[[str], bool], str]] = {
+    'word': (lambda token: True, 'word'),
+    'uint': (lambda token: token.isdigit(), 'number'),
+    'ipv4': (_is_ipv4, 'IPv4 address'),
+    'mask': (_is_mask, 'subnet mask'),
+    'wildcard': (_is_ipv4, 'wildcard mask'),
+    'prefix': (_is_prefix, 'IPv4 prefix'),
+    'host': (_is_host, 'host'),
+    'interface': (lambda token: INTERFACE_NAME_PATTERN.match(token) is not None, 'interface name'),
+    'vlan-list': (_is_vlan_list, 'VLAN list'),
+    'asn': (_is_asn, 'AS number'),
+    'area': (_is_area, 'OSPF area'),
+}
+
+
+@dataclass
+class CommandError:
+    """構文エラー（行番号・桁は1始まり、桁は元の行のインデントを含む位置）"""
+    line: int
+    column: int
+    message: str
+    text: str
+
+    def __str__(self) -> str:
+        return f"line {self.line}, column {self.column}: {self.message}: {self.text.strip()}"
+
+
+class _Argument:
+    """引数の子（型と範囲の検査）"""
+    __slots__ = ('type_name', 'low', 'high', 'node')
+
+    def __init__(self, type_name: str, low: Optional[int], high: Optional[int], node: '_GrammarNode'):
+        self.type_name = type_name
+        self.low = low
+        self.high = high
+        self.node = node
+
+    @property
+    def label(self) -> str:
+        name = ARGUMENT_TYPES[self.type_name][1]
+        return f"{name} ({self.low}-{self.high})" if self.low is not None else name
+
+    def accepts(self, token: str) -> bool:
+        if not ARGUMENT_TYPES[self.type_name][0](token):
+            return False
+        if self.low is not None:
+            return self.low <= int(token) <= self.high
+        return True
+
+
+class _GrammarNode:
+    """キーワードトライのノード"""
+    __slots__ = ('keywords', 'sorted_keywords', 'arguments', 'terminal', 'rest', 'mode')
+
+    def __init__(self):
+        self.keywords = {}
+        self.sorted_keywords = []
+        self.arguments = []
+        self.terminal = False
+        self.rest = False  # 以降の語を検査しない
+        self.mode = None   # 配下の行のモード
+
+    def keyword(self, token: str) -> Optional['_GrammarNode']:
+        """リテラルの子（完全一致、なければ一意な省略形）"""
+        token = token.lower()
+        child = self.keywords.get(token)
+        if child is not None:
+            return child
+        index = bisect_left(self.sorted_keywords, token)
+        if index < len(self.sorted_keywords) and self.sorted_keywords[index].startswith(token):
+            following = index + 1
+            if following == len(self.sorted_keywords) or not self.sorted_keywords[following].startswith(token):
+                return self.keywords[self.sorted_keywords[index]]
+        return None
+
+
+def _parse_argument(spec: str) -> Tuple[str, Optional[int], Optional[int]]:
+    """「<型>」「<型:最小-最大>」の解析"""
+    type_name, _, value_range = spec[1:-1].partition(':')
+    if type_name not in ARGUMENT_TYPES:
+        raise ValueError(f"Unknown argument type: {spec}")
+    if not value_range:
+        return type_name, None, None
+    low, _, high = value_range.partition('-')
+    return type_name, int(low), int(high or low)
+
+
+def _expand_spec(tokens: List[str]) -> List[List[str]]:
+    """選択 {a|b} と省略可能 [ ... ] を展開した語の並びの一覧"""
+    if not tokens:
+        return [[]]
+    head = tokens[0]
+    if head == '[':
+        depth = 0
+        for end, token in enumerate(tokens):
+            depth += (token == '[') - (token == ']')
+            if depth == 0:
+                break
+        else:
+            raise ValueError(f"Unbalanced brackets in command spec: {' '.join(tokens)}")
+        rest = _expand_spec(tokens[end + 1:])
+        optional = _expand_spec(tokens[1:end])
+        return [inner + tail for inner in optional for tail in rest] + rest
+    rest = _expand_spec(tokens[1:])
+    if head.startswith('{'):
+        choices = [choice.strip() for choice in head[1:-1].split('|')]
+        return [[choice] + tail for choice in choices for tail in rest]
+    return [[head] + tail for tail in rest]
+
+
+class ModeGrammar:
+    """1つのモード（グローバル・インターフェースなど）のコマンドのトライ"""
+
+    def __init__(self):
+        self.root = _GrammarNode()
+
+    def add(self, spec: str, mode: Optional[str] = None):
+        """コマンド定義の追加"""
+        for sequence in _expand_spec(SPEC_TOKEN_PATTERN.findall(spec)):
+            node = self.root
+            for token in sequence:
+                if token == '...':
+                    node.rest = True
+                    break
+                if token.startswith('<'):
+                    type_name, low, high = _parse_argument(token)
+                    for argument in node.arguments:
+                        if (argument.type_name, argument.low, argument.high) == (type_name, low, high):
+                            node = argument.node
+                            break
+                    else:
+                        argument = _Argument(type_name, low, high, _GrammarNode())
+                        node.arguments.append(argument)
+                        # 何でも受け付ける word は最後に試す
+                        node.arguments.sort(key=lambda argument: argument.type_name == 'word')
+                        node = argument.node
+                    continue
+                token = token.lower()
+                child = node.keywords.get(token)
+                if child is None:
+                    child = node.keywords[token] = _GrammarNode()
+                    node.sorted_keywords = sorted(node.keywords)
+                node = child
+            else:
+                node.terminal = True
+            if mode is not None:
+                node.mode = mode
+
+    def check(self, text: str) -> Tuple[Optional[Tuple[int, str]], bool, Optional[str]]:
+        """1行の検査
+
+        (エラー（桁, メッセージ）, 文法で認識したか, 配下の行のモード) を返す。
+        先頭のキーワードがトライにない行は認識しなかったものとする。
+        """
+        tokens = [(match.start() + 1, match.group()) for match in TOKEN_PATTERN.finditer(text)]
+        negated = len(tokens) > 1 and tokens[0][1].lower() in NEGATION_KEYWORDS
+        position = 1 if negated else 0
+        node = self.root
+        consumed_argument = False
+
+        while position < len(tokens):
+            column, token = tokens[position]
+            child = node.keyword(token)
+            if child is None:
+                for argument in node.arguments:
+                    if argument.accepts(token):
+                        child = argument.node
+                        consumed_argument = True
+                        break
+            if child is None:
+                if node.rest:
+                    break
+                if node.arguments:
+                    expected = ' or '.join(argument.label for argument in node.arguments)
+                    return (column, f"Invalid input '{token}' (expected {expected})"), True, None
+                if node is self.root or not consumed_argument:
+                    # 先頭のキーワードが文法にない・キーワードの途中で外れたコマンドは対象外
+                    return None, False, None
+                return (column, f"Unexpected input '{token}'"), True, None
+            node = child
+            position += 1
+
+        if position == len(tokens) and not (node.terminal or node.rest):
+            if not (negated and node is not self.root):
+                expected = ' or '.join(argument.label for argument in node.arguments) or 'keyword'
+                return (len(text.rstrip()) + 1, f"Incomplete command (expected {expected})"), True, None
+        return None, True, None if negated else node.mode
+
+
+class PlatformGrammar:
+    """1つのプラットフォームの全モードの文法"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.modes: Dict[str, ModeGrammar] = {}
+
+    def add(self, mode: str, spec: str, submode: Optional[str] = None):
+        self.modes.setdefault(mode, ModeGrammar()).add(spec, submode)
+
+    def check(self, config: Union[str, Iterable[str], ConfigTree]) -> List[CommandError]:
+        """コンフィグ全体の検査（行イテレータはツリーを作らずに1行ずつ検査する）"""
+        return self.check_nodes(config_nodes(config))
+
+    def check_nodes(self, nodes: Iterable[ConfigNode]) -> List[CommandError]:
+        """ノードの検査（各行の親のモードで検査し、1行につき1回トライをたどる）"""
+        errors = []
+        # 処理済みの行を引き留めないよう、サブモードは弱参照のキーで覚える
+        modes = weakref.WeakKeyDictionary()
+        for node in nodes:
+            parent = node.parent
+            mode = 'global' if parent is None else modes.get(parent)
+            grammar = self.modes.get(mode) if mode else None
+            error, recognized, submode = grammar.check(node.text) if grammar else (None, False, None)
+            if not recognized:
+                # 文法のないモード・文法にないコマンドは従来の判定のみ
+                error = _fallback_check(node.stripped)
+                if error is not None:
+                    error = (error[0] + node.indent, error[1])
+            if error is not None:
+                column, message = error
+                errors.append(CommandError(node.number, column, message, node.text))
+            elif submode is not None:
+                modes[node] = submode
+        return errors
+
+
+def _fallback_check(stripped: str) -> Optional[Tuple[int, str]]:
+    """文法で認識できない行の判定（従来どおり、複数の語からなるコマンドを受け付ける）"""
+    if ' ' in stripped:
+        return None
+    return 1, f"Unrecognized command '{stripped}'"
+
+
+class CommandGrammar:
+    """全プラットフォームの文法（command-grammar.yaml のコンパイル結果）"""
+
+    def __init__(self, grammar_hash: str, platforms: Dict[str, PlatformGrammar],
+                 default_platform: Optional[str] = None):
+        self.grammar_hash = grammar_hash
+        self.platforms = platforms
+        self.default_platform = default_platform
+
+    def for_platform(self, platform: Optional[str] = None) -> Optional[PlatformGrammar]:
+        """プラットフォームの文法（不明なプラットフォームは既定のプラットフォーム）"""
+        grammar = self.platforms.get(normalize_platform(platform) or '')
+        if grammar is None:
+            grammar = self.platforms.get(self.default_platform or '')
+        return grammar
+
+    def check(self, config: Union[str, Iterable[str], ConfigTree],
+              platform: Optional[str] = None) -> List[CommandError]:
+        """コンフィグの構文エラーの一覧（文法がなければ従来の判定のみ）"""
+        return self.check_nodes(config_nodes(config), platform)
+
+    def check_nodes(self, nodes: Iterable[ConfigNode], platform: Optional[str] = None) -> List[CommandError]:
+        """ノードの構文エラーの一覧（文法がなければ従来の判定のみ）"""
+        grammar = self.for_platform(platform)
+        if grammar is None:
+            grammar = PlatformGrammar('fallback')
+        return grammar.check_nodes(nodes)
+
+
+def _platform_entries(definitions: Dict[str, Any], name: str,
+                      visiting: Tuple[str, ...] = ()) -> Dict[str, List[Any]]:
+    """継承元を含むプラットフォームのモード別コマンド定義"""
+    if name in visiting:
+        raise ValueError(f"Circular grammar inheritance: {' -> '.join(visiting + (name,))}")
+    definition = definitions.get(name) or {}
+    entries = {}
+    parent = definition.get('inherits')
+    if parent:
+        for mode, mode_entries in _platform_entries(definitions, parent, visiting + (name,)).items():
+            entries[mode] = list(mode_entries)
+    for mode, mode_entries in (definition.get('modes') or {}).items():
+        entries.setdefault(mode, []).extend(mode_entries or [])
+    return entries
+
+
+def compile_command_grammar(data: Dict[str, Any], grammar_hash: str) -> CommandGrammar:
+    """文法定義（YAMLの内容）のコンパイル"""
+    definitions = (data or {}).get('platforms') or {}
+    platforms = {}
+    for name in definitions:
+        grammar = PlatformGrammar(name)
+        for mode, entries in _platform_entries(definitions, name).items():
+            for entry in entries:
+                if isinstance(entry, dict):
+                    grammar.add(mode, entry['command'], entry.get('mode'))
+                else:
+                    grammar.add(mode, str(entry))
+        platforms[name] = grammar
+    return CommandGrammar(grammar_hash, platforms, (data or {}).get('default_platform'))
+
+
+_grammar_cache = {}
+_grammar_cache_lock = threading.Lock()
+
+
+def load_command_grammar(path: Union[str, Path]) -> CommandGrammar:
+    """文法ファイルの読み込み（ファイルのハッシュ単位でコンパイル結果をキャッシュ）"""
+    path = Path(path)
+    raw = path.read_bytes() if path.exists() else b''
+    grammar_hash = compute_content_hash(raw)
+    with _grammar_cache_lock:
+        grammar = _grammar_cache.get(grammar_hash)
+        if grammar is None:
+            data = yaml.safe_load(raw.decode('utf-8')) if raw else {}
+            grammar = compile_command_grammar(data, grammar_hash)
+            _grammar_cache[grammar_hash] = grammar
+        return grammar
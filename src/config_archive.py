@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# config_archive.py
+import os
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Any
+
+
+class ConfigSink(ABC):
+    """生成コンフィグの保存先の抽象基底クラス
+
+    1件のレコードは「ファイル名→内容」の辞書（コンフィグ本体と検証結果など）で、
+    保存したメンバーの位置をファイル名と同じ順序で返す。
+    """
+
+    @abstractmethod
+    def write_record(self, name: str, members: Dict[str, str]) -> List[str]:
+        """レコードの書き込み（同名のレコードを置き換えない保存先は FileExistsError を送出する）"""
+        pass
+
+    def flush(self):
+        """バッファの書き出し"""
+        pass
+
+    def close(self):
+        """書き出しとリソースの解放"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DirectorySink(ConfigSink):
+    """メンバーごとに個別ファイルとして保存する（従来のレイアウト）"""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write_record(self, name: str, members: Dict[str, str]) -> List[str]:
+        """メンバーを個別ファイルに書き込み
+
+        既存のファイルは上書きせず FileExistsError を送出する（それまでに書いた
+        このレコードのファイルは削除する）。
+        """
+        paths = []
+        try:
+            for filename, content in members.items():
+                filepath = os.path.join(self.output_dir, filename)
+                with open(filepath, 'x', encoding='utf-8') as f:
+                    paths.append(filepath)
+                    f.write(content)
+        except FileExistsError:
+            for filepath in paths:
+                os.remove(filepath)
+            raise
+        return paths
+
+
+class JSONLArchiveSink(ConfigSink):
+    """多数のレコードをセグメント分割したJSONLアーカイブにまとめて保存する
+
+    レコードは1行1件で `{prefix}-{番号}.jsonl` に追記し、セグメントが
+    `segment_max_bytes` を超えると次のセグメントに切り替える。
+    レコード名からセグメント・オフセット・長さを引けるインデックスを
+    `{prefix}.index.jsonl` に追記する。書き込みはバッファリングし、
+    `sync_every` 件ごと（およびflush/close時）にまとめてfsyncする。
+    レコード名は一意で、既存の名前での書き込みは FileExistsError になる。
+    """
+
+    def __init__(self, output_dir: str, prefix: str = "configs",
+                 segment_max_bytes: int = 64 * 1024 * 1024, sync_every: int = 256,
+                 buffer_size: int = 1024 * 1024):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.segment_max_bytes = segment_max_bytes
+        self.sync_every = sync_every
+        self.buffer_size = buffer_size
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.index_path = os.path.join(output_dir, f"{prefix}.index.jsonl")
+        self._lock = threading.Lock()
+        self._index = self._load_index()
+        self._pending = 0
+
+        # 既存アーカイブがあれば最後のセグメントの末尾から追記する
+        self._segment_no = max((entry['segment'] for entry in self._index.values()), default=0)
+        self._segment = None
+        self._segment_offset = 0
+        self._index_file = open(self.index_path, 'ab', buffering=buffer_size)
+
+    def segment_path(self, segment_no: int) -> str:
+        """セグメントファイルのパス"""
+        return os.path.join(self.output_dir, f"{self.prefix}-{segment_no:05d}.jsonl")
+
+    def write_record(self, name: str, members: Dict[str, str]) -> List[str]:
+        """レコードの追記（位置は「セグメントパス#メンバー名」）"""
+        line = json.dumps({'name': name, 'members': members}, ensure_ascii=False).encode('utf-8') + b'\n'
+
+        with self._lock:
+            # 同名のレコードを書くとインデックスが上書きされ、前のレコードが読めなくなる
+            if name in self._index:
+                raise FileExistsError(f"Record already exists in archive: {name}")
+            segment = self._current_segment(len(line))
+            offset = self._segment_offset
+            segment.write(line)
+            self._segment_offset += len(line)
+
+            entry = {'name': name, 'segment': self._segment_no, 'offset': offset, 'length': len(line)}
+            self._index_file.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+            self._index[name] = entry
+
+            self._pending += 1
+            if self._pending >= self.sync_every:
+                self._sync()
+
+        path = self.segment_path(entry['segment'])
+        return [f"{path}#{filename}" for filename in members]
+
+    def read_record(self, name: str) -> Optional[Dict[str, str]]:
+        """インデックスを使ったレコードの読み出し"""
+        with self._lock:
+            entry = self._index.get(name)
+            if entry is None:
+                return None
+            if self._segment is not None and entry['segment'] == self._segment_no:
+                self._segment.flush()
+
+        with open(self.segment_path(entry['segment']), 'rb') as f:
+            f.seek(entry['offset'])
+            record = json.loads(f.read(entry['length']))
+        return record['members']
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """全レコードを書き込み順に返す"""
+        self.flush()
+        for entry in sorted(self._index.values(), key=lambda e: (e['segment'], e['offset'])):
+            with open(self.segment_path(entry['segment']), 'rb') as f:
+                f.seek(entry['offset'])
+                yield json.loads(f.read(entry['length']))
+
+    def names(self) -> List[str]:
+        """格納済みレコード名の一覧"""
+        with self._lock:
+            return list(self._index)
+
+    def flush(self):
+        """バッファの書き出しとfsync"""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """書き出しとファイルのクローズ"""
+        with self._lock:
+            self._sync()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            if not self._index_file.closed:
+                self._index_file.close()
+
+    def _current_segment(self, incoming: int):
+        """書き込み先セグメント（上限を超える場合は次のセグメントへ切り替え）"""
+        if self._segment is None:
+            path = self.segment_path(self._segment_no)
+            self._segment_offset = os.path.getsize(path) if os.path.exists(path) else 0
+            self._segment = open(path, 'ab', buffering=self.buffer_size)
+
+        if self._segment_offset and self._segment_offset + incoming > self.segment_max_bytes:
+            self._sync()
+            self._segment.close()
+            self._segment_no += 1
+            self._segment_offset = 0
+            self._segment = open(self.segment_path(self._segment_no), 'ab', buffering=self.buffer_size)
+
+        return self._segment
+
+    def _sync(self):
+        """データ→インデックスの順でまとめてfsync（ロック取得済みで呼ぶこと）"""
+        if self._segment is not None:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+        if not self._index_file.closed:
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+        self._pending = 0
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """既存インデックスの読み込み（途中で切れた末尾行は無視）"""
+        index = {}
+        if not os.path.exists(self.index_path):
+            return index
+
+        with open(self.index_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                index[entry['name']] = entry
+        return index
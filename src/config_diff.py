@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# config_diff.py
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from .config_parser import ConfigBlock, parse_config_blocks, index_blocks
+
+# 行単位の差分操作（' ' = 共通, '-' = 削除, '+' = 追加）
+LineOp = Tuple[str, str]
+
+# サブモードの先頭語→サブモードを抜けるコマンド（その他は exit）
+SUBMODE_EXIT_COMMANDS = {
+    'address-family': 'exit-address-family',
+}
+EXIT_COMMANDS = set(SUBMODE_EXIT_COMMANDS.values()) | {'exit'}
+
+
+def myers_diff(old: Sequence[str], new: Sequence[str]) -> List[LineOp]:
+    """Myersのアルゴリズムによる行単位の差分（O((N+M)D)）"""
+    # 共通の先頭・末尾は差分計算の対象から外す
+    prefix = 0
+    while prefix < len(old) and prefix < len(new) and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < len(old) - prefix and suffix < len(new) - prefix
+           and old[-1 - suffix] == new[-1 - suffix]):
+        suffix += 1
+
+    ops = [(' ', line) for line in old[:prefix]]
+    ops.extend(_myers_middle(old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]))
+    ops.extend((' ', line) for line in old[len(old) - suffix:])
+    return ops
+
+
+def _myers_middle(old: Sequence[str], new: Sequence[str]) -> List[LineOp]:
+    """Myersのアルゴリズム本体（最短編集スクリプトの探索と復元）"""
+    n, m = len(old), len(new)
+    if not n:
+        return [('+', line) for line in new]
+    if not m:
+        return [('-', line) for line in old]
+
+    v = {1: 0}
+    trace = []
+    for d in range(n + m + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and old[x] == new[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, old, new)
+
+    return []
+
+
+def _myers_backtrack(trace: List[Dict[int, int]], old: Sequence[str], new: Sequence[str]) -> List[LineOp]:
+    """探索の記録から編集スクリプトを復元"""
+    x, y = len(old), len(new)
+    ops = []
+
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            ops.append((' ', old[x]))
+
+        if d > 0:
+            if x == prev_x:
+                ops.append(('+', new[prev_y]))
+            else:
+                ops.append(('-', old[prev_x]))
+        x, y = prev_x, prev_y
+
+    ops.reverse()
+    return ops
+
+
+@dataclass
+class BlockChange:
+    """トップレベルブロック単位の差分"""
+    key: str
+    kind: str  # 'unchanged' | 'added' | 'removed' | 'modified'
+    old_block: Optional[ConfigBlock] = None
+    new_block: Optional[ConfigBlock] = None
+    line_ops: List[LineOp] = field(default_factory=list)
+
+
+@dataclass
+class ConfigDiff:
+    """コンフィグ全体の差分（新コンフィグの順序、削除ブロックは旧コンフィグでの位置）"""
+    blocks: List[BlockChange]
+
+    @property
+    def changes(self) -> List[BlockChange]:
+        """変更のあったブロック"""
+        return [block for block in self.blocks if block.kind != 'unchanged']
+
+    @property
+    def has_changes(self) -> bool:
+        return any(block.kind != 'unchanged' for block in self.blocks)
+
+
+def diff_configs(old_config: str, new_config: str) -> ConfigDiff:
+    """ブロック構造を考慮したコンフィグの差分
+
+    トップレベルブロックをキー（`interface X` などのヘッダー）で照合し、
+    内容のハッシュが一致するブロックは比較を省略する。内容が変わった
+    ブロックのみ配下の行をMyersのアルゴリズムで比較する。
+    ブロックの並び順の違いは変更として扱わない。
+    """
+    old_blocks = parse_config_blocks(old_config)
+    new_blocks = parse_config_blocks(new_config)
+    old_index = index_blocks(old_blocks)
+    new_index = index_blocks(new_blocks)
+
+    # 削除されたブロックは旧コンフィグで直前にあった残存ブロックの後ろに置く
+    removed_after = {}
+    anchor = None
+    for block in old_blocks:
+        if block.key in new_index:
+            anchor = block.key
+        else:
+            removed_after.setdefault(anchor, []).append(
+                BlockChange(key=block.key, kind='removed', old_block=block)
+            )
+
+    entries = list(removed_after.get(None, []))
+    for block in new_blocks:
+        old_block = old_index.get(block.key)
+        if old_block is None:
+            entries.append(BlockChange(key=block.key, kind='added', new_block=block))
+        elif old_block.fingerprint == block.fingerprint and old_block.lines == block.lines:
+            entries.append(BlockChange(key=block.key, kind='unchanged', old_block=old_block, new_block=block))
+        else:
+            entries.append(BlockChange(
+                key=block.key, kind='modified', old_block=old_block, new_block=block,
+                line_ops=myers_diff(old_block.children, block.children)
+            ))
+        if old_block is not None:
+            entries.extend(removed_after.get(block.key, []))
+
+    return ConfigDiff(blocks=entries)
+
+
+def negate_command(command: str) -> str:
+    """コマンドを取り消すコマンド（`no` の付与・除去）"""
+    stripped = command.strip()
+    if stripped.startswith('no '):
+        return stripped[3:].lstrip()
+    return f"no {stripped}"
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _parent_index(lines: Sequence[str], index: int) -> Optional[int]:
+    """ブロック内で1段浅いインデントの直近の行（address-familyなどのサブモード）"""
+    indent = _indent(lines[index])
+    for i in range(index - 1, -1, -1):
+        if _indent(lines[i]) < indent:
+            return i
+    return None
+
+
+def _exit_command(submode_line: str) -> str:
+    """サブモードを抜けるコマンド（親の行と同じインデント）"""
+    keyword = submode_line.split(None, 1)[0]
+    return ' ' * _indent(submode_line) + SUBMODE_EXIT_COMMANDS.get(keyword, 'exit')
+
+
+def _modified_block_delta(change: BlockChange, prune: bool = True) -> List[str]:
+    """内容が変わったブロックの投入コマンド（prune=Falseでは削除行を取り消さない）
+
+    サブモード（address-family など）配下の行は親の行でサブモードに入ってから投入し、
+    サブモードの外の行に移る前とブロックの最後では exit-address-family などで抜ける。
+    """
+    old_children = change.old_block.children
+    new_children = change.new_block.children
+    delta = [change.new_block.header]
+
+    old_pos = new_pos = 0
+    removed = set()
+    submode = None
+    for op, line in change.line_ops:
+        if op == ' ':
+            old_pos += 1
+            new_pos += 1
+            continue
+
+        if op == '-':
+            if not prune:
+                old_pos += 1
+                continue
+            lines = old_children
+            parent = _parent_index(old_children, old_pos)
+            removed.add(old_pos)
+            old_pos += 1
+            # 親のサブモードごと削除される行は個別に取り消さない
+            # （サブモードを抜ける行は下で必要な位置に出力する）
+            if (parent is not None and parent in removed) or line.strip() in EXIT_COMMANDS:
+                continue
+            command = ' ' * _indent(line) + negate_command(line)
+        else:
+            lines = new_children
+            parent = _parent_index(new_children, new_pos)
+            new_pos += 1
+            if line.strip() in EXIT_COMMANDS:
+                continue
+            command = line
+
+        parent_line = lines[parent] if parent is not None else None
+        if parent_line != submode:
+            if submode is not None:
+                delta.append(_exit_command(submode))
+            if parent_line is not None:
+                delta.append(parent_line)
+            submode = parent_line
+        delta.append(command)
+
+        # 配下の行を伴って追加された行はそのままサブモードに入る
+        if op == '+' and new_pos < len(new_children) and _indent(new_children[new_pos]) > _indent(line):
+            submode = line
+
+    if submode is not None:
+        delta.append(_exit_command(submode))
+    return delta
+
+
+def render_ios_delta(diff: ConfigDiff, prune: bool = True) -> str:
+    """差分をそのまま投入できるIOS形式のコマンド列に変換
+
+    prune=Falseの場合は追加・変更のみを出力し、新コンフィグにない
+    ブロックや行は残す（一部の設定だけを表すコンフィグとのマージ用）。
+    """
+    delta = []
+    for change in diff.changes:
+        if change.kind == 'removed':
+            if prune:
+                delta.append(negate_command(change.old_block.header))
+            continue
+        if change.kind == 'added':
+            delta.extend(change.new_block.lines)
+        else:
+            block_delta = _modified_block_delta(change, prune)
+            if len(block_delta) == 1:
+                continue
+            delta.extend(block_delta)
+        if change.new_block.children:
+            delta.append('!')
+
+    if delta and delta[-1] != '!':
+        delta.append('!')
+    if delta:
+        delta.append('end')
+    return '\n'.join(delta)
+
+
+def generate_config_delta(old_config: str, new_config: str, prune: bool = True) -> str:
+    """旧コンフィグを新コンフィグにするための投入コマンド"""
+    return render_ios_delta(diff_configs(old_config, new_config), prune)
@@ -5,13 +5,47 @@
 #!/usr/bin/env python3
 # config_generator.py
 import re
+import copy
 import json
-import os
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import asyncio
+import itertools
+from typing import AsyncIterator, Dict, Generator, Iterable, List, Optional, Any, Union
+from dataclasses import dataclass, asdict, fields, replace
 from datetime import datetime
 from .knowledge_base import KnowledgeBase, DevicePolicy
 from .rag_system import NetworkRAGSystem
+from .build_cache import BuildCache
+from .llm_backend import LLMBackend
+from .llm_cache import LLMResponseCache, CachedLLMBackend
+from .singleflight import SingleFlight
+from .config_store import ConfigStore, MemoryConfigStore
+from .config_archive import ConfigSink, DirectorySink
+from .config_sections import (
+    ConfigSection, SectionSplitter, split_config_sections, merge_validation_results
+)
+from .config_diff import diff_configs, render_ios_delta
+from .validation import ConfigValidator
+from .ipaddr import is_private_ip
+from .fleet_validation import validate_many
+from .validation_cache import ValidationCache
+from .address_index import extract_addresses
+from .config_parser import ConfigTree, parse_config_tree
+from .utils import compute_content_hash, normalize_query
+
+# generate_config の出力モード（full: コンフィグ全体, delta: running-configとの差分）
+OUTPUT_MODES = ('full', 'delta')
+
+# テンプレート変数ごとに参照するポリシーのフィールド
+# （セクション単位の差分再生成で、変更の影響を受けるセクションの判定に使う）
+TEMPLATE_VARIABLE_DEPENDENCIES = {
+    'router_id': ('ospf_config',),
+    'basic_settings': (),
+    'interfaces': ('interfaces',),
+    'ospf_networks': ('ospf_config',),
+    'security_settings': ('security_config',),
+    'ha_settings': ('ha_config',),
+    'monitoring_settings': ('monitoring_config',),
+}
 
 @dataclass
 class GeneratedConfig:
@@ -23,27 +57,239 @@ class GeneratedConfig:
     metadata: Dict[str, Any]
 
 class NetworkConfigGenerator:
-    def __init__(self, kb_dir: str = "/workspace/network-rag-system/knowledge-base"):
+    def __init__(self, kb_dir: str = "/workspace/network-rag-system/knowledge-base",
+                 cache_dir: Optional[str] = None, use_build_cache: bool = True,
+                 llm_backend: Optional[LLMBackend] = None,
+                 llm_cache: Optional[LLMResponseCache] = None,
+                 config_store: Optional[ConfigStore] = None,
+                 validation_cache: Optional[ValidationCache] = None,
+                 use_validation_cache: bool = True):
         self.kb = KnowledgeBase(kb_dir)
         self.rag_system = NetworkRAGSystem(kb_dir)
-        self.generated_configs = []
+        # 生成履歴のストア（既定は最近の結果のみを保持するリングバッファ）
+        self.config_store = config_store if config_store is not None else MemoryConfigStore()
+        # ビルドキャッシュ（cache_dir指定時はディスクにも永続化）
+        self.build_cache = BuildCache(cache_dir) if use_build_cache else None
+        # LLMバックエンド（未指定時はテンプレートからレンダリング）
+        # 応答キャッシュが指定されていればバックエンドの前段に置く
+        self.llm_cache = llm_cache
+        if llm_backend is not None and llm_cache is not None:
+            llm_backend = CachedLLMBackend(llm_backend, llm_cache)
+        self.llm_backend = llm_backend
+        # 同一クエリ・同一プロンプトの同時実行をまとめる
+        self.single_flight = SingleFlight()
+        # 検証エンジン（コンフィグを1回だけ走査して全ルールを実行）
+        self.validator = ConfigValidator()
+        # 検証結果のキャッシュ（同じ内容・同じルールのコンフィグは再検証しない）
+        if validation_cache is None and use_validation_cache:
+            validation_cache = ValidationCache()
+        self.validation_cache = validation_cache
+        # デバイスごとの前回レンダリング結果（入力シグネチャ→セクション）
+        self._section_renders = {}
+    
+    def generate_config(self, query: str, mode: str = "full") -> GeneratedConfig:
+        """コンフィグの生成
+        
+        mode="delta" の場合は、デバイスの最新のrunning-configとの差分
+        （投入が必要な追加・変更コマンドのみ）を返す。
+        """
+        self._check_output_mode(mode)
+        # 同じクエリが同時に要求された場合は1回だけ生成して結果を共有する
+        generated_config, _ = self.single_flight.do(
+            self._single_flight_key(query, mode), lambda: self._generate_config(query, mode)
+        )
+        return generated_config
+    
+    async def agenerate_config(self, query: str, mode: str = "full") -> GeneratedConfig:
+        """コンフィグの生成（非同期版）"""
+        self._check_output_mode(mode)
+        generated_config, _ = await self.single_flight.ado(
+            self._single_flight_key(query, mode), lambda: self._agenerate_config(query, mode)
+        )
+        return generated_config
     
-    def generate_config(self, query: str) -> GeneratedConfig:
-        """コンフィグの生成"""
+    def _check_output_mode(self, mode: str):
+        """出力モードの確認"""
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode: {mode} (expected one of {', '.join(OUTPUT_MODES)})")
+    
+    def _single_flight_key(self, query: str, mode: str = "full") -> str:
+        """同時実行をまとめるためのキー"""
+        return f"query:{mode}:{normalize_query(query)}"
+    
+    def _generate_config(self, query: str, mode: str = "full") -> GeneratedConfig:
+        """コンフィグの生成本体（出力モードの適用と履歴への登録）"""
+        generated_config = self._generate_full_config(query)
+        if mode == "delta":
+            generated_config = self._to_delta_config(generated_config)
+        self.config_store.add(generated_config)
+        return generated_config
+    
+    async def _agenerate_config(self, query: str, mode: str = "full") -> GeneratedConfig:
+        """コンフィグの生成本体（非同期版）"""
+        generated_config = await self._agenerate_full_config(query)
+        if mode == "delta":
+            generated_config = self._to_delta_config(generated_config)
+        self.config_store.add(generated_config)
+        return generated_config
+    
+    def _generate_full_config(self, query: str) -> GeneratedConfig:
+        """コンフィグ全体の生成"""
         print(f"Generating config for query: {query}")
         
+        # ビルドキャッシュの確認（ヒットすればプロンプト生成・レンダリング・検証を省略）
+        cache_key, cached_entry = self._lookup_build_cache(query)
+        if cached_entry is not None:
+            return self._restore_cached_config(query, cached_entry)
+        
         # RAGシステムでプロンプトを生成
         prompt = self.rag_system.generate_config_prompt(query)
         
-        # ここで実際のLLM呼び出しを行う（ダミー実装）
-        config_content = self._generate_config_content(prompt)
+        # LLMバックエンド（またはテンプレート）でセクションごとに生成・検証
+        sections = list(self._iter_config_sections(prompt))
+        
+        return self._finalize_sections(query, sections, cache_key)
+    
+    async def _agenerate_full_config(self, query: str) -> GeneratedConfig:
+        """コンフィグ全体の生成（非同期版）"""
+        print(f"Generating config for query: {query}")
+        
+        cache_key, cached_entry = self._lookup_build_cache(query)
+        if cached_entry is not None:
+            return self._restore_cached_config(query, cached_entry)
+        
+        prompt = self.rag_system.generate_config_prompt(query)
+        
+        # LLM呼び出し中は他のリクエストに制御を譲る
+        if self.llm_backend is not None:
+            config_content, _ = await self.single_flight.ado(
+                f"prompt:{compute_content_hash(prompt)}", lambda: self.llm_backend.agenerate(prompt)
+            )
+            sections = self._sections_from_text(config_content)
+        else:
+            sections = list(self._iter_template_sections(prompt))
+        
+        return self._finalize_sections(query, sections, cache_key)
+    
+    def generate_config_stream(self, query: str) -> Generator[ConfigSection, None, GeneratedConfig]:
+        """コンフィグのストリーミング生成
+
+        セクション（basic, interfaces, ospf, security, ha, monitoring など）を
+        レンダリング・検証が終わった順に返す。全セクションを返し終えると
+        GeneratedConfigを組み立てて履歴・ビルドキャッシュに登録し、
+        ジェネレーターの戻り値として返す。
+        """
+        print(f"Streaming config for query: {query}")
+        
+        cache_key, cached_entry = self._lookup_build_cache(query)
+        if cached_entry is not None:
+            yield from self._sections_from_cache(cached_entry)
+            generated_config = self._restore_cached_config(query, cached_entry)
+            self.config_store.add(generated_config)
+            return generated_config
+        
+        prompt = self.rag_system.generate_config_prompt(query)
+        
+        sections = []
+        if self.llm_backend is not None:
+            # LLMのトークンストリームをセクション境界で区切りながら検証する
+            splitter = SectionSplitter()
+            for chunk in self.llm_backend.stream(prompt):
+                for name, text in splitter.feed(chunk):
+                    section = self._build_section(name, text)
+                    sections.append(section)
+                    yield section
+            for name, text in splitter.flush():
+                section = self._build_section(name, text)
+                sections.append(section)
+                yield section
+        else:
+            for section in self._iter_template_sections(prompt):
+                sections.append(section)
+                yield section
+        
+        generated_config = self._finalize_sections(query, sections, cache_key)
+        self.config_store.add(generated_config)
+        return generated_config
+    
+    async def agenerate_config_stream(self, query: str) -> AsyncIterator[ConfigSection]:
+        """コンフィグのストリーミング生成（非同期版）"""
+        print(f"Streaming config for query: {query}")
         
-        # 検証
-        validation_result = self._validate_config(config_content)
+        cache_key, cached_entry = self._lookup_build_cache(query)
+        if cached_entry is not None:
+            for section in self._sections_from_cache(cached_entry):
+                yield section
+            self.config_store.add(self._restore_cached_config(query, cached_entry))
+            return
+        
+        prompt = self.rag_system.generate_config_prompt(query)
+        
+        sections = []
+        if self.llm_backend is not None:
+            splitter = SectionSplitter()
+            async for chunk in self.llm_backend.astream(prompt):
+                for name, text in splitter.feed(chunk):
+                    section = self._build_section(name, text)
+                    sections.append(section)
+                    yield section
+            for name, text in splitter.flush():
+                section = self._build_section(name, text)
+                sections.append(section)
+                yield section
+        else:
+            for section in self._iter_template_sections(prompt):
+                sections.append(section)
+                yield section
+        
+        self.config_store.add(self._finalize_sections(query, sections, cache_key))
+    
+    async def agenerate_configs(self, queries: List[str], max_concurrency: int = 4) -> List[GeneratedConfig]:
+        """複数コンフィグの並行生成（最大max_concurrency件を同時に処理）"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(query: str) -> GeneratedConfig:
+            async with semaphore:
+                return await self.agenerate_config(query)
+        
+        return list(await asyncio.gather(*(run(query) for query in queries)))
+    
+    def generate_configs(self, queries: List[str], max_concurrency: int = 4) -> List[GeneratedConfig]:
+        """複数コンフィグの並行生成（同期API）"""
+        return asyncio.run(self.agenerate_configs(queries, max_concurrency))
+    
+    def _lookup_build_cache(self, query: str) -> tuple:
+        """ビルドキャッシュの参照（キャッシュキーとヒットしたエントリを返す）"""
+        if self.build_cache is None:
+            return None, None
+        
+        cache_key = self._build_cache_key(query)
+        return cache_key, self.build_cache.get(cache_key)
+    
+    def _restore_cached_config(self, query: str, cached_entry: Dict[str, Any]) -> GeneratedConfig:
+        """キャッシュヒットしたコンフィグの復元"""
+        # 他デバイスのアドレスは生成後に変わりうるため、競合はキャッシュせず毎回調べる
+        return self._check_address_conflicts(self._config_from_cache_entry(query, cached_entry))
+    
+    def _finalize_sections(self, query: str, sections: List[ConfigSection],
+                           cache_key: Optional[str]) -> GeneratedConfig:
+        """セクションの結合・検証結果の統合・メタデータ付与・キャッシュ登録"""
+        config_content = ''.join(section.content for section in sections)
         
         # メタデータの生成
         metadata = self._generate_metadata(query, config_content)
         
+        # 検証（セクションごとの結果を統合し、コンフィグ全体が必要なルールのみ追加で実行）
+        # 解析したツリーはアドレス競合のチェックでも共有する
+        policy = self.kb.get_device_policy(metadata.get('device_name'))
+        config_scope_result = self._validate_config(
+            parse_config_tree(config_content), policy.device_type if policy else None, scope='config'
+        )
+        validation_result = merge_validation_results(
+            [section.validation_result for section in sections] + [config_scope_result]
+        )
+        metadata['reused_sections'] = [section.name for section in sections if section.reused]
+        
         # 生成されたコンフィグの保存
         generated_config = GeneratedConfig(
             device_name=metadata.get('device_name', 'unknown'),
@@ -53,15 +299,151 @@ class NetworkConfigGenerator:
             metadata=metadata
         )
         
-        self.generated_configs.append(generated_config)
-        
+        if cache_key is not None:
+            metadata['build_cache'] = 'miss'
+            self.build_cache.put(cache_key, {
+                'device_name': generated_config.device_name,
+                'config_type': generated_config.config_type,
+                'config_content': config_content,
+                'validation_result': validation_result,
+                'sections': [asdict(section) for section in sections]
+            })
+        
+        return self._check_address_conflicts(generated_config)
+    
+    def _check_address_conflicts(self, generated_config: GeneratedConfig) -> GeneratedConfig:
+        """生成したコンフィグのアドレスと他デバイスのアドレスの競合チェック（警告として追加）"""
+        index = self.kb.get_address_index()
+        conflicts = []
+        tree = parse_config_tree(generated_config.config_content)
+        for entry in extract_addresses(generated_config.device_name, tree, source='generated'):
+            conflicts.extend(index.check(entry, exclude_device=generated_config.device_name))
+        
+        generated_config.metadata['address_conflicts'] = [conflict.to_dict() for conflict in conflicts]
+        if conflicts:
+            # キャッシュに登録した検証結果は変更しない
+            validation_result = dict(generated_config.validation_result)
+            validation_result['warnings'] = validation_result['warnings'] + [conflict.message for conflict in conflicts]
+            generated_config.validation_result = validation_result
         return generated_config
     
-    def _generate_config_content(self, prompt: str) -> str:
-        """コンフィグコンテンツの生成（ダミー実装）"""
-        # 実際にはLLMを呼び出してコンフィグを生成
-        # ここではダミーのコンフィグを返す
+    def _to_delta_config(self, full_config: GeneratedConfig) -> GeneratedConfig:
+        """生成したコンフィグを最新のrunning-configとの差分に変換
+        
+        テンプレートから生成したコンフィグはデバイス設定の一部のみを表すため、
+        running-configにしかない設定は削除せず、追加・変更のコマンドのみを出力する。
+        差分が小さいため検証も差分に対してのみ行う。
+        """
+        snapshot = self.kb.get_latest_running_config(full_config.device_name)
+        if snapshot is None:
+            # 比較対象がない場合はコンフィグ全体を返す
+            metadata = dict(full_config.metadata)
+            metadata['output_mode'] = 'full'
+            metadata['delta_base'] = None
+            return replace(full_config, metadata=metadata)
+        
+        diff = diff_configs(snapshot.content, full_config.config_content)
+        delta_content = render_ios_delta(diff, prune=False)
+        
+        metadata = dict(full_config.metadata)
+        metadata.update({
+            'output_mode': 'delta',
+            'delta_base': snapshot.path,
+            'delta_base_date': snapshot.date,
+            'full_config_length': len(full_config.config_content),
+            'config_length': len(delta_content),
+            'line_count': len(delta_content.split('\n')),
+            'changed_blocks': [change.key for change in diff.changes if change.kind != 'removed']
+        })
+        
+        return GeneratedConfig(
+            device_name=full_config.device_name,
+            config_type=full_config.config_type,
+            config_content=delta_content,
+            validation_result=self._validate_config(delta_content, scope='line'),
+            metadata=metadata
+        )
+    
+    def _build_cache_key(self, query: str) -> str:
+        """ビルドキャッシュキーの計算"""
+        # クエリでデバイスが明示されていない場合やLLMを使う場合（プロンプトに
+        # 他デバイスのポリシーも含まれる）は、全ポリシーを入力とみなす
+        if self.llm_backend is None and re.search(r'(?:R1|R2|SW1)', query):
+            device_name = self._extract_device_name_from_prompt(query)
+            policy_hash = self.kb.get_policy_hash(device_name)
+        else:
+            policy_hash = self.kb.get_policies_hash()
+        
+        # LLMバックエンド使用時はモデル・パラメータも出力に影響する
+        backend_identity = self.llm_backend.get_cache_identity() if self.llm_backend else None
         
+        return BuildCache.make_key(
+            policy_hash=policy_hash,
+            template_hash=self.kb.get_template_hash("router-template"),
+            rules_hash=self.kb.get_validation_rules_hash(),
+            requirements=query,
+            backend=backend_identity
+        )
+    
+    def _config_from_cache_entry(self, query: str, entry: Dict[str, Any]) -> GeneratedConfig:
+        """キャッシュエントリからGeneratedConfigを復元"""
+        metadata = self._generate_metadata(query, entry['config_content'])
+        metadata['build_cache'] = 'hit'
+        
+        return GeneratedConfig(
+            device_name=entry['device_name'],
+            config_type=entry['config_type'],
+            config_content=entry['config_content'],
+            validation_result=copy.deepcopy(entry['validation_result']),
+            metadata=metadata
+        )
+    
+    def get_build_cache_stats(self) -> Dict[str, Any]:
+        """ビルドキャッシュ統計の取得"""
+        if self.build_cache is None:
+            return {}
+        return self.build_cache.get_stats()
+    
+    def get_single_flight_stats(self) -> Dict[str, Any]:
+        """同時実行まとめ（single-flight）統計の取得"""
+        return self.single_flight.get_stats()
+    
+    def get_validation_cache_stats(self) -> Dict[str, Any]:
+        """検証結果キャッシュ統計の取得"""
+        if self.validation_cache is None:
+            return {}
+        return self.validation_cache.get_stats()
+    
+    def get_llm_cache_stats(self) -> Dict[str, Any]:
+        """LLM応答キャッシュ統計の取得"""
+        if self.llm_cache is None:
+            return {}
+        return self.llm_cache.get_stats()
+    
+    def invalidate_build_cache(self, device_name: Optional[str] = None) -> int:
+        """ビルドキャッシュの無効化（device_name省略時は全件）"""
+        if self.build_cache is None:
+            return 0
+        return self.build_cache.invalidate(device_name=device_name)
+    
+    def _generate_config_content(self, prompt: str) -> str:
+        """コンフィグコンテンツの生成"""
+        return ''.join(section.content for section in self._iter_config_sections(prompt))
+    
+    def _iter_config_sections(self, prompt: str) -> Generator[ConfigSection, None, None]:
+        """コンフィグをセクション単位で生成・検証"""
+        if self.llm_backend is not None:
+            # 異なるクエリでもプロンプトが同一ならLLM呼び出しは1回にまとめる
+            config_content, _ = self.single_flight.do(
+                f"prompt:{compute_content_hash(prompt)}", lambda: self.llm_backend.generate(prompt)
+            )
+            yield from self._sections_from_text(config_content)
+            return
+        
+        yield from self._iter_template_sections(prompt)
+    
+    def _iter_template_sections(self, prompt: str) -> Generator[ConfigSection, None, None]:
+        """テンプレートからのセクション単位のレンダリング（LLM未使用時）"""
         # プロンプトからデバイス名を抽出
         device_name = self._extract_device_name_from_prompt(prompt)
         
@@ -72,10 +454,87 @@ class NetworkConfigGenerator:
         else:
             template = template.content
         
-        # テンプレートの変数置換
-        config_content = self._substitute_template_variables(template, device_name, prompt)
+        policy = self.kb.get_device_policy(device_name)
+        requirements = self._extract_requirements_from_prompt(prompt)
         
-        return config_content
+        # セクションごとに変数を置換し、完成したものから検証して返す。
+        # 入力（テンプレート・参照するポリシーフィールド・要件・検証ルール）が
+        # 前回と同じセクションは再レンダリング・再検証せず前回の結果を使う
+        previous_renders = self._section_renders.get(device_name, {})
+        current_renders = {}
+        for name, section_template in split_config_sections(template):
+            signature = self._section_signature(section_template, device_name, policy, requirements)
+            section = previous_renders.get(signature)
+            if section is None:
+                content = self._render_section(section_template, device_name, policy, requirements)
+                section = self._build_section(name, content)
+                current_renders[signature] = section
+                yield section
+            else:
+                current_renders[signature] = section
+                yield replace(section, reused=True)
+        
+        self._section_renders[device_name] = current_renders
+    
+    def _section_signature(self, section_template: str, device_name: str,
+                           policy: Optional[DevicePolicy], requirements: str) -> str:
+        """セクションの入力シグネチャ（依存するポリシーフィールドのみを含む）"""
+        dependent_fields = set()
+        for variable, policy_fields in TEMPLATE_VARIABLE_DEPENDENCIES.items():
+            if '{{' + variable + '}}' in section_template:
+                dependent_fields.update(policy_fields)
+        
+        return compute_content_hash({
+            'template': section_template,
+            'device_name': device_name,
+            'has_policy': policy is not None,
+            'policy_fields': {
+                field_name: getattr(policy, field_name) for field_name in sorted(dependent_fields)
+            } if policy else {},
+            'requirements': requirements if '{{requirements}}' in section_template else None,
+            'rules': self.kb.get_validation_rules_hash()
+        })
+    
+    def update_device_policy(self, device_name: str, **changes: Any) -> List[str]:
+        """デバイスポリシーの一部フィールドを更新（変更されたフィールド名を返す）
+
+        次回の生成では、変更されたフィールドに依存するセクションだけが
+        再レンダリング・再検証される。
+        """
+        policy = self.kb.get_device_policy(device_name)
+        if policy is None:
+            raise KeyError(f"Unknown device: {device_name}")
+        
+        valid_fields = {f.name for f in fields(DevicePolicy)}
+        unknown_fields = set(changes) - valid_fields
+        if unknown_fields:
+            raise ValueError(f"Unknown policy fields: {', '.join(sorted(unknown_fields))}")
+        
+        changed_fields = [name for name, value in changes.items() if getattr(policy, name) != value]
+        if not changed_fields:
+            return []
+        
+        updated_policy = replace(policy, **changes)
+        self.kb.set_device_policy(device_name, updated_policy)
+        # プロンプト生成側の知識ベースにも反映
+        self.rag_system.kb.set_device_policy(device_name, replace(updated_policy))
+        
+        return changed_fields
+    
+    def _sections_from_text(self, config_content: str) -> List[ConfigSection]:
+        """生成済みテキストのセクション分割と検証"""
+        return [self._build_section(name, text) for name, text in split_config_sections(config_content)]
+    
+    def _sections_from_cache(self, cached_entry: Dict[str, Any]) -> List[ConfigSection]:
+        """キャッシュエントリからのセクション復元"""
+        if 'sections' not in cached_entry:
+            return self._sections_from_text(cached_entry['config_content'])
+        return [ConfigSection(**copy.deepcopy(section)) for section in cached_entry['sections']]
+    
+    def _build_section(self, name: str, content: str) -> ConfigSection:
+        """セクションの検証"""
+        return ConfigSection(name=name, content=content,
+                             validation_result=self._validate_config(content, scope='line'))
     
     def _extract_device_name_from_prompt(self, prompt: str) -> str:
         """プロンプトからデバイス名を抽出"""
@@ -121,21 +580,37 @@ ntp server 192.168.100.100
         """テンプレート変数の置換"""
         # デバイスポリシーの取得
         policy = self.kb.get_device_policy(device_name)
+        requirements = self._extract_requirements_from_prompt(prompt)
         
-        # 変数の置換
-        config = template.replace('{{hostname}}', device_name)
+        return ''.join(
+            self._render_section(section_template, device_name, policy, requirements)
+            for _, section_template in split_config_sections(template)
+        )
+    
+    def _template_variable_renderers(self) -> Dict[str, Any]:
+        """ポリシーから値を生成するテンプレート変数と生成関数の対応"""
+        return {
+            'router_id': lambda policy: policy.ospf_config.get('router_id', '10.1.1.1'),
+            'basic_settings': self._generate_basic_settings,
+            'interfaces': self._generate_interfaces,
+            'ospf_networks': self._generate_ospf_networks,
+            'security_settings': self._generate_security_settings,
+            'ha_settings': self._generate_ha_settings,
+            'monitoring_settings': self._generate_monitoring_settings,
+        }
+    
+    def _render_section(self, section_template: str, device_name: str,
+                        policy: Optional[DevicePolicy], requirements: str) -> str:
+        """セクション単位のテンプレート変数置換（セクション内の変数のみ生成）"""
+        config = section_template.replace('{{hostname}}', device_name)
         
         if policy:
-            config = config.replace('{{router_id}}', policy.ospf_config.get('router_id', '10.1.1.1'))
-            config = config.replace('{{basic_settings}}', self._generate_basic_settings(policy))
-            config = config.replace('{{interfaces}}', self._generate_interfaces(policy))
-            config = config.replace('{{ospf_networks}}', self._generate_ospf_networks(policy))
-            config = config.replace('{{security_settings}}', self._generate_security_settings(policy))
-            config = config.replace('{{ha_settings}}', self._generate_ha_settings(policy))
-            config = config.replace('{{monitoring_settings}}', self._generate_monitoring_settings(policy))
+            for variable, renderer in self._template_variable_renderers().items():
+                placeholder = '{{' + variable + '}}'
+                if placeholder in config:
+                    config = config.replace(placeholder, renderer(policy))
         
         # 要件の置換
-        requirements = self._extract_requirements_from_prompt(prompt)
         config = config.replace('{{requirements}}', requirements)
         
         return config
@@ -215,116 +690,49 @@ ntp server 192.168.100.100
         
         return "No specific requirements"
     
-    def _validate_config(self, config_content: str) -> Dict[str, Any]:
-        """コンフィグの検証"""
-        validation_result = {
-            'is_valid': True,
-            'errors': [],
-            'warnings': [],
-            'validation_rules': {}
-        }
-        
-        # 基本的な構文チェック
-        if not self._validate_syntax(config_content):
-            validation_result['is_valid'] = False
-            validation_result['errors'].append("Invalid configuration syntax")
-        
-        # IPアドレスの検証
-        ip_validation = self._validate_ip_addresses(config_content)
-        validation_result['validation_rules']['ip_validation'] = ip_validation
-        
-        if not ip_validation['is_valid']:
-            validation_result['is_valid'] = False
-            validation_result['errors'].extend(ip_validation['errors'])
-        
-        # OSPF設定の検証
-        ospf_validation = self._validate_ospf_config(config_content)
-        validation_result['validation_rules']['ospf_validation'] = ospf_validation
-        
-        if not ospf_validation['is_valid']:
-            validation_result['warnings'].extend(ospf_validation['warnings'])
-        
-        return validation_result
+    def validate_config(self, config_content: Union[str, Iterable[str]],
+                        device_type: Optional[str] = None) -> Dict[str, Any]:
+        """コンフィグの検証（KBの検証ルールを含む全ルール）
+
+        ファイルオブジェクトなどの行イテレータを渡すと、コンフィグ全体を
+        メモリに読み込まずに検証する（この場合は検証結果のキャッシュを使わない）。
+        """
+        return self._validate_config(config_content, device_type)
     
-    def _validate_syntax(self, config_content: str) -> bool:
-        """構文の検証"""
-        # 簡易的な構文チェック
-        lines = config_content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('!') and not line.startswith('interface'):
-                # 基本的なコマンド形式のチェック
-                if not re.match(r'^\w+(\s+\S+)*$', line):
-                    return False
-        
-        return True
-    
-    def _validate_ip_addresses(self, config_content: str) -> Dict[str, Any]:
-        """IPアドレスの検証"""
-        validation = {
-            'is_valid': True,
-            'errors': [],
-            'warnings': [],
-            'ip_addresses': []
-        }
-        
-        # IPアドレスの抽出
-        ip_pattern = r'ip address (\d+\.\d+\.\d+\.\d+/\d+)'
-        ip_matches = re.findall(ip_pattern, config_content)
-        
-        for ip in ip_matches:
-            validation['ip_addresses'].append(ip)
-            
-            # プライベートIPアドレスのチェック
-            if not self._is_private_ip(ip):
-                validation['warnings'].append(f"Public IP address detected: {ip}")
-        
-        return validation
-    
-    def _validate_ospf_config(self, config_content: str) -> Dict[str, Any]:
-        """OSPF設定の検証"""
-        validation = {
-            'is_valid': True,
-            'errors': [],
-            'warnings': [],
-            'areas': []
-        }
-        
-        # OSPFエリアの抽出
-        ospf_pattern = r'network (\d+\.\d+\.\d+\.\d+/\d+) area (\d+)'
-        ospf_matches = re.findall(ospf_pattern, config_content)
-        
-        for network, area in ospf_matches:
-            validation['areas'].append({'network': network, 'area': area})
-            
-            # Area 0のチェック
-            if area == '0':
-                validation['warnings'].append(f"Network {network} is in Area 0 (backbone)")
-        
-        return validation
+    def validate_many(self, inputs: Iterable[Any], workers: Optional[int] = None,
+                      report_path: Optional[str] = None, worst_n: int = 10,
+                      cache_dir: Optional[str] = None) -> Dict[str, Any]:
+        """多数のコンフィグ（ファイルパス・文字列・GeneratedConfig）の並列検証と集計"""
+        return validate_many(
+            inputs, workers=workers,
+            validation_rules=self.kb.get_validation_rules(),
+            rules_hash=self.kb.get_validation_rules_hash(),
+            report_path=report_path, worst_n=worst_n, cache_dir=cache_dir
+        )
+    
+    def _validate_config(self, config_content: Union[str, Iterable[str], ConfigTree],
+                         device_type: Optional[str] = None, scope: str = 'all') -> Dict[str, Any]:
+        """コンフィグの検証（1回の走査で全ルールを実行、解析済みのConfigTreeも可）"""
+        compiled_rules = self.kb.get_compiled_rules()
+        self.validator.set_compiled_rules(compiled_rules)
+        # 行イテレータはハッシュを求めると読み切ってしまうため、キャッシュせずに検証する
+        if self.validation_cache is None or not isinstance(config_content, (str, ConfigTree)):
+            return self.validator.validate(config_content, device_type, scope)
+        
+        if isinstance(config_content, ConfigTree):
+            content_hash = config_content.content_hash
+        else:
+            content_hash = compute_content_hash(config_content)
+        cache_key = ValidationCache.make_key(content_hash, device_type, scope)
+        validation_result = self.validation_cache.get(compiled_rules.rules_hash, cache_key)
+        if validation_result is None:
+            validation_result = self.validator.validate(config_content, device_type, scope)
+            self.validation_cache.put(compiled_rules.rules_hash, cache_key, validation_result)
+        return validation_result
     
     def _is_private_ip(self, ip_with_mask: str) -> bool:
         """プライベートIPアドレスの判定"""
-        # マスクを除去
-        ip = ip_with_mask.split('/')[0]
-        octets = ip.split('.')
-        
-        # プライベートIPアドレス範囲のチェック
-        private_ranges = [
-            (10, 0, 0, 0, 10, 255, 255, 255),      # 10.0.0.0/8
-            (172, 16, 0, 0, 172, 31, 255, 255),    # 172.16.0.0/12
-            (192, 168, 0, 0, 192, 168, 255, 255),  # 192.168.0.0/16
-        ]
-        
-        for first, second_min, third_min, fourth_min, first_max, second_max, third_max, fourth_max in private_ranges:
-            if (first <= int(octets[0]) <= first_max and
-                second_min <= int(octets[1]) <= second_max and
-                third_min <= int(octets[2]) <= third_max and
-                fourth_min <= int(octets[3]) <= fourth_max):
-                return True
-        
-        return False
+        return is_private_ip(ip_with_mask)
     
     def _generate_metadata(self, query: str, config_content: str) -> Dict[str, Any]:
         """メタデータの生成"""
@@ -357,41 +765,80 @@ ntp server 192.168.100.100
         
         return 'general'
     
-    def get_generated_configs(self) -> List[GeneratedConfig]:
-        """生成されたコンフィグの取得"""
-        return self.generated_configs
-    
-    def save_config(self, config: GeneratedConfig, output_dir: str = "/tmp/generated_configs") -> tuple:
-        """コンフィグの保存"""
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # ファイル名の生成
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{config.device_name}_{config.config_type}_{timestamp}.txt"
-        filepath = os.path.join(output_dir, filename)
-        
-        # ファイルへの書き込み
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"! Generated Config for {config.device_name}\n")
-            f.write(f"! Config Type: {config.config_type}\n")
-            f.write(f"! Generated: {config.metadata['timestamp']}\n")
-            f.write(f"! Validation: {'PASS' if config.validation_result['is_valid'] else 'FAIL'}\n")
-            f.write("\n")
-            f.write(config.config_content)
-        
-        # 検証結果の保存
-        validation_filename = f"{config.device_name}_{config.config_type}_{timestamp}_validation.json"
-        validation_filepath = os.path.join(output_dir, validation_filename)
-        
-        with open(validation_filepath, 'w', encoding='utf-8') as f:
-            json.dump({
-                'device_name': config.device_name,
-                'config_type': config.config_type,
-                'validation_result': config.validation_result,
-                'metadata': config.metadata
-            }, f, indent=2, ensure_ascii=False)
+    @property
+    def generated_configs(self) -> List[GeneratedConfig]:
+        """最近生成されたコンフィグ（後方互換用、ストアが limit 省略時に返す範囲）
+
+        TieredConfigStore ではメモリ上の範囲だけを返し、ディスクは読まない。
+        """
+        return self.config_store.recent()
+    
+    def get_generated_configs(self, limit: Optional[int] = None) -> List[GeneratedConfig]:
+        """生成されたコンフィグの取得（古い順、limit を省略した場合はストアの既定の範囲）"""
+        return self.config_store.recent(limit)
+    
+    def find_generated_configs(self, device_name: Optional[str] = None,
+                               config_type: Optional[str] = None,
+                               since: Optional[Any] = None, until: Optional[Any] = None,
+                               limit: Optional[int] = None) -> List[GeneratedConfig]:
+        """デバイス名・設定タイプ・期間による生成履歴の検索"""
+        return self.config_store.find(device_name, config_type, since, until, limit)
+    
+    def save_config(self, config: GeneratedConfig, output_dir: str = "/tmp/generated_configs",
+                    sink: Optional[ConfigSink] = None) -> tuple:
+        """コンフィグの保存
+        
+        sinkを指定するとその保存先（JSONLArchiveSinkなど）に書き込む。
+        未指定時はoutput_dirに個別ファイルとして保存する。
+        保存名は「デバイス名_設定タイプ_マイクロ秒までの時刻」で、保存先に同名のレコードが
+        あれば末尾に連番（_2, _3, ...）を付ける。
+        """
+        if sink is None:
+            sink = DirectorySink(output_dir)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        base_name = f"{config.device_name}_{config.config_type}_{timestamp}"
+        name = base_name
+        for sequence in itertools.count(2):
+            try:
+                filepath, validation_filepath = sink.write_record(name, self._render_saved_files(config, name))
+                break
+            except FileExistsError:
+                name = f"{base_name}_{sequence}"
         
         return filepath, validation_filepath
+    
+    def save_configs(self, configs: List[GeneratedConfig], output_dir: str = "/tmp/generated_configs",
+                     sink: Optional[ConfigSink] = None) -> List[tuple]:
+        """複数コンフィグの一括保存（最後にまとめて書き出す）"""
+        if sink is None:
+            sink = DirectorySink(output_dir)
+        
+        saved = [self.save_config(config, output_dir, sink) for config in configs]
+        sink.flush()
+        return saved
+    
+    def _render_saved_files(self, config: GeneratedConfig, name: str) -> Dict[str, str]:
+        """保存するファイル名と内容（コンフィグ本体と検証結果）"""
+        config_text = (
+            f"! Generated Config for {config.device_name}\n"
+            f"! Config Type: {config.config_type}\n"
+            f"! Generated: {config.metadata['timestamp']}\n"
+            f"! Validation: {'PASS' if config.validation_result['is_valid'] else 'FAIL'}\n"
+            "\n"
+            f"{config.config_content}"
+        )
+        validation_json = json.dumps({
+            'device_name': config.device_name,
+            'config_type': config.config_type,
+            'validation_result': config.validation_result,
+            'metadata': config.metadata
+        }, indent=2, ensure_ascii=False)
+        
+        return {
+            f"{name}.txt": config_text,
+            f"{name}_validation.json": validation_json
+        }
 
 
 
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# config_parser.py
+import hashlib
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Union
+from dataclasses import dataclass, field
+
+# 解析済みのツリーを保持する件数（コンフィグのハッシュ単位）
+TREE_CACHE_SIZE = 64
+# 解析済みのツリーを保持する元のコンフィグの合計文字数（これを超える1件はキャッシュしない）
+TREE_CACHE_MAX_CHARS = 32 * 1024 * 1024
+
+# 取得のたびに変わる行（設定内容ではないため、正規化した指紋から除く）
+VOLATILE_LINE_PATTERN = re.compile(
+    r'(?:'
+    r'!\s*Last configuration change'
+    r'|!\s*NVRAM config last updated'
+    r'|!\s*No configuration change since last restart'
+    r'|!\s*Time:'
+    r'|!\s*Running configuration last done'
+    r'|!\s*Startup config saved'
+    r'|Building configuration'
+    r'|Current configuration\s*:'
+    r'|ntp clock-period\s'
+    r'|: Written by'
+    r'|Cryptochecksum:'
+    r')',
+    re.IGNORECASE
+)
+
+
+def iter_config_lines(config: Union[str, Iterable[Union[str, bytes]]],
+                      block_chars: int = 1024 * 1024) -> Iterator[str]:
+    """コンフィグを1行ずつ返す（文字列・ファイルオブジェクト・SSHチャネルなどの行イテレータ）
+
+    文字列は block_chars 文字程度ずつ区切って分割するため、全行のリストは作らない
+    （結果は config.split('\\n') と同じ）。イテレータから読んだ行は末尾の改行を除く。
+    """
+    if isinstance(config, str):
+        start = 0
+        while True:
+            end = config.find('\n', start + block_chars)
+            if end < 0:
+                yield from config[start:].split('\n')
+                return
+            yield from config[start:end].split('\n')
+            start = end + 1
+
+    for line in config:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        yield line.rstrip('\r\n')
+
+
+@dataclass
+class ConfigBlock:
+    """IOS形式コンフィグのトップレベルブロック
+
+    `interface X` や `router ospf N` のように配下にインデントされた行を持つ
+    ブロックと、`hostname R1` のような1行のグローバルコマンドの両方を表す。
+    """
+    key: str
+    header: str
+    children: List[str] = field(default_factory=list)
+
+    @property
+    def lines(self) -> List[str]:
+        """ヘッダーと配下の行"""
+        return [self.header] + self.children
+
+    @property
+    def fingerprint(self) -> int:
+        """内容比較用のハッシュ"""
+        return hash((self.header, tuple(self.children)))
+
+
+def is_config_line(line: str) -> bool:
+    """コンフィグとして意味を持つ行かどうか（空行・コメント・メタデータを除く）"""
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith(('!', '#'))
+
+
+def block_key(header: str) -> str:
+    """ブロックの照合キー（空白を正規化したヘッダー行）"""
+    return ' '.join(header.split())
+
+
+def parse_config_blocks(config: Union[str, Iterable[str], 'ConfigTree']) -> List[ConfigBlock]:
+    """コンフィグをトップレベルブロックに分割
+
+    インデントのない行が新しいブロックを開始し、インデントされた行は
+    直前のブロックに属する。空行・`!` コメント・`#` メタデータ行は無視する。
+    同じキーのブロックが複数ある場合は2つ目以降のキーに出現番号を付ける。
+    """
+    blocks = []
+    seen = {}
+
+    for root in parse_config_tree(config).roots:
+        key = block_key(root.stripped)
+        count = seen.get(key, 0) + 1
+        seen[key] = count
+        if count > 1:
+            key = f"{key}#{count}"
+
+        children = [node.text.rstrip() for node in root.descendants()]
+        blocks.append(ConfigBlock(key=key, header=root.stripped, children=children))
+
+    return blocks
+
+
+def index_blocks(blocks: List[ConfigBlock]) -> Dict[str, ConfigBlock]:
+    """キー→ブロックの辞書"""
+    return {block.key: block for block in blocks}
+
+
+class ConfigNode:
+    """コンフィグツリーの1行（インデントの深い後続行を子に持つ）
+
+    親への参照は弱参照とし、ツリーに循環参照を作らない（キャッシュから外れたツリーは
+    参照カウントだけで即座に解放される）。親はツリーが保持している間だけ参照できる。
+    """
+    __slots__ = ('number', 'text', 'stripped', 'indent', 'children', '_parent', '__weakref__')
+
+    def __init__(self, number: int, text: str, stripped: str, indent: int,
+                 parent: Optional['ConfigNode'] = None):
+        self.number = number
+        self.text = text
+        self.stripped = stripped
+        self.indent = indent
+        self.children = []
+        self._parent = weakref.ref(parent) if parent is not None else None
+
+    def __repr__(self) -> str:
+        return f"ConfigNode(number={self.number}, text={self.text!r})"
+
+    @property
+    def parent(self) -> Optional['ConfigNode']:
+        return self._parent() if self._parent is not None else None
+
+    @property
+    def tokens(self) -> List[str]:
+        return self.stripped.split()
+
+    @property
+    def keyword(self) -> str:
+        """先頭のトークン（小文字）"""
+        return self.stripped.split(None, 1)[0].lower()
+
+    @property
+    def block(self) -> 'ConfigNode':
+        """所属するトップレベルの行（自身がトップレベルなら自身）"""
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def descendants(self) -> Iterator['ConfigNode']:
+        """配下の全行（コンフィグ上の順）"""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def _index_keys(stripped: str) -> Tuple[str, ...]:
+    """キーワード索引のキー（先頭の1語と2語、小文字）"""
+    words = stripped.split(None, 2)
+    head = words[0].lower()
+    if len(words) > 1:
+        return head, f"{head} {words[1].lower()}"
+    return (head,)
+
+
+class ConfigTree:
+    """インデントに基づくIOS形式コンフィグの階層ツリー
+
+    各行をインデントがより浅い直前の行の子とし、空行・`!` コメント・`#` メタデータ行は
+    ノードにしない。先頭の1語・2語（`interface`・`router`・`ip access-list` など）の
+    キーワード索引を持ち、該当する行を走査せずに取り出せる。構築後は変更しないため、
+    複数の利用者・スレッドで共有してよい。
+    """
+
+    def __init__(self, texts: List[str], content_hash: str):
+        self.texts = texts
+        self.content_hash = content_hash
+        self.stripped = [text.strip() for text in texts]
+        self.nodes = []
+        self.roots = []
+        self._index = {}
+        self._block_index = {}
+
+        self._build(texts)
+
+    def _build(self, texts: List[str]):
+        """行の親子関係とキーワード索引の構築"""
+        first = last = None
+        stack = []
+        index, block_index = self._index, self._block_index
+        for number, (text, stripped) in enumerate(zip(texts, self.stripped), 1):
+            if not stripped:
+                continue
+            if first is None:
+                first = number
+            last = number
+            if stripped[0] in '!#':
+                continue
+
+            indent = len(text) - len(text.lstrip())
+            while stack and stack[-1].indent >= indent:
+                stack.pop()
+            if stack:
+                node = ConfigNode(number, text, stripped, indent, stack[-1])
+                stack[-1].children.append(node)
+            else:
+                node = ConfigNode(number, text, stripped, indent)
+                self.roots.append(node)
+            is_root = not stack
+            stack.append(node)
+            self.nodes.append(node)
+
+            for key in _index_keys(stripped):
+                index.setdefault(key, []).append(node)
+                if is_root:
+                    block_index.setdefault(key, []).append(node)
+
+        # 先頭・末尾の空行を除いた行数（コメント行・途中の空行を含む）
+        self.span = last - first + 1 if first is not None else 0
+
+    def __len__(self) -> int:
+        """物理行数"""
+        return len(self.texts)
+
+    def blocks(self, keyword: str) -> List[ConfigNode]:
+        """キーワード（1語または2語）で始まるトップレベルの行"""
+        return list(self._block_index.get(' '.join(keyword.lower().split()), ()))
+
+    def find(self, keyword: str) -> List[ConfigNode]:
+        """キーワード（1語または2語）で始まる全階層の行（コンフィグ上の順）"""
+        return list(self._index.get(' '.join(keyword.lower().split()), ()))
+
+    def search(self, pattern: Union[str, Pattern],
+               nodes: Optional[Iterable[ConfigNode]] = None) -> Iterator[Tuple[ConfigNode, 're.Match']]:
+        """正規表現に一致する行と一致結果（nodesを省略すると全行が対象）"""
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        for node in self.nodes if nodes is None else nodes:
+            match = regex.search(node.stripped)
+            if match:
+                yield node, match
+
+
+class ConfigNodeStream:
+    """行イテレータからツリーを作らずにノードを順に返す
+
+    ノードの親子関係は ConfigTree と同じだが、子の一覧は作らず、保持するのは
+    処理中の行の祖先だけになる（親は利用者が参照を持つ間だけ辿れる）。
+    読み終えると content_lines に空行以外の行数（コメント行を含む）が入る。
+    """
+
+    def __init__(self, config: Iterable[Union[str, bytes]]):
+        self._config = config
+        self.content_lines = 0
+
+    def __iter__(self) -> Iterator[ConfigNode]:
+        stack = []
+        for number, text in enumerate(iter_config_lines(self._config), 1):
+            stripped = text.strip()
+            if not stripped:
+                continue
+            self.content_lines += 1
+            if stripped[0] in '!#':
+                continue
+            indent = len(text) - len(text.lstrip())
+            while stack and stack[-1].indent >= indent:
+                stack.pop()
+            node = ConfigNode(number, text, stripped, indent, stack[-1] if stack else None)
+            stack.append(node)
+            yield node
+
+
+def config_nodes(config: Union[str, Iterable[Union[str, bytes]], ConfigTree]) -> Iterable[ConfigNode]:
+    """コンフィグの全行のノード（文字列・ツリーはツリーのノード、行イテレータはツリーを作らずに返す）"""
+    if isinstance(config, (str, ConfigTree)):
+        return parse_config_tree(config).nodes
+    if isinstance(config, ConfigNodeStream):
+        return config
+    return ConfigNodeStream(config)
+
+
+class KeywordDispatcher:
+    """行の先頭1〜2語をキーとする振り分け表
+
+    キーワード（1語または2語）ごとにパターンと値の生成関数を登録しておくと、
+    各行は先頭語（2語のキーを優先）で登録先が1つに決まり、適用する正規表現は
+    1行につき高々1つになる。ツリーに対してはキーワード索引から該当行だけを取り出すため、
+    振り分けの手間は該当行数に比例する。
+    """
+
+    def __init__(self):
+        self._rules = {}
+        # 2語のキーの先頭語（1語のキーの該当行から2語のキーの行を除くため）
+        self._two_word_heads = set()
+
+    def register(self, keyword: str, pattern: Union[str, Pattern], name: str,
+                 build: Callable[[ConfigNode, 're.Match'], Any]):
+        """キーワードで始まる行に適用するパターン・結果の名前・値の生成関数の登録"""
+        key = ' '.join(keyword.lower().split())
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self._rules[key] = (regex, name, build)
+        if ' ' in key:
+            self._two_word_heads.add(key.split()[0])
+
+    def classify(self, stripped: str) -> Optional[Tuple[Pattern, str, Callable]]:
+        """行（strip済み）の登録先（該当しなければNone）"""
+        keys = _index_keys(stripped)
+        rule = self._rules.get(keys[-1])
+        if rule is None and len(keys) > 1:
+            rule = self._rules.get(keys[0])
+        return rule
+
+    def dispatch(self, config: Union[str, Iterable[str], ConfigTree]) -> Iterator[Tuple[str, Any]]:
+        """パターンに一致した行の (名前, 値)（キーワードごとにコンフィグ上の順）
+
+        文字列・ツリーはキーワード索引を使い、行イテレータはツリーを作らずに
+        1行ずつ振り分ける（一致した結果だけを保持し、順序は索引を使う場合と同じ）。
+        """
+        if not isinstance(config, (str, ConfigTree)):
+            yield from self._dispatch_stream(config)
+            return
+
+        tree = parse_config_tree(config)
+        for key, (regex, name, build) in self._rules.items():
+            shadowed = key in self._two_word_heads
+            for node in tree.find(key):
+                if shadowed and _index_keys(node.stripped)[-1] in self._rules:
+                    continue
+                match = regex.search(node.stripped)
+                if match:
+                    yield name, build(node, match)
+
+    def _dispatch_stream(self, config: Iterable[Union[str, bytes]]) -> Iterator[Tuple[str, Any]]:
+        """行イテレータの振り分け（結果を登録順のキーワードごとにまとめて返す）"""
+        results = {key: [] for key in self._rules}
+        for node in ConfigNodeStream(config):
+            keys = _index_keys(node.stripped)
+            key = keys[-1] if keys[-1] in self._rules else keys[0]
+            rule = self._rules.get(key)
+            if rule is None:
+                continue
+            regex, name, build = rule
+            match = regex.search(node.stripped)
+            if match:
+                results[key].append((name, build(node, match)))
+        for matched in results.values():
+            yield from matched
+
+
+# ハッシュ→(ツリー, 元のコンフィグの文字数)
+_tree_cache = OrderedDict()
+_tree_cache_chars = 0
+_tree_cache_lock = threading.Lock()
+
+
+def parse_config_tree(config: Union[str, Iterable[Union[str, bytes]], ConfigTree]) -> ConfigTree:
+    """コンフィグの階層ツリーの取得（文字列は内容のハッシュ単位でキャッシュ）
+
+    同じ内容のコンフィグは検証・メタデータ抽出・統計などの利用者の間で1回だけ解析する。
+    キャッシュは件数（TREE_CACHE_SIZE）と元の文字数の合計（TREE_CACHE_MAX_CHARS）で制限する。
+    行イテレータは全行を読んでツリーを作るがキャッシュには登録しない（ファイルやSSHチャネルを
+    1行ずつ処理したい場合はツリーを作らない ConfigNodeStream・config_nodes を使う）。
+    ハッシュは utils.compute_content_hash と同じ（UTF-8のSHA-256）。
+    """
+    if isinstance(config, ConfigTree):
+        return config
+
+    if not isinstance(config, str):
+        digest = hashlib.sha256()
+        texts = []
+        for text in iter_config_lines(config):
+            if texts:
+                digest.update(b'\n')
+            digest.update(text.encode('utf-8'))
+            texts.append(text)
+        return ConfigTree(texts, digest.hexdigest())
+
+    content_hash = hashlib.sha256(config.encode('utf-8')).hexdigest()
+    with _tree_cache_lock:
+        entry = _tree_cache.get(content_hash)
+        if entry is not None:
+            _tree_cache.move_to_end(content_hash)
+            return entry[0]
+
+    tree = ConfigTree(list(iter_config_lines(config)), content_hash)
+    if len(config) <= TREE_CACHE_MAX_CHARS:
+        _cache_tree(content_hash, tree, len(config))
+    return tree
+
+
+def _cache_tree(content_hash: str, tree: ConfigTree, chars: int):
+    """ツリーのキャッシュ登録（件数・合計文字数の上限を超えた分は古い順に破棄）"""
+    global _tree_cache_chars
+    with _tree_cache_lock:
+        if content_hash in _tree_cache:
+            _tree_cache.move_to_end(content_hash)
+            return
+        _tree_cache[content_hash] = (tree, chars)
+        _tree_cache_chars += chars
+        while len(_tree_cache) > TREE_CACHE_SIZE or _tree_cache_chars > TREE_CACHE_MAX_CHARS:
+            _, (_, evicted_chars) = _tree_cache.popitem(last=False)
+            _tree_cache_chars -= evicted_chars
+
+
+def config_fingerprint(config: Union[str, Iterable[Union[str, bytes]], ConfigTree]) -> str:
+    """正規化したコンフィグの指紋（SHA-256）
+
+    取得時刻などの変わりやすい行（VOLATILE_LINE_PATTERN）・空行・行末の空白・改行コードの
+    違いを除いてハッシュを求めるため、設定内容が同じなら取得のたびに同じ値になる。
+    """
+    digest = hashlib.sha256()
+    texts = config.texts if isinstance(config, ConfigTree) else iter_config_lines(config)
+    for text in texts:
+        text = text.rstrip()
+        if not text or VOLATILE_LINE_PATTERN.match(text.lstrip()):
+            continue
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def clear_config_tree_cache():
+    """解析済みツリーのキャッシュの破棄"""
+    global _tree_cache_chars
+    with _tree_cache_lock:
+        _tree_cache.clear()
+        _tree_cache_chars = 0
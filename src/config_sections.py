@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# config_sections.py
+import re
+from typing import Dict, List, Any, Tuple
+from dataclasses import dataclass
+
+# セクション見出し（コメント行）とセクション名の対応
+SECTION_HEADINGS = {
+    'basic settings': 'basic',
+    'interface configuration': 'interfaces',
+    'ospf configuration': 'ospf',
+    'security configuration': 'security',
+    'high availability': 'ha',
+    'monitoring configuration': 'monitoring',
+}
+
+# 空行の直後にある「! 見出し」行の直前をセクション境界とする
+SECTION_BOUNDARY = re.compile(r'(?<=\n\n)(?=! )')
+
+
+@dataclass
+class ConfigSection:
+    """コンフィグのセクション（ストリーミング生成の単位）"""
+    name: str
+    content: str
+    validation_result: Dict[str, Any]
+    reused: bool = False
+
+
+def section_name(section_text: str, index: int) -> str:
+    """セクションテキストの見出しからセクション名を決定"""
+    heading = section_text.lstrip('\n').split('\n', 1)[0]
+    heading = heading.lstrip('!').strip().lower()
+
+    if heading in SECTION_HEADINGS:
+        return SECTION_HEADINGS[heading]
+    if index == 0:
+        return 'header'
+
+    return re.sub(r'\W+', '_', heading).strip('_') or f"section_{index}"
+
+
+def split_config_sections(config_text: str) -> List[Tuple[str, str]]:
+    """コンフィグ（またはテンプレート）をセクションに分割
+
+    分割したテキストをそのまま連結すると元のテキストに戻る。
+    """
+    parts = SECTION_BOUNDARY.split(config_text)
+    return [(section_name(part, i), part) for i, part in enumerate(parts) if part]
+
+
+class SectionSplitter:
+    """ストリーム（LLMのトークン列など）を逐次セクションに分割する"""
+
+    def __init__(self):
+        self._buffer = ''
+        self._scan_from = 0
+        self._index = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """チャンクを追加し、確定したセクションを返す"""
+        self._buffer += chunk
+        completed = []
+
+        while True:
+            # 境界の判定には直前の空行が必要なので少し手前から探索する
+            match = SECTION_BOUNDARY.search(self._buffer, max(1, self._scan_from))
+            if match is None:
+                break
+            part = self._buffer[:match.start()]
+            self._buffer = self._buffer[match.start():]
+            self._scan_from = 1
+            completed.append((section_name(part, self._index), part))
+            self._index += 1
+
+        self._scan_from = max(1, len(self._buffer) - 2)
+        return completed
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """残りのバッファを最後のセクションとして返す"""
+        if not self._buffer:
+            return []
+        part = self._buffer
+        self._buffer = ''
+        self._scan_from = 0
+        name = section_name(part, self._index)
+        self._index += 1
+        return [(name, part)]
+
+
+def merge_validation_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """セクションごとの検証結果をコンフィグ全体の結果に統合"""
+    merged = {
+        'is_valid': True,
+        'errors': [],
+        'warnings': [],
+        'validation_rules': {},
+        'rule_timings': {}
+    }
+
+    for result in results:
+        merged['is_valid'] = merged['is_valid'] and result['is_valid']
+        for error in result['errors']:
+            # 構文エラーなどコンフィグ単位のエラーは1件にまとめる
+            if error not in merged['errors']:
+                merged['errors'].append(error)
+        merged['warnings'].extend(result['warnings'])
+
+        for rule_name, rule_result in result['validation_rules'].items():
+            target = merged['validation_rules'].get(rule_name)
+            if target is None:
+                merged['validation_rules'][rule_name] = _copy_rule_result(rule_result)
+                continue
+            for key, value in rule_result.items():
+                if key == 'is_valid':
+                    target['is_valid'] = target['is_valid'] and value
+                elif isinstance(value, list):
+                    target.setdefault(key, []).extend(value)
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    target[key] = target.get(key, 0) + value
+
+        for rule_name, elapsed in result.get('rule_timings', {}).items():
+            merged['rule_timings'][rule_name] = merged['rule_timings'].get(rule_name, 0.0) + elapsed
+
+    return merged
+
+
+def _copy_rule_result(rule_result: Dict[str, Any]) -> Dict[str, Any]:
+    """ルール別検証結果のコピー（リストは複製）"""
+    return {key: list(value) if isinstance(value, list) else value
+            for key, value in rule_result.items()}
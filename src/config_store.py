@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# config_store.py
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Any
+
+# limit を省略した recent が返す最大件数（MemoryConfigStore の既定の保持件数）
+RECENT_LIMIT = 1000
+
+
+def _config_timestamp(config: Any) -> float:
+    """GeneratedConfigの生成時刻（エポック秒）"""
+    timestamp = config.metadata.get('timestamp')
+    if timestamp:
+        try:
+            return datetime.fromisoformat(str(timestamp)).timestamp()
+        except ValueError:
+            pass
+    return time.time()
+
+
+def _to_epoch(value: Optional[Any]) -> Optional[float]:
+    """datetimeまたはエポック秒をエポック秒に変換"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class ConfigStore(ABC):
+    """生成済みコンフィグのストアの抽象基底クラス"""
+
+    @abstractmethod
+    def add(self, config: Any):
+        """コンフィグの追加"""
+        pass
+
+    @abstractmethod
+    def recent(self, limit: Optional[int] = None) -> List[Any]:
+        """最近のコンフィグの取得（古い順、limit を省略しても件数は有限）"""
+        pass
+
+    @abstractmethod
+    def find(self, device_name: Optional[str] = None, config_type: Optional[str] = None,
+             since: Optional[Any] = None, until: Optional[Any] = None,
+             limit: Optional[int] = None) -> List[Any]:
+        """デバイス名・設定タイプ・期間によるコンフィグの検索（古い順）"""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def close(self):
+        """リソースの解放"""
+        pass
+
+
+class MemoryConfigStore(ConfigStore):
+    """最近のコンフィグのみを保持するメモリ上のリングバッファ"""
+
+    def __init__(self, max_entries: int = RECENT_LIMIT):
+        self.max_entries = max_entries
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    def add(self, config: Any):
+        """コンフィグの追加（上限を超えた分は古いものから破棄）"""
+        with self._lock:
+            self._entries.append((_config_timestamp(config), config))
+
+    def recent(self, limit: Optional[int] = None) -> List[Any]:
+        """最近のコンフィグの取得（古い順）"""
+        with self._lock:
+            configs = [config for _, config in self._entries]
+        return configs[-limit:] if limit else configs
+
+    def find(self, device_name: Optional[str] = None, config_type: Optional[str] = None,
+             since: Optional[Any] = None, until: Optional[Any] = None,
+             limit: Optional[int] = None) -> List[Any]:
+        """デバイス名・設定タイプ・期間によるコンフィグの検索（古い順）"""
+        since_ts = _to_epoch(since)
+        until_ts = _to_epoch(until)
+
+        with self._lock:
+            entries = list(self._entries)
+
+        results = [
+            config for created_at, config in entries
+            if (device_name is None or config.device_name == device_name)
+            and (config_type is None or config.config_type == config_type)
+            and (since_ts is None or created_at >= since_ts)
+            and (until_ts is None or created_at <= until_ts)
+        ]
+        return results[-limit:] if limit else results
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteConfigStore(ConfigStore):
+    """追記専用・インデックス付きのディスク上のストア（SQLite）"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS generated_configs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_name TEXT NOT NULL,
+                config_type TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                config_content TEXT NOT NULL,
+                validation_result TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generated_configs_device "
+            "ON generated_configs (device_name, created_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generated_configs_type "
+            "ON generated_configs (config_type, created_at)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_generated_configs_created "
+            "ON generated_configs (created_at)"
+        )
+        self._conn.commit()
+
+    def add(self, config: Any):
+        """コンフィグの追記"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO generated_configs "
+                "(device_name, config_type, created_at, config_content, validation_result, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    config.device_name,
+                    config.config_type,
+                    _config_timestamp(config),
+                    config.config_content,
+                    json.dumps(config.validation_result, ensure_ascii=False, default=str),
+                    json.dumps(config.metadata, ensure_ascii=False, default=str)
+                )
+            )
+            self._conn.commit()
+
+    def recent(self, limit: Optional[int] = None) -> List[Any]:
+        """最近のコンフィグの取得（古い順、limit を省略した場合は直近 RECENT_LIMIT 件）"""
+        return self.find(limit=limit or RECENT_LIMIT)
+
+    def find(self, device_name: Optional[str] = None, config_type: Optional[str] = None,
+             since: Optional[Any] = None, until: Optional[Any] = None,
+             limit: Optional[int] = None) -> List[Any]:
+        """デバイス名・設定タイプ・期間によるコンフィグの検索（古い順）"""
+        conditions = []
+        params = []
+        if device_name is not None:
+            conditions.append("device_name = ?")
+            params.append(device_name)
+        if config_type is not None:
+            conditions.append("config_type = ?")
+            params.append(config_type)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(_to_epoch(since))
+        if until is not None:
+            conditions.append("created_at <= ?")
+            params.append(_to_epoch(until))
+
+        sql = "SELECT device_name, config_type, config_content, validation_result, metadata FROM generated_configs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # 新しい順にlimit件取り出してから古い順に並べ直す
+        sql += " ORDER BY created_at DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [self._row_to_config(row) for row in reversed(rows)]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM generated_configs").fetchone()[0]
+
+    def close(self):
+        """データベース接続のクローズ"""
+        with self._lock:
+            self._conn.close()
+
+    def _row_to_config(self, row: tuple) -> Any:
+        """行からGeneratedConfigを復元"""
+        # config_generatorがこのモジュールをインポートするため遅延インポート
+        from .config_generator import GeneratedConfig
+
+        device_name, config_type, config_content, validation_result, metadata = row
+        return GeneratedConfig(
+            device_name=device_name,
+            config_type=config_type,
+            config_content=config_content,
+            validation_result=json.loads(validation_result),
+            metadata=json.loads(metadata)
+        )
+
+
+class TieredConfigStore(ConfigStore):
+    """最近の結果はメモリのリングバッファ、全履歴はディスクに保存するストア"""
+
+    def __init__(self, memory_store: MemoryConfigStore, disk_store: ConfigStore):
+        self.memory_store = memory_store
+        self.disk_store = disk_store
+
+    def add(self, config: Any):
+        """両方のストアへの追加"""
+        self.memory_store.add(config)
+        self.disk_store.add(config)
+
+    def recent(self, limit: Optional[int] = None) -> List[Any]:
+        """最近のコンフィグの取得
+
+        limit を省略した場合はメモリ上の範囲だけを返す（ディスクの全履歴は読み込まない）。
+        メモリ上の件数を超える limit を明示した場合のみディスクから読む。
+        """
+        if not limit or limit <= len(self.memory_store):
+            return self.memory_store.recent(limit)
+        return self.disk_store.recent(limit)
+
+    def find(self, device_name: Optional[str] = None, config_type: Optional[str] = None,
+             since: Optional[Any] = None, until: Optional[Any] = None,
+             limit: Optional[int] = None) -> List[Any]:
+        """検索はインデックス付きのディスクストアで行う"""
+        return self.disk_store.find(device_name, config_type, since, until, limit)
+
+    def __len__(self) -> int:
+        return len(self.disk_store)
+
+    def close(self):
+        """リソースの解放"""
+        self.memory_store.close()
+        self.disk_store.close()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# fleet_validation.py
+import os
+import json
+import time
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
+from .rule_compiler import get_compiled_rules
+from .config_parser import iter_config_lines
+from .validation import ConfigValidator
+from .validation_cache import ValidationCache, hash_config_file
+from .utils import compute_content_hash
+
+# 検証対象1件（名前, デバイス名, デバイスタイプ, パス, コンフィグ本文）
+ValidationTask = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+_worker_validator = None
+_worker_cache = None
+
+
+def _init_worker(validation_rules: Dict[str, Any], rules_hash: str, cache_dir: Optional[str] = None):
+    """ワーカープロセスの初期化（ルールのコンパイルはプロセスごとに1回）"""
+    global _worker_validator, _worker_cache
+    _worker_validator = ConfigValidator(compiled_rules=get_compiled_rules(validation_rules, rules_hash))
+    _worker_cache = ValidationCache(cache_dir) if cache_dir else None
+
+
+def _read_metadata(f) -> Dict[str, str]:
+    """コンフィグファイル先頭の「#」メタデータの読み込み（本文の手前まで読み進める）"""
+    metadata = {}
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if line.startswith('#'):
+            key, sep, value = line[1:].partition(':')
+            if sep:
+                metadata[key.strip().lower()] = value.strip()
+        elif line.strip():
+            f.seek(position)
+            break
+    return metadata
+
+
+def _validate_task(task: ValidationTask) -> Dict[str, Any]:
+    """1件の検証（ワーカープロセスで実行し、集計に必要な情報だけを返す）"""
+    name, device_name, device_type, path, content = task
+    started = time.perf_counter()
+    result = None
+    cache_key = None
+    rules_hash = _worker_validator.compiled_rules.rules_hash
+    try:
+        # 内容が変わっていないコンフィグは検証済みの結果を使う
+        if _worker_cache is not None:
+            content_hash = hash_config_file(path) if path is not None else compute_content_hash(content)
+            cache_key = ValidationCache.make_key(content_hash, device_type)
+            result = _worker_cache.get(rules_hash, cache_key)
+        cached = result is not None
+
+        if path is not None:
+            # ファイルは行単位で読みながら検証する
+            with open(path, 'r', encoding='utf-8') as f:
+                metadata = _read_metadata(f)
+                device_name = device_name or metadata.get('device')
+                device_type = device_type or metadata.get('type')
+                if result is None:
+                    result = _worker_validator.validate(iter_config_lines(f), device_type)
+        elif result is None:
+            result = _worker_validator.validate(content, device_type)
+
+        if cache_key is not None and not cached:
+            _worker_cache.put(rules_hash, cache_key, result)
+    except Exception as e:
+        return {
+            'name': name, 'device_name': device_name, 'source': path,
+            'status': 'error', 'is_valid': False, 'error_count': 1, 'warning_count': 0,
+            'failed_rules': {}, 'errors': [str(e)], 'warnings': [], 'cached': False,
+            'elapsed': time.perf_counter() - started
+        }
+
+    failed_rules = {}
+    for rule_name, rule_result in result['validation_rules'].items():
+        if not rule_result['is_valid']:
+            failed_rules[rule_name] = len(rule_result.get('violations') or rule_result['errors']) or 1
+    if 'Invalid configuration syntax' in result['errors']:
+        failed_rules['syntax'] = 1
+
+    return {
+        'name': name, 'device_name': device_name, 'source': path,
+        'status': 'ok', 'is_valid': result['is_valid'],
+        'error_count': len(result['errors']), 'warning_count': len(result['warnings']),
+        'failed_rules': failed_rules, 'errors': result['errors'], 'warnings': result['warnings'],
+        'cached': cached, 'elapsed': time.perf_counter() - started
+    }
+
+
+# 1行の文字列をファイルパスとみなす拡張子
+CONFIG_FILE_SUFFIXES = ('.txt', '.cfg', '.conf', '.config', '.log')
+
+
+def _looks_like_path(text: str) -> bool:
+    """1行の文字列がファイルパスかどうか（存在するファイル、空白を含まない文字列、コンフィグファイルの拡張子）
+
+    存在しないパスもパスとして扱い、コンフィグ本文として検証せずに
+    「ファイルが見つからない」エラーとして報告する。
+    """
+    if '\n' in text:
+        return False
+    text = text.strip()
+    if not text:
+        return False
+    return os.path.isfile(text) or len(text.split()) == 1 or text.lower().endswith(CONFIG_FILE_SUFFIXES)
+
+
+def _to_task(item: Any) -> ValidationTask:
+    """入力（パス・コンフィグ文字列・GeneratedConfig・(名前, コンフィグ)）をタスクに変換"""
+    if isinstance(item, Path) or (isinstance(item, str) and _looks_like_path(item)):
+        path = str(item).strip()
+        device_name = Path(path).name.split('_', 1)[0]
+        return Path(path).name, device_name, None, path, None
+    if hasattr(item, 'config_content'):
+        name = f"{item.device_name}_{item.config_type}_{item.metadata.get('timestamp', '')}"
+        return name, item.device_name, None, None, item.config_content
+    if isinstance(item, tuple):
+        name, content = item
+        return name, name, None, None, content
+    return f"config_{id(item)}", None, None, None, item
+
+
+class ValidationReport:
+    """検証結果のSQLiteレポート（デバイスごとの詳細）"""
+
+    def __init__(self, db_path: str, batch_size: int = 500):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._pending = []
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS validation_runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                summary TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS validation_results (
+                run_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                device_name TEXT,
+                source TEXT,
+                status TEXT NOT NULL,
+                is_valid INTEGER NOT NULL,
+                error_count INTEGER NOT NULL,
+                warning_count INTEGER NOT NULL,
+                failed_rules TEXT NOT NULL,
+                errors TEXT NOT NULL,
+                warnings TEXT NOT NULL,
+                elapsed REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_validation_results_device "
+            "ON validation_results (run_id, device_name)"
+        )
+        cursor = self._conn.execute(
+            "INSERT INTO validation_runs (started_at) VALUES (?)", (time.strftime('%Y-%m-%d %H:%M:%S'),)
+        )
+        self.run_id = cursor.lastrowid
+        self._conn.commit()
+
+    def add(self, result: Dict[str, Any]):
+        """結果の追加（batch_size件ごとにまとめて書き込む）"""
+        self._pending.append((
+            self.run_id, result['name'], result['device_name'], result['source'], result['status'],
+            int(result['is_valid']), result['error_count'], result['warning_count'],
+            json.dumps(result['failed_rules'], ensure_ascii=False),
+            json.dumps(result['errors'], ensure_ascii=False),
+            json.dumps(result['warnings'], ensure_ascii=False),
+            result['elapsed']
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """未書き込みの結果の書き込み"""
+        if self._pending:
+            self._conn.executemany(
+                "INSERT INTO validation_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._pending
+            )
+            self._conn.commit()
+            self._pending = []
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        """実行の終了記録とクローズ"""
+        self.flush()
+        self._conn.execute(
+            "UPDATE validation_runs SET finished_at = ?, summary = ? WHERE run_id = ?",
+            (time.strftime('%Y-%m-%d %H:%M:%S'), json.dumps(summary, ensure_ascii=False), self.run_id)
+        )
+        self._conn.commit()
+        self._conn.close()
+
+
+class _Summary:
+    """検証結果の集計（件数・ルール別件数・問題の多いデバイス）"""
+
+    def __init__(self, worst_n: int):
+        self.worst_n = worst_n
+        self.total = 0
+        self.valid = 0
+        self.invalid = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self.rule_failures = Counter()
+        self.device_errors = Counter()
+        self.device_warnings = Counter()
+        self.elapsed = 0.0
+
+    def add(self, result: Dict[str, Any]):
+        self.total += 1
+        self.elapsed += result['elapsed']
+        self.cache_hits += int(result['cached'])
+        if result['status'] != 'ok':
+            self.failed += 1
+        elif result['is_valid']:
+            self.valid += 1
+        else:
+            self.invalid += 1
+        self.rule_failures.update(result['failed_rules'].keys())
+
+        device = result['device_name'] or result['name']
+        self.device_errors[device] += result['error_count']
+        self.device_warnings[device] += result['warning_count']
+
+    def to_dict(self) -> Dict[str, Any]:
+        # エラー件数、次に警告件数が多い順
+        devices = set(self.device_errors) | set(self.device_warnings)
+        worst = sorted(
+            (device for device in devices if self.device_errors[device] or self.device_warnings[device]),
+            key=lambda device: (-self.device_errors[device], -self.device_warnings[device], device)
+        )[:self.worst_n]
+        return {
+            'total': self.total,
+            'valid': self.valid,
+            'invalid': self.invalid,
+            'failed': self.failed,
+            'cache_hits': self.cache_hits,
+            'rule_failures': dict(self.rule_failures.most_common()),
+            'worst_devices': [
+                {'device_name': device, 'errors': self.device_errors[device],
+                 'warnings': self.device_warnings[device]}
+                for device in worst
+            ],
+            'validation_time': self.elapsed
+        }
+
+
+def _validate_batch(tasks: List[ValidationTask]) -> List[Dict[str, Any]]:
+    """複数件の検証（プロセス間通信の回数を減らすためにまとめて送る）"""
+    return [_validate_task(task) for task in tasks]
+
+
+def _iter_batches(inputs: Iterable[Any], batch_size: int) -> Iterator[List[ValidationTask]]:
+    """入力を逐次読み出してbatch_size件ずつのタスクにまとめる"""
+    batch = []
+    for item in inputs:
+        batch.append(_to_task(item))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def validate_many(inputs: Iterable[Union[str, Path, Any]], workers: Optional[int] = None,
+                  validation_rules: Optional[Dict[str, Any]] = None, rules_hash: str = '',
+                  report_path: Optional[str] = None, worst_n: int = 10,
+                  batch_size: int = 64, max_pending: Optional[int] = None,
+                  cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """多数のコンフィグの並列検証
+
+    inputsにはコンフィグファイルのパス、コンフィグ文字列、GeneratedConfig、
+    (名前, コンフィグ文字列) を混在させてよい。入力は逐次読み出してbatch_size件ずつ
+    プロセスプールに投入し、未完了のバッチは max_pending 個（既定は workers の2倍）までに抑える。
+    戻り値は集計結果で、デバイスごとの詳細は report_path のSQLiteに書き込む。
+    cache_dirを指定すると、内容とルールが前回と同じコンフィグは検証を省略する。
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    validation_rules = validation_rules or {}
+
+    summary = _Summary(worst_n)
+    report = ValidationReport(report_path) if report_path else None
+
+    def collect(results: List[Dict[str, Any]]):
+        for result in results:
+            summary.add(result)
+            if report is not None:
+                report.add(result)
+
+    started = time.perf_counter()
+    try:
+        if workers == 1:
+            _init_worker(validation_rules, rules_hash, cache_dir)
+            for batch in _iter_batches(inputs, batch_size):
+                collect(_validate_batch(batch))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(validation_rules, rules_hash, cache_dir)) as executor:
+                pending = set()
+                for batch in _iter_batches(inputs, batch_size):
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                    pending.add(executor.submit(_validate_batch, batch))
+                for future in pending:
+                    collect(future.result())
+    finally:
+        result = summary.to_dict()
+        result['wall_time'] = time.perf_counter() - started
+        if report is not None:
+            report.close(result)
+            result['report_path'] = report_path
+
+    return result
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# ipaddr.py
+"""IPv4アドレスの整数演算ユーティリティ
+
+アドレスは32ビットの整数として扱う。スカラー版（1件ずつ）と、NumPyが
+利用できる場合の配列版（多数のアドレスを一括処理）を用意しており、
+両者の判定結果は同じになる。NumPyがない環境では配列版もlistを返す。
+"""
+import re
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+MAX_ADDRESS = 0xFFFFFFFF
+
+# 1〜3桁の数字4つからなるドット表記
+DOTTED_QUAD_PATTERN = re.compile(r'([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\Z')
+
+# プライベートIPアドレス範囲（10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16）の (ネットワーク, マスク)
+PRIVATE_NETWORKS = (
+    (0x0A000000, 0xFF000000),
+    (0xAC100000, 0xFFF00000),
+    (0xC0A80000, 0xFFFF0000),
+)
+
+
+def ip_to_int(ip: str) -> int:
+    """ドット表記のIPv4アドレスを整数に変換（不正な表記はValueError）"""
+    match = DOTTED_QUAD_PATTERN.match(ip)
+    if match is None:
+        raise ValueError(f"Invalid IPv4 address: {ip!r}")
+    a, b, c, d = map(int, match.groups())
+    if a > 255 or b > 255 or c > 255 or d > 255:
+        raise ValueError(f"Invalid IPv4 address: {ip!r}")
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+def int_to_ip(value: int) -> str:
+    """整数をドット表記のIPv4アドレスに変換"""
+    return f"{(value >> 24) & 0xFF}.{(value >> 16) & 0xFF}.{(value >> 8) & 0xFF}.{value & 0xFF}"
+
+
+def prefix_to_mask(prefix: int) -> int:
+    """プレフィックス長をマスク（整数）に変換"""
+    if not 0 <= prefix <= 32:
+        raise ValueError(f"Invalid prefix length: {prefix}")
+    return (MAX_ADDRESS << (32 - prefix)) & MAX_ADDRESS
+
+
+def is_valid_mask(mask: int) -> bool:
+    """マスクの1が先頭から連続しているか"""
+    inverted = ~mask & MAX_ADDRESS
+    return (inverted & (inverted + 1)) == 0
+
+
+def mask_to_prefix(mask: int) -> Optional[int]:
+    """マスク（整数）をプレフィックス長に変換（不連続なマスクはNone）"""
+    if not is_valid_mask(mask):
+        return None
+    return 32 - (~mask & MAX_ADDRESS).bit_length()
+
+
+def parse_prefix(text: str) -> Tuple[int, int]:
+    """「A.B.C.D/len」を (アドレス, プレフィックス長) に変換（不正な表記はValueError）"""
+    address, sep, prefix = text.partition('/')
+    if not sep or not (prefix.isascii() and prefix.isdigit()) or len(prefix) > 2:
+        raise ValueError(f"Invalid IPv4 prefix: {text!r}")
+    prefix_len = int(prefix)
+    if prefix_len > 32:
+        raise ValueError(f"Invalid IPv4 prefix: {text!r}")
+    return ip_to_int(address), prefix_len
+
+
+def parse_address(text: str) -> Optional[Tuple[int, int]]:
+    """「A.B.C.D/len」「A.B.C.D M.M.M.M」「A.B.C.D」を (アドレス, プレフィックス長) に変換
+
+    マスクのない表記はホストアドレス（/32）とみなす。不連続なマスクや
+    範囲外の値はNoneを返す。
+    """
+    parts = (text or '').split()
+    try:
+        if len(parts) == 1:
+            if '/' in parts[0]:
+                return parse_prefix(parts[0])
+            return ip_to_int(parts[0]), 32
+        if len(parts) == 2:
+            prefix_len = mask_to_prefix(ip_to_int(parts[1]))
+            if prefix_len is None:
+                return None
+            return ip_to_int(parts[0]), prefix_len
+    except ValueError:
+        return None
+    return None
+
+
+def network_address(address: int, prefix: int) -> int:
+    """ネットワークアドレス"""
+    return address & prefix_to_mask(prefix)
+
+
+def broadcast_address(address: int, prefix: int) -> int:
+    """ブロードキャストアドレス（サブネットの末尾）"""
+    return address | (MAX_ADDRESS >> prefix)
+
+
+def is_private(address: int) -> bool:
+    """プライベートIPアドレス（RFC 1918）の判定"""
+    for network, mask in PRIVATE_NETWORKS:
+        if (address & mask) == network:
+            return True
+    return False
+
+
+def is_private_ip(ip_with_mask: str) -> bool:
+    """プライベートIPアドレスの判定（マスク付きの表記も可、不正な表記はFalse）"""
+    try:
+        return is_private(ip_to_int(ip_with_mask.split('/', 1)[0]))
+    except ValueError:
+        return False
+
+
+ArrayLike = Union[Sequence[int], 'np.ndarray']
+
+
+def parse_ip_array(ips: Iterable[str]) -> Tuple[ArrayLike, ArrayLike]:
+    """ドット表記のアドレス列を (整数の配列, 有効フラグの配列) に変換
+
+    不正な表記の要素は値0・有効フラグFalseとなる。
+    """
+    ips = list(ips)
+    if not NUMPY_AVAILABLE:
+        return _parse_each(ips)
+    if not ips:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=bool)
+
+    octets = _parse_octets('\n'.join(ips) + '\n', len(ips))
+    if octets is not None:
+        valid = (octets <= 255).all(axis=1)
+        values = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+        return np.where(valid, values, 0).astype(np.uint32), valid
+
+    # 形式の異なる要素を含む場合は1件ずつ変換する
+    values, valid = _parse_each(ips)
+    return np.array(values, dtype=np.uint32), np.array(valid, dtype=bool)
+
+
+def _parse_octets(text: str, count: int) -> Optional['np.ndarray']:
+    """改行区切りのドット表記をバイト列のまま一括で数値化（(count, 4) の配列）
+
+    全要素が「1〜3桁の数字.数字.数字.数字」の形式でなければNoneを返す。
+    """
+    try:
+        raw = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return None
+    is_separator = (raw == 0x2E) | (raw == 0x0A)
+    if not (is_separator | ((raw >= 0x30) & (raw <= 0x39))).all():
+        return None
+
+    # 区切り文字は「. . . 改行」の繰り返し、各オクテットは1〜3桁
+    ends = np.flatnonzero(is_separator)
+    if len(ends) != count * 4 or not (raw[ends].reshape(-1, 4) == (0x2E, 0x2E, 0x2E, 0x0A)).all():
+        return None
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    if ((lengths < 1) | (lengths > 3)).any():
+        return None
+
+    digits = raw.astype(np.int64) - 0x30
+    ones = digits[ends - 1]
+    tens = np.where(lengths >= 2, digits[ends - 2], 0)
+    hundreds = np.where(lengths == 3, digits[ends - 3], 0)
+    return (hundreds * 100 + tens * 10 + ones).reshape(-1, 4)
+
+
+def _parse_each(ips: List[str]) -> Tuple[List[int], List[bool]]:
+    """1件ずつの変換（不正な表記は値0・有効フラグFalse）"""
+    values, valid = [], []
+    for ip in ips:
+        try:
+            values.append(ip_to_int(ip))
+            valid.append(True)
+        except ValueError:
+            values.append(0)
+            valid.append(False)
+    return values, valid
+
+
+def prefix_to_mask_array(prefixes: ArrayLike) -> ArrayLike:
+    """プレフィックス長の配列をマスクの配列に変換"""
+    if not NUMPY_AVAILABLE:
+        return [prefix_to_mask(prefix) for prefix in prefixes]
+    prefixes = np.asarray(prefixes, dtype=np.int64)
+    if ((prefixes < 0) | (prefixes > 32)).any():
+        raise ValueError("Invalid prefix length in array")
+    return ((np.int64(MAX_ADDRESS) << (32 - prefixes)) & MAX_ADDRESS).astype(np.uint32)
+
+
+def network_array(addresses: ArrayLike, prefixes: ArrayLike) -> ArrayLike:
+    """アドレスとプレフィックス長の配列からネットワークアドレスの配列を計算"""
+    if not NUMPY_AVAILABLE:
+        return [network_address(address, prefix) for address, prefix in zip(addresses, prefixes)]
+    return np.asarray(addresses, dtype=np.uint32) & prefix_to_mask_array(prefixes)
+
+
+def broadcast_array(addresses: ArrayLike, prefixes: ArrayLike) -> ArrayLike:
+    """アドレスとプレフィックス長の配列からブロードキャストアドレスの配列を計算"""
+    if not NUMPY_AVAILABLE:
+        return [broadcast_address(address, prefix) for address, prefix in zip(addresses, prefixes)]
+    return np.asarray(addresses, dtype=np.uint32) | ~prefix_to_mask_array(prefixes)
+
+
+def is_valid_mask_array(masks: ArrayLike) -> ArrayLike:
+    """マスクの配列の連続性の判定"""
+    if not NUMPY_AVAILABLE:
+        return [is_valid_mask(mask) for mask in masks]
+    inverted = ~np.asarray(masks, dtype=np.uint32)
+    return (inverted & (inverted + np.uint32(1))) == 0
+
+
+def is_private_array(addresses: ArrayLike) -> ArrayLike:
+    """アドレスの配列のプライベートIPアドレス判定"""
+    if not NUMPY_AVAILABLE:
+        return [is_private(address) for address in addresses]
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    result = np.zeros(addresses.shape, dtype=bool)
+    for network, mask in PRIVATE_NETWORKS:
+        result |= (addresses & np.uint32(mask)) == np.uint32(network)
+    return result
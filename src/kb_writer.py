@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# kb_writer.py
+"""知識ベースへの書き込みのステージングとグループコミット
+
+batch() の間の書き込みはメモリ上にためておき、終了時にまとめてコミットする。コミットは
+全ファイル（世代番号の .generation を含む）を同じディレクトリの保留ファイルに書き終えてから
+置き換えの一覧（ジャーナル）を書き込み、その後で os.replace により置き換える。ジャーナルの
+書き込みがコミットの確定点で、それより前に失敗した場合はどのファイルも変わらず、ステージした
+内容は残る（再度コミットできる）。置き換えの途中で失敗・停止した場合は、次のコミット時または
+次に KBWriter を作成したときにジャーナルから残りの置き換えを行う。ディレクトリのfsyncは
+保留ファイルの書き込み後と置き換え後の1回ずつ行う。読み手（KnowledgeBase.reload_if_changed）は
+世代番号が変わったときだけ再読み込みすればよい。
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# 世代番号のファイル（KBのディレクトリ直下）
+GENERATION_FILE = ".generation"
+# 置き換え中のコミットのジャーナル（KBのディレクトリ直下）
+JOURNAL_FILE = ".commit-journal"
+# 置き換え前の内容を書く保留ファイルの接尾辞
+PENDING_SUFFIX = ".pending"
+
+
+def read_kb_generation(kb_dir: Union[str, Path]) -> int:
+    """KBの世代番号（コミットされたことがなければ0）"""
+    try:
+        with open(Path(kb_dir) / GENERATION_FILE, 'r', encoding='utf-8') as f:
+            return int(json.load(f).get('generation', 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _fsync_directory(directory: Path):
+    """ディレクトリのfsync（リネームの永続化、対応しないOSでは何もしない）"""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class KBWriter:
+    """KBへの書き込み層
+
+    batch() は入れ子にでき、最も外側の batch() の終了時に1回だけコミットする。
+    batch() の外で stage() したファイルはその場でコミットする。durable=False にすると
+    fsyncを省略する（テスト・一時的なKB向け）。
+    """
+
+    def __init__(self, kb_dir: Union[str, Path], durable: bool = True):
+        self.kb_dir = Path(kb_dir)
+        self.durable = durable
+        self._staged: Dict[Path, bytes] = {}
+        self._appends: Dict[Path, List[bytes]] = {}
+        self._depth = 0
+        self._lock = threading.RLock()
+        # 前回のコミットが置き換えの途中で止まっていれば完了させる
+        self.recover()
+
+    def _path(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        return path if path.is_absolute() else self.kb_dir / path
+
+    @contextmanager
+    def batch(self) -> Iterator['KBWriter']:
+        """書き込みをまとめる範囲
+
+        例外で抜けた場合はその batch() の中でステージした内容だけを破棄する
+        （外側の batch() でそれ以前にステージした内容は残る）。終了時のコミットが失敗した場合は
+        ステージした内容を残したまま例外を送出する。batch() の間は他のスレッドの
+        書き込みを待たせる（書き手は常に1つ）。
+        """
+        with self._lock:
+            self._depth += 1
+            savepoint = (dict(self._staged), {path: list(appends) for path, appends in self._appends.items()})
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                self._staged, self._appends = savepoint
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.commit()
+
+    def stage(self, path: Union[str, Path], content: Union[str, bytes]):
+        """ファイル全体の書き込みのステージング（同じファイルは後の内容で置き換え）"""
+        payload = content.encode('utf-8') if isinstance(content, str) else content
+        with self._lock:
+            path = self._path(path)
+            self._staged[path] = payload
+            # 置き換えより前の追記は置き換え後の内容に含まれているものとする
+            self._appends.pop(path, None)
+            if self._depth == 0:
+                self.commit()
+
+    def stage_append(self, path: Union[str, Path], content: Union[str, bytes]):
+        """ファイル末尾への追記のステージング（コミット時に既存の内容と合わせて置き換える）"""
+        payload = content.encode('utf-8') if isinstance(content, str) else content
+        with self._lock:
+            self._appends.setdefault(self._path(path), []).append(payload)
+            if self._depth == 0:
+                self.commit()
+
+    def read_bytes(self, path: Union[str, Path]) -> Optional[bytes]:
+        """ステージ済みの内容を反映したファイルの内容（なければNone）"""
+        with self._lock:
+            path = self._path(path)
+            content = self._staged.get(path)
+            if content is None:
+                try:
+                    with open(path, 'rb') as f:
+                        content = f.read()
+                except OSError:
+                    content = None
+            appends = self._appends.get(path)
+            if appends:
+                content = (content or b'') + b''.join(appends)
+            return content
+
+    def read_text(self, path: Union[str, Path]) -> Optional[str]:
+        content = self.read_bytes(path)
+        return content.decode('utf-8') if content is not None else None
+
+    def exists(self, path: Union[str, Path]) -> bool:
+        """ステージ済みのファイルを含めた存在確認"""
+        with self._lock:
+            path = self._path(path)
+            return path in self._staged or path in self._appends or path.exists()
+
+    def glob(self, directory: Union[str, Path], pattern: str) -> List[Path]:
+        """ディレクトリ直下でパターンに一致するファイル（ステージ済みのファイルを含む）"""
+        with self._lock:
+            directory = self._path(directory)
+            paths = set(directory.glob(pattern)) if directory.exists() else set()
+            paths.update(path for path in (*self._staged, *self._appends)
+                         if path.parent == directory and path.match(pattern))
+            return sorted(paths)
+
+    @property
+    def pending(self) -> int:
+        """コミット待ちのファイル数"""
+        with self._lock:
+            return len(set(self._staged) | set(self._appends))
+
+    def _discard(self):
+        self._staged.clear()
+        self._appends.clear()
+
+    @staticmethod
+    def _pending_path(path: Path) -> Path:
+        """置き換え前の内容を書く保留ファイル（対象と同じディレクトリ）"""
+        return path.parent / f".{path.name}{PENDING_SUFFIX}"
+
+    def _write_file(self, path: Path, payload: bytes):
+        """ファイルへの書き込み（durable ならfsyncまで行う）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(payload)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _fsync_directories(self, paths: Iterable[Path]):
+        if self.durable:
+            for directory in {path.parent for path in paths}:
+                _fsync_directory(directory)
+
+    def _collect_writes(self) -> Dict[Path, bytes]:
+        """ステージした内容から書き込む内容を作る（ステージはそのまま残す）"""
+        writes = dict(self._staged)
+        for path, appends in self._appends.items():
+            base = writes.get(path)
+            if base is None:
+                try:
+                    with open(path, 'rb') as f:
+                        base = f.read()
+                except OSError:
+                    base = b''
+            writes[path] = base + b''.join(appends)
+        return writes
+
+    def commit(self) -> List[str]:
+        """ステージした書き込みのコミット（書き込んだファイルのKBからの相対パスを返す）
+
+        全ファイルと次の世代番号を保留ファイルに書き、ジャーナルを書いてから置き換える。
+        失敗した場合は例外を送出し、ステージした内容は残る。
+        """
+        with self._lock:
+            if not self._staged and not self._appends:
+                return []
+            self.recover()
+
+            writes = self._collect_writes()
+            generation = read_kb_generation(self.kb_dir) + 1
+            writes_with_generation = dict(writes)
+            writes_with_generation[self.kb_dir / GENERATION_FILE] = json.dumps({
+                'generation': generation,
+                'committed_at': datetime.now().isoformat(),
+                'files': len(writes)
+            }).encode('utf-8')
+
+            # 1. 全ファイルを保留ファイルに書く（失敗すればどのファイルも変わらない）
+            entries = []
+            try:
+                for path, payload in writes_with_generation.items():
+                    pending = self._pending_path(path)
+                    entries.append((pending, path))
+                    self._write_file(pending, payload)
+                self._fsync_directories(pending for pending, _ in entries)
+
+                # 2. ジャーナルの書き込み（ここでコミットが確定する）
+                journal = self.kb_dir / JOURNAL_FILE
+                self._write_file(self._pending_path(journal), json.dumps([
+                    [self._relative(pending), self._relative(path)] for pending, path in entries
+                ]).encode('utf-8'))
+                os.replace(self._pending_path(journal), journal)
+                self._fsync_directories([journal])
+            except BaseException:
+                for pending, _ in entries:
+                    if pending.exists():
+                        pending.unlink()
+                raise
+
+            # 3. 置き換え（途中で失敗した場合は次回にジャーナルから完了させる）
+            self._replay(entries)
+            self._discard()
+            return sorted(self._relative(path) for path in writes)
+
+    def recover(self) -> bool:
+        """置き換えの途中で止まったコミットの完了（ジャーナルがあれば True）"""
+        with self._lock:
+            journal = self.kb_dir / JOURNAL_FILE
+            try:
+                with open(journal, 'r', encoding='utf-8') as f:
+                    entries = [(self._path(pending), self._path(path)) for pending, path in json.load(f)]
+            except FileNotFoundError:
+                return False
+            except ValueError:
+                # 書きかけのジャーナルは確定前のコミット（置き換えは始まっていない）
+                journal.unlink()
+                return False
+            self._replay(entries)
+            return True
+
+    def _replay(self, entries: List[Tuple[Path, Path]]):
+        """保留ファイルによる置き換えとジャーナルの削除（置き換え済みのものは飛ばす）"""
+        for pending, path in entries:
+            if pending.exists():
+                os.replace(pending, path)
+        self._fsync_directories([path for _, path in entries])
+        (self.kb_dir / JOURNAL_FILE).unlink()
+        self._fsync_directories([self.kb_dir / JOURNAL_FILE])
+
+    def _relative(self, path: Path) -> str:
+        try:
+            return path.relative_to(self.kb_dir).as_posix()
+        except ValueError:
+            return str(path)
@@ -7,8 +7,15 @@ import re
 import yaml
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
+from .utils import compute_content_hash
+from .rule_compiler import CompiledRuleSet, get_compiled_rules
+from .address_index import AddressConflict, AddressEntry, AddressIndex, extract_addresses
+from .ipaddr import parse_address
+from .prefix_trie import PrefixTrie
+from .snapshot_store import SnapshotStore
+from .kb_writer import read_kb_generation
 
 @dataclass
 class DevicePolicy:
@@ -29,12 +36,47 @@ class Template:
     content: str
 
 
+@dataclass
+class AddressLookup:
+    """アドレス・プレフィックスの所有デバイスの検索結果"""
+    query: str
+    matched_prefix: Optional[str]
+    owners: List[AddressEntry]  # 最長一致したプレフィックスに設定されたアドレス
+    contained: List[AddressEntry]  # 問い合わせたプレフィックスに含まれるアドレス
+    
+    @property
+    def device_names(self) -> List[str]:
+        """所有デバイス（最長一致がなければプレフィックス内にアドレスを持つデバイス）"""
+        entries = self.owners or self.contained
+        return list(dict.fromkeys(entry.device_name for entry in entries))
+
+
+@dataclass
+class ConfigSnapshot:
+    device_name: str
+    config_type: str
+    date: str
+    path: str
+    content: str
+
+
 class KnowledgeBase:
     def __init__(self, kb_dir: str = "/workspace/network-rag-system/knowledge-base"):
         self.kb_dir = Path(kb_dir)
+        # コンフィグスナップショットのストア（devices/device_configs/store）
+        self.snapshot_store = SnapshotStore(self.kb_dir / "devices" / "device_configs" / "store")
+        # 読み込んだ時点のKBの世代番号（読み込み前に取得し、途中のコミットは次回に反映する）
+        self.generation = read_kb_generation(self.kb_dir)
         self.policies = {}
         self.templates = {}
         self.validation_rules = {}
+        # ビルドキャッシュ用のコンテンツハッシュ
+        self.policy_hashes = {}
+        self.template_hashes = {}
+        self.validation_rules_hash = compute_content_hash("")
+        self.compiled_rules = get_compiled_rules({}, self.validation_rules_hash)
+        # 全デバイスのアドレスと検索用のインデックス（初回参照時に構築）
+        self._reset_addresses()
         self._load_knowledge_base()
     
     def _load_knowledge_base(self):
@@ -61,6 +103,7 @@ class KnowledgeBase:
         for policy_file in devices_dir.glob("*_policy.md"):
             device_name = policy_file.stem.replace("_policy", "")
             self.policies[device_name] = self._parse_device_policy(policy_file)
+            self.policy_hashes[device_name] = compute_content_hash(asdict(self.policies[device_name]))
     
     def _parse_device_policy(self, policy_file: Path) -> DevicePolicy:
         """デバイスポリシーのパース"""
@@ -238,18 +281,50 @@ class KnowledgeBase:
             for template_file in templates_dir.glob("*.txt"):
                 with open(template_file, 'r', encoding='utf-8') as f:
                     self.templates[template_file.stem] = Template(template_file.stem, f.read())
+                self.template_hashes[template_file.stem] = compute_content_hash(self.templates[template_file.stem].content)
     
     def _load_validation_rules(self):
         """検証ルールの読み込み"""
         validation_file = self.kb_dir / "automation" / "validation-rules.yaml"
         if validation_file.exists():
-            with open(validation_file, 'r', encoding='utf-8') as f:
-                self.validation_rules = yaml.safe_load(f)
+            with open(validation_file, 'rb') as f:
+                raw_rules = f.read()
+            self.validation_rules = yaml.safe_load(raw_rules.decode('utf-8'))
+            self.validation_rules_hash = compute_content_hash(raw_rules)
+            # 実行可能な検査にコンパイルしておく（ファイルのハッシュ単位でキャッシュ）
+            self.compiled_rules = get_compiled_rules(self.validation_rules, self.validation_rules_hash)
+    
+    def reload(self):
+        """知識ベースの再読み込み"""
+        self.generation = read_kb_generation(self.kb_dir)
+        self.policies = {}
+        self.templates = {}
+        self.validation_rules = {}
+        self.policy_hashes = {}
+        self.template_hashes = {}
+        self.validation_rules_hash = compute_content_hash("")
+        self.compiled_rules = get_compiled_rules({}, self.validation_rules_hash)
+        # 全デバイスのアドレスと検索用のインデックス（初回参照時に構築）
+        self._reset_addresses()
+        self._load_knowledge_base()
+    
+    def reload_if_changed(self) -> bool:
+        """KBの世代番号が読み込み時から進んでいれば再読み込みする（再読み込みしたらTrue）"""
+        if read_kb_generation(self.kb_dir) == self.generation:
+            return False
+        self.reload()
+        return True
     
     def get_device_policy(self, device_name: str) -> Optional[DevicePolicy]:
         """デバイスポリシーの取得"""
         return self.policies.get(device_name)
     
+    def set_device_policy(self, device_name: str, policy: DevicePolicy):
+        """デバイスポリシーの登録・置き換え"""
+        self.policies[device_name] = policy
+        self.policy_hashes[device_name] = compute_content_hash(asdict(policy))
+        self._reset_addresses()
+    
     def get_template(self, template_name: str) -> Optional[str]:
         """テンプレートの取得"""
         return self.templates.get(template_name)
@@ -258,6 +333,179 @@ class KnowledgeBase:
         """検証ルールの取得"""
         return self.validation_rules
     
+    def get_compiled_rules(self) -> CompiledRuleSet:
+        """コンパイル済み検証ルールの取得"""
+        return self.compiled_rules
+    
+    def get_latest_running_config(self, device_name: str,
+                                  config_type: str = "running_config") -> Optional[ConfigSnapshot]:
+        """デバイスの最新のコンフィグスナップショットの取得
+
+        スナップショットストアと、従来の日付付きファイル（devices/device_configs）の
+        新しい方を返す。
+        """
+        record = self.snapshot_store.latest(device_name, config_type)
+        legacy = self._get_latest_legacy_config(device_name, config_type)
+        if record is None or (legacy is not None and legacy.date > record.date):
+            return legacy
+        
+        return ConfigSnapshot(
+            device_name=device_name,
+            config_type=config_type,
+            date=record.date,
+            path=str(self.snapshot_store.object_path(record.hash)),
+            content=self.snapshot_store.get(record)
+        )
+    
+    def _get_latest_legacy_config(self, device_name: str, config_type: str) -> Optional[ConfigSnapshot]:
+        """従来の日付付きファイルの最新のスナップショット"""
+        configs_dir = self.kb_dir / "devices" / "device_configs"
+        if not configs_dir.exists():
+            return None
+        
+        # ファイル名は {device_name}_{config_type}_{YYYY-MM-DD}.txt
+        pattern = re.compile(rf'^{re.escape(device_name)}_{re.escape(config_type)}_(\d{{4}}-\d{{2}}-\d{{2}})\.txt$')
+        snapshots = []
+        for config_file in configs_dir.glob(f"{device_name}_{config_type}_*.txt"):
+            match = pattern.match(config_file.name)
+            if match:
+                snapshots.append((match.group(1), config_file))
+        
+        if not snapshots:
+            return None
+        
+        date, config_file = max(snapshots)
+        with open(config_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        return ConfigSnapshot(
+            device_name=device_name,
+            config_type=config_type,
+            date=date,
+            path=str(config_file),
+            content=self._strip_config_metadata(content)
+        )
+    
+    def list_archived_devices(self, config_type: str = "running_config") -> List[str]:
+        """コンフィグが保存されているデバイスの一覧（スナップショットストアと従来のファイル）"""
+        devices = set(self.snapshot_store.devices(config_type))
+        configs_dir = self.kb_dir / "devices" / "device_configs"
+        if not configs_dir.exists():
+            return sorted(devices)
+        
+        pattern = re.compile(rf'^(.+)_{re.escape(config_type)}_\d{{4}}-\d{{2}}-\d{{2}}\.txt$')
+        for config_file in configs_dir.glob(f"*_{config_type}_*.txt"):
+            match = pattern.match(config_file.name)
+            if match:
+                devices.add(match.group(1))
+        return sorted(devices)
+    
+    def _reset_addresses(self):
+        """アドレス関連のインデックスの破棄（ポリシー・コンフィグの変更時）"""
+        self.address_entries = None
+        self.address_index = None
+        self.prefix_trie = None
+    
+    def get_address_entries(self) -> List[AddressEntry]:
+        """全デバイスのアドレスの取得
+        
+        ポリシーの管理IPアドレス・HSRPの仮想IPと、各デバイスの最新の
+        running-config（devices/device_configs）のインターフェースアドレス・HSRPの仮想IP。
+        """
+        if self.address_entries is None:
+            self.address_entries = self._collect_address_entries()
+        return self.address_entries
+    
+    def _collect_address_entries(self) -> List[AddressEntry]:
+        """ポリシーとアーカイブ済みコンフィグからのアドレスの収集"""
+        entries = []
+        
+        for device_name, policy in self.policies.items():
+            parsed = parse_address(policy.ip_address)
+            if parsed:
+                entries.append(AddressEntry(device_name, None, parsed[0], parsed[1], source='policy'))
+            for group, virtual_ip in policy.ha_config.get('hsrp_groups', {}).items():
+                parsed = parse_address(str(virtual_ip))
+                if parsed:
+                    entries.append(AddressEntry(device_name, None, parsed[0], parsed[1],
+                                                kind='hsrp', group=str(group), source='policy'))
+        
+        for device_name in self.list_archived_devices():
+            snapshot = self.get_latest_running_config(device_name)
+            if snapshot is not None:
+                entries.extend(extract_addresses(device_name, snapshot.content))
+        
+        return entries
+    
+    def get_address_index(self) -> AddressIndex:
+        """全デバイスのアドレスの区間インデックスの取得"""
+        if self.address_index is None:
+            self.address_index = AddressIndex(self.get_address_entries())
+        return self.address_index
+    
+    def find_address_conflicts(self) -> List[AddressConflict]:
+        """全デバイスの重複IP・サブネットの重なり・HSRP仮想IPの競合の検出"""
+        return self.get_address_index().find_conflicts()
+    
+    def get_prefix_trie(self) -> PrefixTrie:
+        """アドレス・サブネットから所有デバイスを引くトライの取得
+        
+        インターフェースのアドレスはサブネットとホストアドレス（/32）の両方に、
+        HSRPの仮想IPはホストアドレスのみに登録する。
+        """
+        if self.prefix_trie is None:
+            trie = PrefixTrie()
+            for entry in self.get_address_entries():
+                if entry.kind == 'interface' and entry.prefix_len < 32:
+                    trie.insert(entry.address, entry.prefix_len, entry)
+                trie.insert(entry.address, 32, entry)
+            self.prefix_trie = trie
+        return self.prefix_trie
+    
+    def lookup_address(self, address: str) -> Optional[AddressLookup]:
+        """アドレス・プレフィックス（A.B.C.D または A.B.C.D/len）の所有デバイスの検索（最長一致）"""
+        parsed = parse_address(address)
+        if parsed is None:
+            return None
+        
+        trie = self.get_prefix_trie()
+        match = trie.longest_match(parsed[0], parsed[1])
+        contained = []
+        if parsed[1] < 32:
+            for covered in trie.covered(parsed[0], parsed[1]):
+                contained.extend(covered.values)
+        
+        return AddressLookup(
+            query=address,
+            matched_prefix=match.prefix if match else None,
+            owners=list(dict.fromkeys(match.values)) if match else [],
+            contained=list(dict.fromkeys(contained))
+        )
+    
+    def _strip_config_metadata(self, content: str) -> str:
+        """先頭の「#」メタデータヘッダーの除去"""
+        lines = content.split('\n')
+        start = 0
+        while start < len(lines) and (not lines[start].strip() or lines[start].startswith('#')):
+            start += 1
+        return '\n'.join(lines[start:])
+    
+    def get_policy_hash(self, device_name: str) -> Optional[str]:
+        """デバイスポリシーのコンテンツハッシュの取得"""
+        return self.policy_hashes.get(device_name)
+    
+    def get_policies_hash(self) -> str:
+        """全デバイスポリシーをまとめたコンテンツハッシュの取得"""
+        return compute_content_hash(self.policy_hashes)
+    
+    def get_template_hash(self, template_name: str) -> Optional[str]:
+        """テンプレートのコンテンツハッシュの取得"""
+        return self.template_hashes.get(template_name)
+    
+    def get_validation_rules_hash(self) -> str:
+        """検証ルールファイルのコンテンツハッシュの取得"""
+        return self.validation_rules_hash
+    
     def search_policies(self, keyword: str) -> List[str]:
         """ポリシー検索"""
         results = []
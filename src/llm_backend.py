@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+# llm_backend.py
+import json
+import time
+import random
+import socket
+import asyncio
+import threading
+import http.client
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import LifoQueue, Empty
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Any
+from urllib.parse import urlsplit
+
+
+class LLMBackendError(Exception):
+    """LLMバックエンド呼び出しのエラー"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+class LLMBackend(ABC):
+    """LLMバックエンドの抽象基底クラス"""
+
+    model: str = "unknown"
+
+    @abstractmethod
+    def generate(self, prompt: str, **params: Any) -> str:
+        """プロンプトからテキストを生成する"""
+        pass
+
+    async def agenerate(self, prompt: str, **params: Any) -> str:
+        """非同期版のテキスト生成（デフォルトはスレッドプールで同期版を実行）"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, lambda: self.generate(prompt, **params))
+
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        """生成テキストを逐次返す（デフォルトは一括生成の結果を1チャンクで返す）"""
+        yield self.generate(prompt, **params)
+
+    async def astream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """生成テキストを逐次返す（非同期版）"""
+        yield await self.agenerate(prompt, **params)
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """キャッシュキーに含めるバックエンド識別情報"""
+        return {'backend': type(self).__name__, 'model': self.model}
+
+    def close(self):
+        """リソースの解放"""
+        pass
+
+
+class _HTTPConnectionPool:
+    """Keep-Alive接続を使い回すHTTP接続プール"""
+
+    def __init__(self, scheme: str, host: str, port: Optional[int], maxsize: int, timeout: float):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._pool = LifoQueue(maxsize=maxsize)
+
+    def acquire(self) -> http.client.HTTPConnection:
+        """接続の取得（空きがなければ新規作成）"""
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            connection_class = (
+                http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            )
+            return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn: http.client.HTTPConnection):
+        """接続の返却"""
+        try:
+            self._pool.put_nowait(conn)
+        except Exception:
+            conn.close()
+
+    def discard(self, conn: http.client.HTTPConnection):
+        """壊れた接続の破棄"""
+        conn.close()
+
+    def close(self):
+        """プール内の全接続のクローズ"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+
+class HTTPLLMBackend(LLMBackend):
+    """HTTP APIを呼び出すLLMバックエンド
+
+    Keep-Alive接続のプールを使い、同時実行数・リクエストごとのタイムアウト・
+    指数バックオフ付きリトライを制御する。新たな依存ライブラリを増やさないため、
+    HTTPクライアントは標準ライブラリの http.client（ブロッキング）で実装しており、
+    非同期API（agenerate / astream）はネイティブの非同期クライアントではなく、
+    専用スレッドプール上で同期版を実行して同じ接続プールを共有する。
+    """
+
+    RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self, api_url: str, api_key: Optional[str] = None, model: str = "default",
+                 endpoint: str = "/v1/completions", max_concurrency: int = 4,
+                 timeout: float = 30.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, default_params: Optional[Dict[str, Any]] = None):
+        parsed = urlsplit(api_url)
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise ValueError(f"Invalid LLM API URL: {api_url}")
+
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.path = parsed.path.rstrip('/') + endpoint
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_params = default_params or {}
+
+        self._pool = _HTTPConnectionPool(parsed.scheme, parsed.hostname, parsed.port,
+                                         maxsize=max_concurrency, timeout=timeout)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="llm-backend")
+
+    def generate(self, prompt: str, **params: Any) -> str:
+        """プロンプトからテキストを生成する（リトライ付き）"""
+        payload = {'model': self.model, 'prompt': prompt}
+        payload.update(self.default_params)
+        payload.update(params)
+
+        attempt = 0
+        while True:
+            try:
+                with self._semaphore:
+                    body = self._post(payload)
+                return self._extract_text(body)
+            except LLMBackendError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            time.sleep(self._backoff_delay(attempt))
+
+    async def agenerate(self, prompt: str, **params: Any) -> str:
+        """非同期版のテキスト生成"""
+        loop = asyncio.get_event_loop()
+        deadline = self.timeout * (self.max_retries + 1) + self.backoff_max * self.max_retries
+        return await asyncio.wait_for(
+            loop.run_in_executor(self._executor, lambda: self.generate(prompt, **params)),
+            timeout=deadline
+        )
+
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        """Server-Sent Eventsで生成テキストを逐次受け取る
+
+        リトライは最初のチャンクを受け取る前の失敗に限る。同時実行数の枠（max_concurrency）を
+        使うのは接続の確立とレスポンスヘッダーの受信までで、読み出し中のストリームは枠を
+        占有しない。ストリーム用の接続はプールに戻さず、読み終えるか close() した時点で
+        閉じるため、途中で読むのをやめる場合は返されたジェネレーターを close() すること。
+        """
+        yield from self._stream(prompt, params)
+
+    def _stream(self, prompt: str, params: Dict[str, Any],
+                on_open: Optional[Callable[[http.client.HTTPConnection], None]] = None) -> Iterator[str]:
+        """stream の本体（on_open には読み出し中の接続を渡す）"""
+        payload = {'model': self.model, 'prompt': prompt}
+        payload.update(self.default_params)
+        payload.update(params)
+        payload['stream'] = True
+
+        attempt = 0
+        while True:
+            try:
+                with self._semaphore:
+                    conn, response = self._open_stream(payload)
+                if on_open is not None:
+                    on_open(conn)
+                try:
+                    yield from self._iter_sse_text(response)
+                finally:
+                    self._pool.discard(conn)
+                return
+            except LLMBackendError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            time.sleep(self._backoff_delay(attempt))
+
+    async def astream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """Server-Sent Eventsで生成テキストを逐次受け取る（非同期版）
+
+        同期版のストリームをスレッドプールで読む。途中で読むのをやめた場合
+        （aclose・例外・タイムアウト）は読み出し中の接続を閉じて読み出しスレッドを止める。
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stopped = threading.Event()
+        connections = []
+
+        def put(item):
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def pump():
+            # 同期ストリームをスレッドプールで読み、イベントループのキューへ渡す
+            chunks = self._stream(prompt, params, on_open=connections.append)
+            try:
+                for chunk in chunks:
+                    if stopped.is_set():
+                        break
+                    put(chunk)
+            except BaseException as e:
+                put(e)
+            finally:
+                chunks.close()
+            put(done)
+
+        future = loop.run_in_executor(self._executor, pump)
+        finished = False
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout=self.timeout)
+                if item is done:
+                    finished = True
+                    break
+                if isinstance(item, BaseException):
+                    finished = True
+                    raise item
+                yield item
+        finally:
+            if not finished:
+                stopped.set()
+                for conn in connections:
+                    _shutdown_connection(conn)
+        await future
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """キャッシュキーに含めるバックエンド識別情報"""
+        return {
+            'backend': type(self).__name__,
+            'model': self.model,
+            'endpoint': self.api_url.rstrip('/') + self.path,
+            'params': self.default_params
+        }
+
+    def close(self):
+        """接続プールとスレッドプールの解放"""
+        self._executor.shutdown(wait=False)
+        self._pool.close()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """指数バックオフ（ジッター付き）の待機時間"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """APIへのPOSTリクエスト"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive'
+        }
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        conn = self._pool.acquire()
+        try:
+            conn.request('POST', self.path, body=data, headers=headers)
+            response = conn.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # タイムアウト・切断は接続を破棄してリトライ対象とする
+            self._pool.discard(conn)
+            raise LLMBackendError(f"LLM API request failed: {e}", retryable=True)
+
+        if response.will_close:
+            self._pool.discard(conn)
+        else:
+            self._pool.release(conn)
+
+        if response.status >= 400:
+            raise LLMBackendError(
+                f"LLM API returned HTTP {response.status}: {raw[:200]!r}",
+                status=response.status,
+                retryable=response.status in self.RETRYABLE_STATUSES
+            )
+
+        try:
+            return json.loads(raw.decode('utf-8'))
+        except ValueError as e:
+            raise LLMBackendError(f"Invalid JSON from LLM API: {e}")
+
+    def _open_stream(self, payload: Dict[str, Any]) -> tuple:
+        """ストリーミングリクエストの送信（接続とレスポンスを返す）"""
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        }
+        if self.api_key:
+            headers['Authorization'] = f"Bearer {self.api_key}"
+
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        conn = self._pool.acquire()
+        try:
+            conn.request('POST', self.path, body=data, headers=headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as e:
+            self._pool.discard(conn)
+            raise LLMBackendError(f"LLM API request failed: {e}", retryable=True)
+
+        if response.status >= 400:
+            raw = response.read()
+            self._pool.discard(conn)
+            raise LLMBackendError(
+                f"LLM API returned HTTP {response.status}: {raw[:200]!r}",
+                status=response.status,
+                retryable=response.status in self.RETRYABLE_STATUSES
+            )
+
+        return conn, response
+
+    def _iter_sse_text(self, response: http.client.HTTPResponse) -> Iterator[str]:
+        """SSEレスポンスから生成テキストのチャンクを取り出す"""
+        while True:
+            try:
+                line = response.readline()
+            except (OSError, http.client.HTTPException) as e:
+                raise LLMBackendError(f"LLM API stream interrupted: {e}")
+            if not line:
+                break
+
+            line = line.decode('utf-8').strip()
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+
+            try:
+                body = json.loads(data)
+            except ValueError as e:
+                raise LLMBackendError(f"Invalid JSON in LLM API stream: {e}")
+
+            choices = body.get('choices') or [{}]
+            delta = choices[0].get('delta') or {}
+            text = choices[0].get('text', delta.get('content', body.get('text', '')))
+            if text:
+                yield text
+
+    def _extract_text(self, body: Dict[str, Any]) -> str:
+        """レスポンスから生成テキストを取り出す"""
+        choices = body.get('choices')
+        if choices:
+            choice = choices[0]
+            if 'text' in choice:
+                return choice['text']
+            if 'message' in choice:
+                return choice['message'].get('content', '')
+
+        for field_name in ('text', 'response', 'content'):
+            if field_name in body:
+                return body[field_name]
+
+        raise LLMBackendError("LLM API response does not contain generated text")
+
+
+def _shutdown_connection(conn: http.client.HTTPConnection):
+    """他のスレッドで読み出し中の接続の切断（読み出しをすぐに終わらせる）"""
+    sock = conn.sock
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class StubLLMServer:
+    """テスト用のローカルLLMスタブサーバー
+
+    responderにプロンプトを受け取ってテキストを返す関数を渡す。
+    fail_first_nを指定すると最初のN回は503を返し、リトライの確認に使える。
+    """
+
+    def __init__(self, responder: Optional[Callable[[str], str]] = None,
+                 delay: float = 0.0, fail_first_n: int = 0, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder or (lambda prompt: "! stub response\nhostname STUB\n")
+        self.delay = delay
+        self.fail_first_n = fail_first_n
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """サーバーのベースURL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLLMServer":
+        """サーバーの起動"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """サーバーの停止"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _make_handler(self):
+        """リクエストハンドラークラスの生成"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+
+                with stub._lock:
+                    stub.requests.append(payload)
+                    should_fail = len(stub.requests) <= stub.fail_first_n
+
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                if should_fail:
+                    self._send(503, {'error': 'stub failure'})
+                elif payload.get('stream'):
+                    self._send_stream(stub.responder(payload.get('prompt', '')))
+                else:
+                    text = stub.responder(payload.get('prompt', ''))
+                    self._send(200, {'model': payload.get('model'), 'choices': [{'text': text}]})
+
+            def _send_stream(self, text: str):
+                # 行単位のチャンクをSSEで送り、最後に接続を閉じる
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for chunk in text.splitlines(keepends=True):
+                    event = json.dumps({'choices': [{'text': chunk}]}, ensure_ascii=False)
+                    self.wfile.write(f"data: {event}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    if stub.delay:
+                        time.sleep(stub.delay / 10)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+            def _send(self, status: int, body: Dict[str, Any]):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
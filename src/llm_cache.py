@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# llm_cache.py
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, Optional, Any
+from .llm_backend import LLMBackend
+from .utils import compute_content_hash
+
+
+class LLMResponseCache:
+    """プロンプト→応答の永続キャッシュ（SQLite）
+
+    キーはプロンプトのハッシュとモデル・パラメータから計算する。
+    エントリ数・合計サイズの上限を超えると最終アクセスが古いものから削除し、
+    TTLを過ぎたエントリは参照時にミスとして扱って削除する。
+    ヒット時の最終アクセス時刻はメモリに記録し、access_flush_size 件たまったとき・
+    保存や削除の前・クローズ時にまとめて書き込む（参照ごとのコミットを避ける）。
+    """
+
+    def __init__(self, db_path: str = ":memory:", max_entries: int = 10000,
+                 max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 access_flush_size: int = 256):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.access_flush_size = access_flush_size
+        self._lock = threading.Lock()
+        # 未書き込みの最終アクセス時刻（キー→時刻）
+        self._pending_access: Dict[str, float] = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, backend_identity: Dict[str, Any], params: Optional[Dict[str, Any]] = None) -> str:
+        """キャッシュキーの計算"""
+        return compute_content_hash({
+            'prompt': compute_content_hash(prompt),
+            'backend': backend_identity,
+            'params': params or {}
+        })
+
+    def get(self, key: str) -> Optional[str]:
+        """応答の取得"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+
+            response, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._pending_access.pop(key, None)
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._pending_access[key] = now
+            if len(self._pending_access) >= self.access_flush_size:
+                self._flush_access()
+                self._conn.commit()
+            self._stats['hits'] += 1
+            return response
+
+    def put(self, key: str, response: str):
+        """応答の保存"""
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._pending_access.pop(key, None)
+            self._flush_access()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._stats['stores'] += 1
+            self._evict()
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """TTL切れエントリの一括削除"""
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            self._stats['expired'] += cursor.rowcount
+            return cursor.rowcount
+
+    def clear(self):
+        """キャッシュ全体のクリア"""
+        with self._lock:
+            self._pending_access.clear()
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計の取得"""
+        with self._lock:
+            stats = dict(self._stats)
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+            ).fetchone()
+
+        lookups = stats['hits'] + stats['misses']
+        stats['lookups'] = lookups
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        stats['total_bytes'] = total_bytes
+        return stats
+
+    def close(self):
+        """データベース接続のクローズ（未書き込みのアクセス時刻を書き込む）"""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+    def _flush_access(self):
+        """メモリに記録した最終アクセス時刻の書き込み（ロック取得済みで呼ぶこと、コミットは呼び出し側）"""
+        if not self._pending_access:
+            return
+        self._conn.executemany(
+            "UPDATE llm_responses SET last_access = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._pending_access.items()]
+        )
+        self._pending_access.clear()
+
+    def _evict(self):
+        """上限超過分を最終アクセスが古い順に削除（ロック取得済みで呼ぶこと）"""
+        entries, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses"
+        ).fetchone()
+
+        over_entries = max(0, entries - self.max_entries)
+        over_bytes = max(0, total_bytes - self.max_bytes) if self.max_bytes is not None else 0
+        if not over_entries and not over_bytes:
+            return
+
+        evicted = 0
+        freed = 0
+        rows = self._conn.execute("SELECT key, size FROM llm_responses ORDER BY last_access ASC")
+        victims = []
+        for key, size in rows:
+            if evicted >= over_entries and freed >= over_bytes:
+                break
+            victims.append((key,))
+            evicted += 1
+            freed += size
+        rows.close()
+
+        self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", victims)
+        self._stats['evictions'] += len(victims)
+
+
+class CachedLLMBackend(LLMBackend):
+    """応答キャッシュを前段に置いたLLMバックエンド"""
+
+    def __init__(self, backend: LLMBackend, cache: LLMResponseCache):
+        self.backend = backend
+        self.cache = cache
+        self.model = backend.model
+
+    def generate(self, prompt: str, **params: Any) -> str:
+        """キャッシュを参照し、ミス時のみバックエンドを呼び出す"""
+        key = self.cache.make_key(prompt, self.backend.get_cache_identity(), params)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.backend.generate(prompt, **params)
+            self.cache.put(key, response)
+        return response
+
+    async def agenerate(self, prompt: str, **params: Any) -> str:
+        """キャッシュを参照し、ミス時のみバックエンドを呼び出す（非同期版）
+
+        SQLiteの読み書きはスレッドプールで行い、イベントループを止めない。
+        """
+        loop = asyncio.get_event_loop()
+        key = self.cache.make_key(prompt, self.backend.get_cache_identity(), params)
+        response = await loop.run_in_executor(None, self.cache.get, key)
+        if response is None:
+            response = await self.backend.agenerate(prompt, **params)
+            await loop.run_in_executor(None, self.cache.put, key, response)
+        return response
+
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        """キャッシュヒット時は一括で、ミス時はバックエンドのストリームを中継して保存"""
+        key = self.cache.make_key(prompt, self.backend.get_cache_identity(), params)
+        response = self.cache.get(key)
+        if response is not None:
+            yield response
+            return
+
+        chunks = []
+        for chunk in self.backend.stream(prompt, **params):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, ''.join(chunks))
+
+    async def astream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """キャッシュを参照するストリーミング生成（非同期版）"""
+        loop = asyncio.get_event_loop()
+        key = self.cache.make_key(prompt, self.backend.get_cache_identity(), params)
+        response = await loop.run_in_executor(None, self.cache.get, key)
+        if response is not None:
+            yield response
+            return
+
+        chunks = []
+        async for chunk in self.backend.astream(prompt, **params):
+            chunks.append(chunk)
+            yield chunk
+        await loop.run_in_executor(None, self.cache.put, key, ''.join(chunks))
+
+    def get_cache_identity(self) -> Dict[str, Any]:
+        """キャッシュキーに含めるバックエンド識別情報"""
+        return self.backend.get_cache_identity()
+
+    def close(self):
+        """バックエンドとキャッシュの解放"""
+        self.backend.close()
+        self.cache.close()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# platforms.py
+"""プラットフォームごとの解析処理の登録と判定
+
+IOS・IOS XE・IOS XR・NX-OS・FTD・WLC の各プラットフォームについて、メタデータ抽出
+（KeywordDispatcher）・セクション分類・ホスト名の行・構文チェックの文法名を
+PlatformPlugin にまとめて登録する。コンフィグのプラットフォームは接続情報の
+device_type（netmikoの名前）か、コンフィグ先頭の数KBに現れる特徴的な行から判定し、
+以降の処理はそのプラットフォームの処理だけで行う。
+"""
+import re
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Union
+from .config_parser import ConfigNode, ConfigTree, KeywordDispatcher, iter_config_lines
+from .ipaddr import int_to_ip, prefix_to_mask
+
+# 判定に使うコンフィグ先頭の文字数
+FINGERPRINT_CHARS = 4096
+
+# 接続情報の device_type（netmikoの名前）の接尾辞
+DEVICE_TYPE_SUFFIXES = ('_ssh', '_telnet', '_serial')
+
+# メタデータ抽出のパターン（振り分け表で選んだ1つだけを各行に適用する）
+INTERFACE_PATTERN = re.compile(r'^interface\s+(\S+)', re.IGNORECASE)
+IP_ADDRESS_PATTERN = re.compile(r'ip address\s+(\d+\.\d+\.\d+\.\d+)\s+(\d+\.\d+\.\d+\.\d+)', re.IGNORECASE)
+# マスク表記とプレフィックス表記の両方（NX-OS・IOS XR）
+IP_ADDRESS_PREFIX_PATTERN = re.compile(
+    r'(?:ip|ipv4) address\s+(\d+\.\d+\.\d+\.\d+)(?:/(\d{1,2})|\s+(\d+\.\d+\.\d+\.\d+))', re.IGNORECASE
+)
+ROUTER_PATTERN = re.compile(r'^router\s+(\S+)')
+VLAN_PATTERN = re.compile(r'^vlan\s+(\d+)', re.IGNORECASE)
+ACCESS_LIST_PATTERN = re.compile(r'ip access-list\s+(\w+)', re.IGNORECASE)
+IPV4_ACCESS_LIST_PATTERN = re.compile(r'ipv4 access-list\s+(\S+)', re.IGNORECASE)
+NAMED_ACCESS_LIST_PATTERN = re.compile(r'^access-list\s+(\S+)\s+extended\b', re.IGNORECASE)
+USERNAME_PATTERN = re.compile(r'^username\s+(\w+)\s+privilege\s+(\d+)', re.IGNORECASE)
+SNMP_COMMUNITY_PATTERN = re.compile(r'snmp-server\s+community\s+"?([^"\s]+)"?', re.IGNORECASE)
+NTP_SERVER_PATTERN = re.compile(r'ntp server\s+(\d+\.\d+\.\d+\.\d+)', re.IGNORECASE)
+
+
+def _interface_of(node: ConfigNode) -> Optional[str]:
+    """行が属するインターフェース名（ツリーの親から求める）"""
+    match = INTERFACE_PATTERN.match(node.block.stripped)
+    return match.group(1) if match else None
+
+
+def _address(node: ConfigNode, match: 're.Match') -> Dict[str, Optional[str]]:
+    """IPアドレスの行の値（プレフィックス表記はマスク表記にそろえる）"""
+    groups = match.groups()
+    if len(groups) == 3 and groups[1] is not None:
+        subnet = int_to_ip(prefix_to_mask(int(groups[1])))
+    else:
+        subnet = groups[-1]
+    return {'interface': _interface_of(node), 'ip': match.group(1), 'subnet': subnet}
+
+
+def build_metadata_dispatcher(address_keywords: Iterable[str] = ('ip address',),
+                              address_pattern: Pattern = IP_ADDRESS_PATTERN,
+                              access_lists: Iterable[Tuple[str, Pattern]] = (
+                                  ('ip access-list', ACCESS_LIST_PATTERN),)) -> KeywordDispatcher:
+    """メタデータ抽出の振り分け表（行の先頭1〜2語 → パターン・項目・値）"""
+    dispatcher = KeywordDispatcher()
+    dispatcher.register('interface', INTERFACE_PATTERN, 'interfaces',
+                        lambda node, match: match.group(1))
+    for keyword in address_keywords:
+        dispatcher.register(keyword, address_pattern, 'ip_addresses', _address)
+    dispatcher.register('router', ROUTER_PATTERN, 'routing_protocols',
+                        lambda node, match: match.group(1))
+    dispatcher.register('vlan', VLAN_PATTERN, 'vlans',
+                        lambda node, match: match.group(1))
+    for keyword, pattern in access_lists:
+        dispatcher.register(keyword, pattern, 'access_lists',
+                            lambda node, match: match.group(1))
+    dispatcher.register('username', USERNAME_PATTERN, 'users',
+                        lambda node, match: {'username': match.group(1), 'privilege': match.group(2)})
+    dispatcher.register('snmp-server community', SNMP_COMMUNITY_PATTERN, 'snmp_communities',
+                        lambda node, match: match.group(1))
+    dispatcher.register('ntp server', NTP_SERVER_PATTERN, 'ntp_servers',
+                        lambda node, match: match.group(1))
+    return dispatcher
+
+
+def build_section_dispatcher(sections: Dict[str, Iterable[str]]) -> KeywordDispatcher:
+    """トップレベルのブロックのセクション分類（セクション名 → 先頭1〜2語のキーワード）"""
+    dispatcher = KeywordDispatcher()
+    for section, keywords in sections.items():
+        for keyword in keywords:
+            dispatcher.register(keyword, '', section, None)
+    return dispatcher
+
+
+@dataclass
+class PlatformPlugin:
+    """1つのプラットフォームの解析処理
+
+    markers はコンフィグ先頭に現れる特徴的な行の (正規表現, 重み)。判定では一致した
+    重みの合計が最も大きいプラットフォームを選ぶ。grammar は command-grammar.yaml の
+    プラットフォーム名。
+    """
+    name: str
+    label: str
+    device_types: Tuple[str, ...]
+    markers: List[Tuple[str, int]]
+    metadata: KeywordDispatcher
+    sections: KeywordDispatcher
+    hostname_keywords: Tuple[str, ...] = ('hostname',)
+    management_keywords: Tuple[str, ...] = ('snmp', 'ntp', 'ssh', 'telnet', 'logging')
+    grammar: Optional[str] = None
+
+    def __post_init__(self):
+        if self.grammar is None:
+            self.grammar = self.name
+
+    @property
+    def template_type(self) -> str:
+        """設定テンプレートの種別（netmikoの device_type）"""
+        return self.device_types[0]
+
+    def section_of(self, stripped: str) -> Optional[str]:
+        """トップレベルの行のセクション（判定できなければNone）"""
+        rule = self.sections.classify(stripped)
+        if rule is not None:
+            return rule[1]
+        lowered = stripped.lower()
+        if any(keyword in lowered for keyword in self.management_keywords):
+            return 'management'
+        return None
+
+    def hostname_nodes(self, tree: ConfigTree) -> List[ConfigNode]:
+        """ホスト名を設定する行"""
+        return [node for keyword in self.hostname_keywords for node in tree.find(keyword)
+                if node.stripped.lower().startswith(keyword + ' ')]
+
+    def is_hostname(self, stripped: str) -> bool:
+        """ホスト名を設定する行かどうか（ツリーを作らずに1行ずつ判定する場合）"""
+        lowered = stripped.lower()
+        return any(lowered.startswith(keyword + ' ') for keyword in self.hostname_keywords)
+
+
+def normalize_platform(name: Optional[str]) -> Optional[str]:
+    """プラットフォーム名の正規化（「IOS-XE」「nxos」→「ios_xe」「nx_os」）"""
+    if not name:
+        return None
+    normalized = re.sub(r'[\s\-]+', '_', name.strip().lower())
+    return {'iosxe': 'ios_xe', 'nxos': 'nx_os', 'iosxr': 'ios_xr'}.get(normalized, normalized)
+
+
+class PlatformRegistry:
+    """プラットフォームの登録と判定
+
+    全プラットフォームの特徴的な行を1つの正規表現にまとめておき、コンフィグ先頭の
+    FINGERPRINT_CHARS 文字を1回走査するだけで判定する。
+    """
+
+    def __init__(self, default: str = 'ios'):
+        self.default = default
+        self._plugins: Dict[str, PlatformPlugin] = {}
+        self._device_types: Dict[str, str] = {}
+        self._markers = None
+        self._marker_weights: List[Tuple[str, int]] = []
+        self._lock = threading.Lock()
+
+    def register(self, plugin: PlatformPlugin):
+        """プラットフォームの登録（同名は置き換え）"""
+        with self._lock:
+            self._plugins[plugin.name] = plugin
+            for device_type in plugin.device_types:
+                self._device_types[device_type] = plugin.name
+            self._markers = None
+
+    def names(self) -> List[str]:
+        return list(self._plugins)
+
+    def get(self, name: Optional[str]) -> Optional[PlatformPlugin]:
+        """プラットフォーム名または device_type に対応するプラットフォーム"""
+        if not name:
+            return None
+        key = name.strip().lower()
+        for suffix in DEVICE_TYPE_SUFFIXES:
+            if key.endswith(suffix):
+                key = key[:-len(suffix)]
+        plugin_name = self._device_types.get(key, normalize_platform(key))
+        return self._plugins.get(plugin_name)
+
+    def _compiled_markers(self) -> Tuple[Pattern, List[Tuple[str, int]]]:
+        with self._lock:
+            if self._markers is None:
+                alternatives, weights = [], []
+                for plugin in self._plugins.values():
+                    for pattern, weight in plugin.markers:
+                        alternatives.append(f"(?P<m{len(weights)}>{pattern})")
+                        weights.append((plugin.name, weight))
+                self._markers = re.compile('|'.join(alternatives) or r'(?!)', re.MULTILINE)
+                self._marker_weights = weights
+            return self._markers, self._marker_weights
+
+    def fingerprint(self, head: str) -> Dict[str, int]:
+        """コンフィグ先頭のテキストに対するプラットフォームごとの得点"""
+        markers, weights = self._compiled_markers()
+        scores = {}
+        seen = set()
+        for match in markers.finditer(head):
+            index = int(match.lastgroup[1:])
+            # 同じ特徴は1回だけ数える
+            if index in seen:
+                continue
+            seen.add(index)
+            name, weight = weights[index]
+            scores[name] = scores.get(name, 0) + weight
+        return scores
+
+    def detect(self, config: Union[str, Iterable[str], ConfigTree],
+               device_type: Optional[str] = None) -> PlatformPlugin:
+        """コンフィグのプラットフォーム
+
+        device_type（netmikoの名前またはプラットフォーム名）が登録済みならそれを使い、
+        なければコンフィグ先頭の特徴から判定する（該当がなければ既定のプラットフォーム）。
+        """
+        plugin = self.get(device_type)
+        if plugin is not None:
+            return plugin
+
+        scores = self.fingerprint(_config_head(config))
+        if scores:
+            # 同点は登録順
+            best = max(self._plugins, key=lambda name: scores.get(name, 0))
+            if scores.get(best):
+                return self._plugins[best]
+        return self._plugins[self.default]
+
+    def detect_lines(self, config: Iterable[Union[str, bytes]],
+                     device_type: Optional[str] = None) -> Tuple[PlatformPlugin, Iterator[str]]:
+        """行イテレータのプラットフォームと、判定に読んだ行を戻した行イテレータ
+
+        判定には先頭の FINGERPRINT_CHARS 文字分の行だけを読み、残りは読まない。
+        """
+        lines = iter_config_lines(config)
+        plugin = self.get(device_type)
+        if plugin is not None:
+            return plugin, lines
+        head = _read_head(lines)
+        return self.detect('\n'.join(head)), itertools.chain(head, lines)
+
+
+def _read_head(lines: Iterable[str]) -> List[str]:
+    """先頭の FINGERPRINT_CHARS 文字分の行（それ以降は読まない）"""
+    texts = []
+    size = 0
+    for text in lines:
+        texts.append(text)
+        size += len(text) + 1
+        if size >= FINGERPRINT_CHARS:
+            break
+    return texts
+
+
+def _config_head(config: Union[str, Iterable[str], ConfigTree]) -> str:
+    """判定に使うコンフィグ先頭のテキスト（行イテレータは先頭の行だけを読む）"""
+    if isinstance(config, str):
+        return config[:FINGERPRINT_CHARS]
+    if isinstance(config, ConfigTree):
+        return '\n'.join(_read_head(config.texts))
+    return '\n'.join(_read_head(iter_config_lines(config)))
+
+
+IOS_SECTIONS = {
+    'basic': ('hostname',),
+    'interfaces': ('interface',),
+    'routing': ('router',),
+    'security': ('ip access-list', 'access-list'),
+}
+
+PLATFORMS = PlatformRegistry()
+
+PLATFORMS.register(PlatformPlugin(
+    name='ios',
+    label='Cisco IOS',
+    device_types=('cisco_ios',),
+    markers=[
+        # NX-OS の「version 10.2(3)」は含めない
+        (r'^version 1[0-5]\.\d+(?![\d(])', 3),
+        (r'^Current configuration : \d+ bytes', 1),
+    ],
+    metadata=build_metadata_dispatcher(),
+    sections=build_section_dispatcher(IOS_SECTIONS),
+))
+
+PLATFORMS.register(PlatformPlugin(
+    name='ios_xe',
+    label='Cisco IOS XE',
+    device_types=('cisco_xe',),
+    markers=[
+        (r'^version 1[6-9]\.\d+(?![\d(])', 3),
+        (r'Cisco IOS[ -]XE', 3),
+        (r'^license boot level', 2),
+        (r'^platform \S+', 1),
+    ],
+    metadata=build_metadata_dispatcher(),
+    sections=build_section_dispatcher(IOS_SECTIONS),
+))
+
+PLATFORMS.register(PlatformPlugin(
+    name='ios_xr',
+    label='Cisco IOS XR',
+    device_types=('cisco_xr',),
+    markers=[
+        (r'^!! IOS XR Configuration', 5),
+        (r'^RP/\d+/\S+/CPU\d+', 3),
+        (r'^\s+ipv4 address \d', 3),
+        (r'^ipv4 access-list ', 2),
+        (r'^router static\s*$', 2),
+        (r'^interface (?:Bundle-Ether|TenGigE|HundredGigE|MgmtEth)', 2),
+    ],
+    metadata=build_metadata_dispatcher(
+        ('ipv4 address',), IP_ADDRESS_PREFIX_PATTERN,
+        (('ipv4 access-list', IPV4_ACCESS_LIST_PATTERN),),
+    ),
+    sections=build_section_dispatcher({
+        **IOS_SECTIONS,
+        'security': ('ipv4 access-list', 'ipv6 access-list'),
+        'routing': ('router', 'vrf'),
+    }),
+))
+
+PLATFORMS.register(PlatformPlugin(
+    name='nx_os',
+    label='Cisco NX-OS',
+    device_types=('cisco_nxos',),
+    markers=[
+        (r'^!Command: show running-config', 5),
+        (r'^version \d+\.\d+\(\d+\)', 3),
+        (r'^feature \S+', 3),
+        (r'^vrf context ', 2),
+        (r'\brole network-admin\b', 2),
+        (r'^\s+ip address \d+\.\d+\.\d+\.\d+/\d+', 1),
+    ],
+    metadata=build_metadata_dispatcher(('ip address',), IP_ADDRESS_PREFIX_PATTERN),
+    sections=build_section_dispatcher({
+        **IOS_SECTIONS,
+        'basic': ('hostname', 'feature'),
+        'routing': ('router', 'vrf context', 'ip route'),
+        'security': ('ip access-list',),
+    }),
+))
+
+PLATFORMS.register(PlatformPlugin(
+    name='ftd',
+    label='Cisco Firepower Threat Defense',
+    device_types=('cisco_ftd', 'cisco_asa'),
+    markers=[
+        (r'^(?:NGFW|ASA) Version ', 5),
+        (r'^: Saved', 3),
+        (r'^\s+nameif \S+', 3),
+        (r'^\s+security-level \d+', 2),
+        (r'^object(?:-group)? network ', 2),
+        (r'^access-group \S+ (?:in|out|global)', 1),
+    ],
+    metadata=build_metadata_dispatcher(
+        access_lists=(('access-list', NAMED_ACCESS_LIST_PATTERN),),
+    ),
+    sections=build_section_dispatcher({
+        **IOS_SECTIONS,
+        'routing': ('router', 'route'),
+        'security': ('access-list', 'access-group', 'object', 'object-group', 'nat'),
+    }),
+))
+
+PLATFORMS.register(PlatformPlugin(
+    name='wlc',
+    label='Cisco Wireless LAN Controller',
+    device_types=('cisco_wlc',),
+    markers=[
+        (r'^\(Cisco Controller\)', 5),
+        (r'^config (?:sysname|controller|wlan|network|interface)\b', 3),
+        (r'^wlan \S+ \d+ \S+', 3),
+        (r'^wireless management interface ', 3),
+        (r'^ap profile ', 2),
+    ],
+    metadata=build_metadata_dispatcher(),
+    sections=build_section_dispatcher({
+        **IOS_SECTIONS,
+        'basic': ('hostname', 'config sysname', 'config controller'),
+        'interfaces': ('interface', 'config interface'),
+        'other': ('wlan', 'config wlan', 'wireless', 'ap'),
+    }),
+    hostname_keywords=('hostname', 'config sysname', 'config controller'),
+))
+
+
+def get_platform(name: Optional[str]) -> Optional[PlatformPlugin]:
+    """登録済みのプラットフォーム（プラットフォーム名または device_type）"""
+    return PLATFORMS.get(name)
+
+
+def detect_platform(config: Union[str, Iterable[str], ConfigTree],
+                    device_type: Optional[str] = None) -> PlatformPlugin:
+    """コンフィグのプラットフォームの判定（PLATFORMS.detect）"""
+    return PLATFORMS.detect(config, device_type)
+
+
+def detect_platform_lines(config: Iterable[Union[str, bytes]],
+                          device_type: Optional[str] = None) -> Tuple[PlatformPlugin, Iterator[str]]:
+    """行イテレータのプラットフォームの判定（PLATFORMS.detect_lines）"""
+    return PLATFORMS.detect_lines(config, device_type)
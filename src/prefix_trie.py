@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# prefix_trie.py
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional, Tuple
+from .ipaddr import int_to_ip, network_address
+
+
+class _Node:
+    """トライのノード（key はプレフィックス長より下位のビットを0にしたネットワークアドレス）"""
+    __slots__ = ('key', 'length', 'children', 'values')
+
+    def __init__(self, key: int, length: int):
+        self.key = key
+        self.length = length
+        self.children = [None, None]
+        self.values = []
+
+
+def _bit(key: int, position: int) -> int:
+    """先頭から position 番目（0始まり）のビット"""
+    return (key >> (31 - position)) & 1
+
+
+def _common_length(a: int, b: int) -> int:
+    """2つのアドレスの先頭から一致するビット数"""
+    return 32 - (a ^ b).bit_length()
+
+
+@dataclass
+class PrefixMatch:
+    """トライの検索結果の1件"""
+    network: int
+    prefix_len: int
+    values: List[Any] = field(default_factory=list)
+
+    @property
+    def prefix(self) -> str:
+        return f"{int_to_ip(self.network)}/{self.prefix_len}"
+
+
+class PrefixTrie:
+    """IPv4プレフィックスのPatriciaトライ（経路圧縮した2分木）
+
+    各ノードはプレフィックス（ネットワークアドレス, プレフィックス長）を表し、
+    値を持つノードと分岐ノードのみを保持する。最長一致検索は根から
+    プレフィックス長以下の深さまでたどるだけなので O(プレフィックス長) で終わる。
+    """
+
+    def __init__(self):
+        self._root = _Node(0, 0)
+        self._size = 0
+
+    def __len__(self) -> int:
+        """値を持つプレフィックスの数"""
+        return self._size
+
+    def insert(self, address: int, prefix_len: int, value: Any):
+        """プレフィックスへの値の追加（同じプレフィックスには値を追記する）"""
+        key = network_address(address, prefix_len)
+        node = self._root
+        while node.length < prefix_len:
+            bit = _bit(key, node.length)
+            child = node.children[bit]
+            if child is None:
+                child = _Node(key, prefix_len)
+                node.children[bit] = child
+                node = child
+                break
+
+            common = min(child.length, prefix_len, _common_length(child.key, key))
+            if common == child.length:
+                node = child
+                continue
+
+            # 途中で分かれる場合は分岐点に新しいノードを挟む
+            branch = _Node(network_address(key, common), common)
+            branch.children[_bit(child.key, common)] = child
+            node.children[bit] = branch
+            if common < prefix_len:
+                leaf = _Node(key, prefix_len)
+                branch.children[_bit(key, common)] = leaf
+                node = leaf
+            else:
+                node = branch
+            break
+
+        if not node.values:
+            self._size += 1
+        node.values.append(value)
+
+    def _path(self, address: int, prefix_len: int) -> Iterator[_Node]:
+        """根から、指定したプレフィックスを包含するノードを短い順に返す"""
+        key = network_address(address, prefix_len)
+        node = self._root
+        yield node
+        while node.length < prefix_len:
+            child = node.children[_bit(key, node.length)]
+            if child is None or child.length > prefix_len or network_address(key, child.length) != child.key:
+                return
+            node = child
+            yield node
+
+    def longest_match(self, address: int, prefix_len: int = 32) -> Optional[PrefixMatch]:
+        """指定したアドレス・プレフィックスを包含する最も長いプレフィックス"""
+        best = None
+        for node in self._path(address, prefix_len):
+            if node.values:
+                best = node
+        if best is None:
+            return None
+        return PrefixMatch(best.key, best.length, list(best.values))
+
+    def matches(self, address: int, prefix_len: int = 32) -> List[PrefixMatch]:
+        """指定したアドレス・プレフィックスを包含する全プレフィックス（短い順）"""
+        return [PrefixMatch(node.key, node.length, list(node.values))
+                for node in self._path(address, prefix_len) if node.values]
+
+    def covered(self, address: int, prefix_len: int) -> List[PrefixMatch]:
+        """指定したプレフィックスに包含される、より長いプレフィックス"""
+        key = network_address(address, prefix_len)
+        node = self._root
+        while node.length < prefix_len:
+            child = node.children[_bit(key, node.length)]
+            if child is None:
+                return []
+            if child.length >= prefix_len:
+                if network_address(child.key, prefix_len) != key:
+                    return []
+                node = child
+                break
+            if network_address(key, child.length) != child.key:
+                return []
+            node = child
+
+        results = []
+        stack = [child for child in node.children if child is not None]
+        if node.length > prefix_len and node.values:
+            results.append(PrefixMatch(node.key, node.length, list(node.values)))
+        while stack:
+            current = stack.pop()
+            if current.values:
+                results.append(PrefixMatch(current.key, current.length, list(current.values)))
+            stack.extend(child for child in current.children if child is not None)
+        results.sort(key=lambda match: (match.network, match.prefix_len))
+        return results
+
+    def items(self) -> Iterator[Tuple[str, List[Any]]]:
+        """全プレフィックスと値"""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.values:
+                yield f"{int_to_ip(node.key)}/{node.length}", list(node.values)
+            stack.extend(child for child in reversed(node.children) if child is not None)
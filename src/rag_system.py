@@ -8,7 +8,10 @@ import json
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
-from .knowledge_base import KnowledgeBase, DevicePolicy
+from .knowledge_base import AddressLookup, KnowledgeBase, DevicePolicy
+
+# クエリ中のIPv4アドレス・プレフィックス（A.B.C.D または A.B.C.D/len）
+ADDRESS_QUERY_PATTERN = re.compile(r'(?<![\d.])\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?(?!\d|\.\d)')
 
 @dataclass
 class QueryContext:
@@ -34,6 +37,17 @@ class NetworkRAGSystem:
         # 関連デバイスの検索
         relevant_devices = self._find_relevant_devices(query)
         
+        # クエリ中のアドレス・プレフィックスの所有デバイスの検索
+        address_owners = self._find_address_owners(query)
+        owner_devices = list(dict.fromkeys(
+            device_name for lookup in address_owners for device_name in lookup.device_names
+        ))
+        for device_name in owner_devices:
+            if device_name not in relevant_devices:
+                relevant_devices.append(device_name)
+        if context.device_name is None and len(owner_devices) == 1:
+            context.device_name = owner_devices[0]
+        
         # 関連ポリシーの検索
         relevant_policies = self._find_relevant_policies(query)
         
@@ -49,6 +63,7 @@ class NetworkRAGSystem:
             'relevant_policies': relevant_policies,
             'relevant_templates': relevant_templates,
             'relevant_rules': relevant_rules,
+            'address_owners': address_owners,
             'network_summary': self.kb.get_network_summary()
         }
     
@@ -138,6 +153,15 @@ class NetworkRAGSystem:
         
         return relevant_devices
     
+    def _find_address_owners(self, query: str) -> List[AddressLookup]:
+        """クエリ中のアドレス・プレフィックスの所有デバイスの検索（最長一致）"""
+        lookups = []
+        for address in dict.fromkeys(ADDRESS_QUERY_PATTERN.findall(query)):
+            lookup = self.kb.lookup_address(address)
+            if lookup is not None:
+                lookups.append(lookup)
+        return lookups
+    
     def _find_relevant_policies(self, query: str) -> List[str]:
         """関連ポリシーの検索"""
         # クエリに基づいて関連ポリシーを検索
@@ -231,7 +255,7 @@ class NetworkRAGSystem:
 - デバイス数: {relevant_info['network_summary']['total_devices']}
 - デバイスタイプ: {relevant_info['network_summary']['device_types']}
 - OSPFエリア: {', '.join(relevant_info['network_summary']['ospf_areas'])}
-
+{self._format_address_owners(relevant_info.get('address_owners', []))}
 ## 関連デバイスポリシー
 """
         
@@ -300,6 +324,24 @@ class NetworkRAGSystem:
         
         return prompt
     
+    def _format_address_owners(self, address_owners: List[AddressLookup]) -> str:
+        """アドレスの所有デバイスのプロンプト用の整形"""
+        if not address_owners:
+            return ""
+        
+        section = "\n## アドレスの所有デバイス\n"
+        for lookup in address_owners:
+            entries = lookup.owners or lookup.contained
+            if not entries:
+                section += f"- {lookup.query}: 該当なし\n"
+                continue
+            matched = f"（{lookup.matched_prefix} に一致）" if lookup.owners else "（プレフィックス内のアドレス）"
+            section += f"- {lookup.query}{matched}\n"
+            for entry in entries:
+                label = f"HSRP仮想IP グループ{entry.group}" if entry.kind == 'hsrp' else "アドレス"
+                section += f"  - {entry.location}: {label} {entry.ip}/{entry.prefix_len}\n"
+        return section
+    
     def get_query_history(self) -> List[Dict[str, Any]]:
         """クエリ履歴の取得"""
         return self.query_history
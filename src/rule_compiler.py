@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# rule_compiler.py
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Any, Tuple
+from .validation import LineChunk, RuleVisitor
+from .ipaddr import ip_to_int, is_private_ip, mask_to_prefix
+
+# 検証に必要な事実を行から取り出すパターン（FACT_KEYWORDS で振り分けた行にだけ適用する）
+FACT_PATTERN = re.compile(r'''
+    ^[ \t]*ip[ ]address[ ](?P<addr>\d+\.\d+\.\d+\.\d+)
+        (?:/(?P<plen>\d+)|[ \t]+(?P<mask>\d+\.\d+\.\d+\.\d+))
+  | ^[ \t]*network[ ]\S+(?:[ \t]+\S+)?[ \t]+area[ ](?P<area>\S+)
+  | ^access-list[ ](?P<acl_num>\d+)[ ](?P<acl_body>[^\n]*)
+  | ^ip[ ]access-list[ ](?P<acl_kind>standard|extended)[ ](?P<acl_name>\S+)
+  | ^interface[ ](?P<interface>\S+)
+  | ^vlan[ ](?P<vlan>[\d,\-]+)[ \t]*$
+''', re.MULTILINE | re.VERBOSE)
+
+# 事実の種類→その事実が現れる行のキーワード（FACT_PATTERN の各選択肢の先頭語）
+FACT_KEYWORDS = {
+    'address': ('ip',),
+    'area': ('network',),
+    'acl': ('access-list', 'ip'),
+    'interface': ('interface',),
+    'vlan': ('vlan',),
+}
+
+# 拡張ACLのエントリで送信元の前に置かれるプロトコル
+ACL_PROTOCOLS = {
+    'ip', 'tcp', 'udp', 'icmp', 'igmp', 'gre', 'esp', 'ahp', 'eigrp',
+    'ospf', 'pim', 'pcp', 'nos', 'ipinip', 'sctp', 'object-group'
+}
+
+# ポリシーのデバイスタイプと検証ルールのデバイス種別の対応
+DEVICE_TYPE_ALIASES = {
+    'router': 'router',
+    'ルーター': 'router',
+    'switch': 'switch',
+    'l2/l3スイッチ': 'switch',
+    'スイッチ': 'switch',
+}
+
+
+def normalize_device_type(device_type: Optional[str]) -> Optional[str]:
+    """ポリシーのデバイスタイプを検証ルールのデバイス種別に変換"""
+    if not device_type:
+        return None
+    return DEVICE_TYPE_ALIASES.get(device_type.strip().lower(), device_type.strip().lower())
+
+
+def _parse_ranges(values: Any) -> List[Tuple[int, int]]:
+    """[1-99] や [1, 99] 形式の範囲指定の解析"""
+    if not isinstance(values, list):
+        values = [values]
+    ranges = []
+    for value in values:
+        if isinstance(value, int):
+            ranges.append((value, value))
+            continue
+        low, _, high = str(value).partition('-')
+        ranges.append((int(low), int(high or low)))
+    return ranges
+
+
+class CompiledRule:
+    """YAMLの1エントリから生成した検査
+
+    fact が事実の種類（address, acl, area, interface, vlan）を表し、
+    scope が 'line' のルールは事実ごとに check を、'config' のルールは
+    走査終了時に集めた事実全体に対して evaluate を呼ぶ。
+    """
+    fact = ''
+    scope = 'line'
+
+    def __init__(self, name: str, message: str, severity: str = 'warning'):
+        self.name = name
+        self.message = message
+        self.severity = severity
+
+    def check(self, value: Any) -> Optional[str]:
+        """1件の事実の検査（違反時は詳細を返す）"""
+        return None
+
+    def evaluate(self, values: List[Any]) -> List[str]:
+        """コンフィグ全体の事実の検査（違反の詳細の一覧を返す）"""
+        return []
+
+
+class AddressPatternRule(CompiledRule):
+    fact = 'address'
+
+    def __init__(self, name: str, message: str, severity: str, pattern: str):
+        super().__init__(name, message, severity)
+        self.pattern = re.compile(pattern)
+
+    def check(self, value: Tuple[str, Optional[int], str]) -> Optional[str]:
+        address, _, notation = value
+        if not self.pattern.match(notation):
+            return notation
+        return None
+
+
+class PrivateAddressRule(CompiledRule):
+    fact = 'address'
+
+    def check(self, value: Tuple[str, Optional[int], str]) -> Optional[str]:
+        address, _, notation = value
+        return None if is_private_ip(address) else notation
+
+
+class PrefixRangeRule(CompiledRule):
+    fact = 'address'
+
+    def __init__(self, name: str, message: str, severity: str,
+                 min_prefix: Optional[int], max_prefix: Optional[int]):
+        super().__init__(name, message, severity)
+        self.min_prefix = min_prefix if min_prefix is not None else 0
+        self.max_prefix = max_prefix if max_prefix is not None else 32
+
+    def check(self, value: Tuple[str, Optional[int], str]) -> Optional[str]:
+        _, prefix, notation = value
+        if prefix is not None and not self.min_prefix <= prefix <= self.max_prefix:
+            return notation
+        return None
+
+
+class AclRangeRule(CompiledRule):
+    fact = 'acl'
+
+    def __init__(self, name: str, message: str, severity: str, acl_type: str, ranges: List[Tuple[int, int]]):
+        super().__init__(name, message, severity)
+        self.acl_type = acl_type
+        self.ranges = ranges
+
+    def check(self, value: Tuple[str, int]) -> Optional[str]:
+        acl_type, number = value
+        if acl_type != self.acl_type:
+            return None
+        if any(low <= number <= high for low, high in self.ranges):
+            return None
+        return f"access-list {number}"
+
+
+class RequiredAreasRule(CompiledRule):
+    fact = 'area'
+    scope = 'config'
+
+    def __init__(self, name: str, message: str, severity: str, areas: List[Any]):
+        super().__init__(name, message, severity)
+        self.areas = [str(area) for area in areas]
+
+    def evaluate(self, values: List[str]) -> List[str]:
+        # OSPFのエリアが1つもないコンフィグには適用しない
+        if not values:
+            return []
+        present = set(values)
+        return [f"area {area}" for area in self.areas if area not in present]
+
+
+class MaxCountRule(CompiledRule):
+    scope = 'config'
+
+    def __init__(self, name: str, message: str, severity: str, fact: str, limit: int):
+        super().__init__(name, message, severity)
+        self.fact = fact
+        self.limit = limit
+
+    def evaluate(self, values: List[Any]) -> List[str]:
+        count = len(set(values))
+        if count > self.limit:
+            return [f"{count} {self.fact}s"]
+        return []
+
+
+class RequiredInterfacesRule(CompiledRule):
+    fact = 'interface'
+    scope = 'config'
+
+    def __init__(self, name: str, message: str, severity: str, interfaces: List[str]):
+        super().__init__(name, message, severity)
+        self.interfaces = list(interfaces)
+
+    def evaluate(self, values: List[str]) -> List[str]:
+        present = set(values)
+        return [interface for interface in self.interfaces if interface not in present]
+
+
+class CompiledRuleSet:
+    """コンパイル済みの検証ルール一式
+
+    ルールは事実の種類ごとにまとめてあり、必要な事実が現れるキーワードの行だけから
+    取り出した事実をその種類のルールにだけ渡すため、ルール数が増えても走査は増えない。
+    """
+
+    def __init__(self, rules_hash: str, common: List[CompiledRule],
+                 device_rules: Dict[str, List[CompiledRule]]):
+        self.rules_hash = rules_hash
+        self.common = common
+        self.device_rules = device_rules
+
+    def rules_for(self, device_type: Optional[str] = None, scope: str = 'all') -> List[CompiledRule]:
+        """デバイス種別・スコープに該当するルール"""
+        rules = list(self.common)
+        device_type = normalize_device_type(device_type)
+        if device_type:
+            rules.extend(self.device_rules.get(device_type, []))
+        if scope != 'all':
+            rules = [rule for rule in rules if rule.scope == scope]
+        return rules
+
+    def create_visitor(self, device_type: Optional[str] = None, scope: str = 'all') -> 'CompiledRulesVisitor':
+        """検証1回分のビジター"""
+        return CompiledRulesVisitor(self.rules_for(device_type, scope), scope)
+
+    def __len__(self) -> int:
+        return len(self.common) + sum(len(rules) for rules in self.device_rules.values())
+
+
+class CompiledRulesVisitor(RuleVisitor):
+    """コンパイル済みルールを行ストリーム上で実行するビジター
+
+    チャンクのキーワード索引から、ルールが必要とする事実のキーワードで始まる行だけを
+    取り出して FACT_PATTERN を適用する。
+    """
+    name = 'compiled_rules'
+
+    def __init__(self, rules: List[CompiledRule], scope: str = 'all'):
+        self.rules = rules
+        self.scope = scope
+        self.line_rules = defaultdict(list)
+        self.config_facts = set()
+        for rule in rules:
+            if rule.scope == 'line':
+                self.line_rules[rule.fact].append(rule)
+            else:
+                self.config_facts.add(rule.fact)
+        self.keywords = sorted({keyword for rule in rules for keyword in FACT_KEYWORDS.get(rule.fact, ())})
+        self.facts = defaultdict(list)
+        self.violations = {rule.name: [] for rule in rules}
+
+    def visit_chunk(self, chunk: LineChunk):
+        if not self.keywords:
+            return
+        texts = chunk.texts
+        for offset in chunk.select(self.keywords):
+            match = FACT_PATTERN.match(texts[offset])
+            if match is None:
+                continue
+            for fact, value in self._facts_from_match(match):
+                for rule in self.line_rules.get(fact, ()):
+                    detail = rule.check(value)
+                    if detail is not None:
+                        self.violations[rule.name].append(detail)
+                if fact in self.config_facts:
+                    self.facts[fact].append(value)
+
+    def _facts_from_match(self, match) -> List[Tuple[str, Any]]:
+        """マッチから事実を取り出す"""
+        groups = match.groupdict()
+        if groups['addr'] is not None:
+            address = groups['addr']
+            if groups['plen'] is not None:
+                prefix = int(groups['plen'])
+                notation = f"{address}/{groups['plen']}"
+            else:
+                try:
+                    prefix = mask_to_prefix(ip_to_int(groups['mask']))
+                except ValueError:
+                    prefix = None
+                notation = f"{address}/{prefix}" if prefix is not None else f"{address} {groups['mask']}"
+            return [('address', (address, prefix, notation))]
+        if groups['area'] is not None:
+            return [('area', groups['area'])]
+        if groups['acl_num'] is not None:
+            tokens = groups['acl_body'].split()
+            if not tokens or tokens[0] == 'remark':
+                return []
+            if tokens[0] == 'dynamic' and len(tokens) > 2:
+                tokens = tokens[2:]
+            protocol = tokens[1] if len(tokens) > 1 else ''
+            acl_type = 'extended' if protocol in ACL_PROTOCOLS or protocol.isdigit() else 'standard'
+            return [('acl', (acl_type, int(groups['acl_num'])))]
+        if groups['acl_kind'] is not None:
+            if not groups['acl_name'].isdigit():
+                return []
+            return [('acl', (groups['acl_kind'], int(groups['acl_name'])))]
+        if groups['interface'] is not None:
+            return [('interface', groups['interface'])]
+        if groups['vlan'] is not None:
+            return [('vlan', vlan) for vlan in self._expand_vlans(groups['vlan'])]
+        return []
+
+    def _expand_vlans(self, spec: str) -> List[int]:
+        """「10,20-22」形式のVLAN指定の展開"""
+        vlans = []
+        for part in spec.split(','):
+            low, _, high = part.partition('-')
+            if low.isdigit() and (not high or high.isdigit()):
+                vlans.extend(range(int(low), int(high or low) + 1))
+        return vlans
+
+    def results(self) -> List[Tuple[str, str, bool, Dict[str, Any]]]:
+        results = []
+        for rule in self.rules:
+            violations = self.violations[rule.name]
+            if rule.scope == 'config':
+                violations.extend(rule.evaluate(self.facts.get(rule.fact, [])))
+
+            messages = [f"{rule.message}: {detail}" for detail in violations]
+            is_error = rule.severity == 'error'
+            results.append((rule.name, rule.severity, True, {
+                'is_valid': not violations,
+                'errors': messages if is_error else [],
+                'warnings': [] if is_error else messages,
+                'violations': violations
+            }))
+        return results
+
+
+def _compile_entry(name: str, entry: Dict[str, Any]) -> List[CompiledRule]:
+    """YAMLの1エントリのコンパイル"""
+    message = entry.get('message', name)
+    severity = entry.get('severity', 'warning')
+    compiled = []
+
+    if 'pattern' in entry:
+        compiled.append(AddressPatternRule(f"{name}.pattern", message, severity, entry['pattern']))
+    if entry.get('check_private'):
+        compiled.append(PrivateAddressRule(f"{name}.check_private", message, severity))
+    if 'min_prefix' in entry or 'max_prefix' in entry:
+        compiled.append(PrefixRangeRule(f"{name}.prefix_range", message, severity,
+                                        entry.get('min_prefix'), entry.get('max_prefix')))
+    if 'required_areas' in entry:
+        compiled.append(RequiredAreasRule(f"{name}.required_areas", message, severity, entry['required_areas']))
+    if 'max_areas' in entry:
+        compiled.append(MaxCountRule(f"{name}.max_areas", message, severity, 'area', entry['max_areas']))
+    if 'standard_acl_range' in entry:
+        compiled.append(AclRangeRule(f"{name}.standard_acl_range", message, severity,
+                                     'standard', _parse_ranges(entry['standard_acl_range'])))
+    if 'extended_acl_range' in entry:
+        compiled.append(AclRangeRule(f"{name}.extended_acl_range", message, severity,
+                                     'extended', _parse_ranges(entry['extended_acl_range'])))
+    if 'required_interfaces' in entry:
+        compiled.append(RequiredInterfacesRule(f"{name}.required_interfaces", message, severity,
+                                               entry['required_interfaces']))
+    if 'max_interfaces' in entry:
+        compiled.append(MaxCountRule(f"{name}.max_interfaces", message, severity,
+                                     'interface', entry['max_interfaces']))
+    if 'max_vlans' in entry:
+        compiled.append(MaxCountRule(f"{name}.max_vlans", message, severity, 'vlan', entry['max_vlans']))
+
+    if not compiled:
+        print(f"Warning: unsupported validation rule ignored: {name} {entry}")
+    return compiled
+
+
+def compile_validation_rules(rules: Dict[str, Any], rules_hash: str = '') -> CompiledRuleSet:
+    """validation-rules.yaml の内容を検査オブジェクトにコンパイル
+
+    ルール名は「グループ[エントリの位置].キー」（デバイス固有ルールは
+    「device_validation.種別[位置].キー」）とし、同じグループに同じキーの
+    エントリが複数あっても結果が混ざらないようにする。
+    """
+    common = []
+    device_rules = {}
+
+    for group, entries in (rules or {}).get('validation_rules', {}).items():
+        if group == 'device_validation':
+            for device_type, device_entries in (entries or {}).items():
+                compiled = device_rules.setdefault(normalize_device_type(device_type), [])
+                for index, entry in enumerate(device_entries or []):
+                    compiled.extend(_compile_entry(f"{group}.{device_type}[{index}]", entry))
+            continue
+        for index, entry in enumerate(entries or []):
+            common.extend(_compile_entry(f"{group}[{index}]", entry))
+
+    return CompiledRuleSet(rules_hash, common, device_rules)
+
+
+_compiled_cache = {}
+_compiled_cache_lock = threading.Lock()
+
+
+def get_compiled_rules(rules: Dict[str, Any], rules_hash: str) -> CompiledRuleSet:
+    """ルールファイルのハッシュ単位でキャッシュしたコンパイル結果の取得"""
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(rules_hash)
+        if compiled is None:
+            compiled = compile_validation_rules(rules, rules_hash)
+            _compiled_cache[rules_hash] = compiled
+        return compiled
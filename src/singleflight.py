@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# singleflight.py
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _InFlightCall:
+    """実行中の呼び出し"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.result = None
+        self.error = None
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None):
+        """結果の確定と待機者への通知"""
+        self.result = result
+        self.error = error
+        if self.future is not None and not self.future.done():
+            if error is not None:
+                self.future.set_exception(error)
+                # 待機者がいない場合の「未取得の例外」警告を抑止
+                self.future.exception()
+            else:
+                self.future.set_result(result)
+        self.event.set()
+
+    def outcome(self) -> Any:
+        """確定した結果の取得（エラーは再送出）"""
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """同一キーの同時実行を1回にまとめる（single-flight）
+
+    同じキーで実行中の呼び出しがあれば、後続の呼び出し元は新たに実行せず
+    先行する呼び出しの完了を待ってその結果（または例外）を共有する。
+    同期API（do）と非同期API（ado）は同じ実行中テーブルを共有する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executions': 0, 'shared': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """同期版の実行（戻り値は (結果, 共有されたかどうか)）"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            return call.outcome(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._complete(key, call, error=e)
+            raise
+        self._complete(key, call, result=result)
+        return result, False
+
+    async def ado(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """非同期版の実行（戻り値は (結果, 共有されたかどうか)）"""
+        loop = asyncio.get_event_loop()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                call = _InFlightCall(loop)
+                self._calls[key] = call
+                self._stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            if call.future is not None and call.loop is loop:
+                # 同じイベントループ上の先行呼び出しはFutureで待つ
+                await asyncio.shield(call.future)
+            else:
+                # 別スレッド・別ループの先行呼び出しはスレッドプールで完了を待つ
+                await loop.run_in_executor(None, call.event.wait)
+            return call.outcome(), True
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self._complete(key, call, error=e)
+            raise
+        self._complete(key, call, result=result)
+        return result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """統計の取得"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+    def _complete(self, key: str, call: _InFlightCall, result: Any = None,
+                  error: Optional[BaseException] = None):
+        """実行中テーブルからの削除と結果の通知"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.finish(result, error)
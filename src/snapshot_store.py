@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# snapshot_store.py
+"""コンフィグスナップショットのコンテンツアドレス型ストア
+
+スナップショットの本文は内容のハッシュ（SHA-256）を名前とする圧縮ファイル（オブジェクト）に
+保存し、同じ内容は1つだけ持つ。デバイスごとのタイムライン（JSON Lines）は取得時刻と
+オブジェクトのハッシュの対応で、内容が前回と変わったときだけ追記する。delta=True の場合は
+前のバージョンとの行単位の差分としてオブジェクトを保存する。
+
+    store/
+      objects/ab/abcdef....z      圧縮した本文
+      objects/cd/cdef01....d      圧縮した差分（基にしたオブジェクトのハッシュと編集操作）
+      timeline/R1.jsonl           {"timestamp", "config_type", "hash", "size", "metadata"}
+"""
+import os
+import json
+import zlib
+import tempfile
+import threading
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+from .config_diff import myers_diff
+from .kb_writer import KBWriter
+from .utils import compute_content_hash, sanitize_filename
+
+FULL_SUFFIX = '.z'
+DELTA_SUFFIX = '.d'
+
+
+@dataclass
+class SnapshotRecord:
+    """タイムラインの1件"""
+    device_name: str
+    config_type: str
+    timestamp: str
+    hash: str
+    size: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def date(self) -> str:
+        """取得日（YYYY-MM-DD）"""
+        return self.timestamp[:10]
+
+
+def encode_delta(old_lines: List[str], new_lines: List[str]) -> List[List[Any]]:
+    """行単位の差分の編集操作（['=', 行数] 複写・['-', 行数] 読み飛ばし・['+', [行]] 追加）"""
+    ops = []
+    for op, line in myers_diff(old_lines, new_lines):
+        kind = '=' if op == ' ' else op
+        if ops and ops[-1][0] == kind:
+            if kind == '+':
+                ops[-1][1].append(line)
+            else:
+                ops[-1][1] += 1
+        else:
+            ops.append([kind, [line] if kind == '+' else 1])
+    return ops
+
+
+def apply_delta(old_lines: List[str], ops: List[List[Any]]) -> List[str]:
+    """encode_delta の編集操作の適用"""
+    lines = []
+    position = 0
+    for kind, value in ops:
+        if kind == '=':
+            lines.extend(old_lines[position:position + value])
+            position += value
+        elif kind == '-':
+            position += value
+        else:
+            lines.extend(value)
+    return lines
+
+
+class SnapshotStore:
+    """コンテンツアドレス型のスナップショットストア
+
+    max_delta_chain はオブジェクトを復元するためにたどる差分の上限で、これを超える場合や
+    差分が本文より大きい場合は本文をそのまま保存する。writer を指定すると書き込みは
+    KBWriter にステージし、KBの他のファイルと同じグループコミットで書き込む。
+    """
+
+    def __init__(self, root: Union[str, Path], delta: bool = False,
+                 compress_level: int = 6, max_delta_chain: int = 16,
+                 writer: Optional[KBWriter] = None):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.timeline_dir = self.root / "timeline"
+        self.delta = delta
+        self.compress_level = compress_level
+        self.max_delta_chain = max_delta_chain
+        self.writer = writer
+        self._lock = threading.Lock()
+
+    def _exists(self, path: Path) -> bool:
+        return self.writer.exists(path) if self.writer else path.exists()
+
+    def _read_file(self, path: Path) -> Optional[bytes]:
+        """ファイルの内容（writer があればステージ済みの内容を含む）"""
+        if self.writer:
+            return self.writer.read_bytes(path)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # オブジェクト
+
+    def object_path(self, content_hash: str) -> Optional[Path]:
+        """オブジェクトのファイル（本文・差分のどちらか、なければNone）"""
+        for suffix in (FULL_SUFFIX, DELTA_SUFFIX):
+            path = self.objects_dir / content_hash[:2] / f"{content_hash}{suffix}"
+            if self._exists(path):
+                return path
+        return None
+
+    def has_object(self, content_hash: str) -> bool:
+        return self.object_path(content_hash) is not None
+
+    def read_object(self, content_hash: str) -> str:
+        """オブジェクトの本文（差分は基のオブジェクトから復元）"""
+        chain = []
+        current = content_hash
+        while True:
+            path = self.object_path(current)
+            if path is None:
+                raise KeyError(f"Snapshot object not found: {current}")
+            payload = zlib.decompress(self._read_file(path))
+            if path.suffix == FULL_SUFFIX:
+                lines = payload.decode('utf-8').split('\n')
+                break
+            delta = json.loads(payload.decode('utf-8'))
+            chain.append(delta['ops'])
+            current = delta['base']
+
+        for ops in reversed(chain):
+            lines = apply_delta(lines, ops)
+        return '\n'.join(lines)
+
+    def _delta_depth(self, content_hash: str) -> int:
+        """オブジェクトの復元にたどる差分の数"""
+        depth = 0
+        path = self.object_path(content_hash)
+        while path is not None and path.suffix == DELTA_SUFFIX:
+            depth += 1
+            base = json.loads(zlib.decompress(self._read_file(path)).decode('utf-8'))['base']
+            path = self.object_path(base)
+        return depth
+
+    def _write_object(self, content_hash: str, suffix: str, payload: bytes):
+        """オブジェクトの書き込み（一時ファイル経由のアトミック書き込み）"""
+        path = self.objects_dir / content_hash[:2] / f"{content_hash}{suffix}"
+        if self.writer:
+            self.writer.stage(path, zlib.compress(payload, self.compress_level))
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(payload, self.compress_level))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _store_object(self, content: str, content_hash: str, base_hash: Optional[str]):
+        """本文または前のバージョンとの差分の保存（同じ内容のオブジェクトがあれば何もしない）"""
+        if self.has_object(content_hash):
+            return
+        full = content.encode('utf-8')
+        if self.delta and base_hash and self._delta_depth(base_hash) < self.max_delta_chain:
+            base_lines = self.read_object(base_hash).split('\n')
+            ops = encode_delta(base_lines, content.split('\n'))
+            delta = json.dumps({'base': base_hash, 'ops': ops}, ensure_ascii=False).encode('utf-8')
+            if len(delta) < len(full):
+                self._write_object(content_hash, DELTA_SUFFIX, delta)
+                return
+        self._write_object(content_hash, FULL_SUFFIX, full)
+
+    # タイムライン
+
+    def timeline_path(self, device_name: str) -> Path:
+        return self.timeline_dir / f"{sanitize_filename(device_name)}.jsonl"
+
+    def timeline(self, device_name: str, config_type: Optional[str] = None) -> List[SnapshotRecord]:
+        """デバイスのタイムライン（古い順、config_typeを指定するとその種別のみ）"""
+        return [record for record in self._iter_file(self.timeline_path(device_name))
+                if config_type is None or record.config_type == config_type]
+
+    def latest(self, device_name: str, config_type: str = "running_config") -> Optional[SnapshotRecord]:
+        """デバイスの最新のスナップショット"""
+        records = self.timeline(device_name, config_type)
+        return max(records, key=lambda record: record.timestamp) if records else None
+
+    def at(self, device_name: str, timestamp: Union[str, datetime],
+           config_type: str = "running_config") -> Optional[SnapshotRecord]:
+        """指定した時刻に有効だったスナップショット（その時刻以前で最新のもの）"""
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.isoformat()
+        records = [record for record in self.timeline(device_name, config_type)
+                   if record.timestamp <= timestamp]
+        return max(records, key=lambda record: record.timestamp) if records else None
+
+    def devices(self, config_type: Optional[str] = None) -> List[str]:
+        """タイムラインを持つデバイスの一覧（writer があればステージ済みのタイムラインを含む）"""
+        devices = set()
+        for path in self._timeline_paths():
+            for record in self._iter_file(path):
+                if config_type is None or record.config_type == config_type:
+                    devices.add(record.device_name)
+                    break
+        return sorted(devices)
+
+    def _timeline_paths(self) -> List[Path]:
+        if self.writer:
+            return self.writer.glob(self.timeline_dir, "*.jsonl")
+        return list(self.timeline_dir.glob("*.jsonl")) if self.timeline_dir.exists() else []
+
+    def _iter_file(self, path: Path) -> Iterator[SnapshotRecord]:
+        content = self._read_file(path)
+        if content is None:
+            return
+        for line in content.decode('utf-8').split('\n'):
+            if line.strip():
+                yield SnapshotRecord(**json.loads(line))
+
+    # 保存・読み出し
+
+    def put(self, device_name: str, config_type: str, content: str,
+            timestamp: Optional[datetime] = None,
+            metadata: Optional[Dict[str, Any]] = None) -> SnapshotRecord:
+        """スナップショットの保存
+
+        内容が同じ種別の最新のスナップショットと同じなら何も書き込まずにそれを返す
+        （タイムラインとオブジェクトは内容が変わったときだけ増える）。
+        """
+        content_hash = compute_content_hash(content)
+        with self._lock:
+            previous = self.latest(device_name, config_type)
+            if previous is not None and previous.hash == content_hash:
+                return previous
+
+            self._store_object(content, content_hash, previous.hash if previous else None)
+            record = SnapshotRecord(
+                device_name=device_name,
+                config_type=config_type,
+                timestamp=(timestamp or datetime.now()).isoformat(),
+                hash=content_hash,
+                size=len(content.encode('utf-8')),
+                metadata=metadata or {}
+            )
+            line = json.dumps(asdict(record), ensure_ascii=False, default=str) + '\n'
+            path = self.timeline_path(device_name)
+            if self.writer:
+                self.writer.stage_append(path, line)
+                return record
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            return record
+
+    def get(self, record: SnapshotRecord) -> str:
+        """スナップショットの本文"""
+        return self.read_object(record.hash)
+
+    def stats(self) -> Dict[str, int]:
+        """オブジェクト数・ディスク使用量・タイムラインの件数"""
+        objects = [path for path in self.objects_dir.glob("*/*")
+                   if path.suffix in (FULL_SUFFIX, DELTA_SUFFIX)] if self.objects_dir.exists() else []
+        timelines = self._timeline_paths()
+        return {
+            'objects': len(objects),
+            'delta_objects': sum(1 for path in objects if path.suffix == DELTA_SUFFIX),
+            'object_bytes': sum(path.stat().st_size for path in objects),
+            'snapshots': sum(1 for path in timelines for _ in self._iter_file(path)),
+        }
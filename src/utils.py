@@ -7,9 +7,16 @@
 import os
 import re
 import json
+import hashlib
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 from datetime import datetime
+from .ipaddr import int_to_ip, ip_to_int, is_valid_mask, network_address, parse_prefix
+from .config_parser import parse_config_tree
+
+# calculate_network_stats の集計対象
+STATS_IP_PATTERN = re.compile(r'^ip address (\d+\.\d+\.\d+\.\d+/\d+)')
+STATS_PROTOCOL_PATTERN = re.compile(r'^router (\w+)')
 
 def load_config_file(file_path: str) -> Dict[str, Any]:
     """設定ファイルの読み込み"""
@@ -57,72 +64,50 @@ def save_config_file(data: Any, file_path: str, format: str = 'auto') -> bool:
         print(f"Error saving config file {file_path}: {e}")
         return False
 
-def validate_ip_address(ip: str) -> bool:
-    """IPアドレスの検証"""
-    pattern = r'^(\d{1,3}\.){3}\d{1,3}/\d{1,2}$'
-    if not re.match(pattern, ip):
-        return False
+def compute_content_hash(data: Any) -> str:
+    """コンテンツハッシュ（SHA-256）の計算"""
+    if isinstance(data, bytes):
+        payload = data
+    elif isinstance(data, str):
+        payload = data.encode('utf-8')
+    else:
+        # dict/listなどはキー順を固定してシリアライズ
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
     
-    # マスクの検証
-    prefix = int(ip.split('/')[1])
-    if prefix < 0 or prefix > 32:
+    return hashlib.sha256(payload).hexdigest()
+
+def normalize_query(query: str) -> str:
+    """クエリの正規化（前後の空白除去・連続空白の統一）"""
+    return ' '.join(query.split())
+
+def validate_ip_address(ip: str) -> bool:
+    """IPアドレスの検証（A.B.C.D/len 形式）"""
+    try:
+        parse_prefix(ip)
+    except ValueError:
         return False
-    
     return True
 
 def validate_subnet_mask(mask: str) -> bool:
-    """サブネットマスクの検証"""
+    """サブネットマスクの検証（/len 形式またはマスク表記）"""
+    if '/' in mask:
+        prefix = mask.split('/')[1]
+        return prefix.isascii() and prefix.isdigit() and int(prefix) <= 32
+    
+    # マスク表記の場合は1が先頭から連続していること
     try:
-        if '/' in mask:
-            prefix = int(mask.split('/')[1])
-            if prefix < 0 or prefix > 32:
-                return False
-        else:
-            # マスク表記の場合
-            octets = mask.split('.')
-            if len(octets) != 4:
-                return False
-            
-            # 各オクテットの検証
-            for octet in octets:
-                value = int(octet)
-                if value < 0 or value > 255:
-                    return False
-            
-            # 連続した1の検証
-            binary_mask = ''.join([format(int(octet), '08b') for octet in octets])
-            if '0' in binary_mask:
-                first_zero = binary_mask.index('0')
-                if '1' in binary_mask[first_zero:]:
-                    return False
-        
-        return True
-    except:
+        return is_valid_mask(ip_to_int(mask))
+    except ValueError:
         return False
 
 def extract_network_from_ip(ip_with_mask: str) -> str:
-    """IPアドレスからネットワークアドレスを抽出"""
+    """IPアドレスからネットワークアドレスを抽出（不正な表記はそのまま返す）"""
     try:
-        ip = ip_with_mask.split('/')[0]
-        prefix = int(ip_with_mask.split('/')[1])
-        
-        octets = ip.split('.')
-        network_octets = []
-        
-        for i in range(4):
-            if i * 8 < prefix:
-                if (i + 1) * 8 <= prefix:
-                    network_octets.append(int(octets[i]))
-                else:
-                    bits_in_octet = prefix - i * 8
-                    network_octets.append(int(octets[i]) & (255 << (8 - bits_in_octet)))
-                    break
-            else:
-                network_octets.append(0)
-        
-        return f"{network_octets[0]}.{network_octets[1]}.{network_octets[2]}.{network_octets[3]}/{prefix}"
-    except:
+        address, prefix = parse_prefix(ip_with_mask)
+    except ValueError:
         return ip_with_mask
+    
+    return f"{int_to_ip(network_address(address, prefix))}/{prefix}"
 
 def format_config_output(config: str, style: str = 'cisco') -> str:
     """コンフィグ出力のフォーマット"""
@@ -161,26 +146,34 @@ def generate_backup_filename(device_name: str, config_type: str = 'running') ->
     return f"{device_name}_{config_type}_config_{timestamp}.txt"
 
 def generate_change_log(old_config: str, new_config: str) -> str:
-    """変更ログの生成"""
-    import difflib
-    
-    old_lines = old_config.split('\n')
-    new_lines = new_config.split('\n')
+    """変更ログの生成（トップレベルブロック単位で照合した差分）
+
+    空行・`!` コメント行・`#` メタデータ行は比較対象外のため、それらだけの変更はログに現れない。
+    """
+    from .config_diff import diff_configs
     
-    differ = difflib.Differ()
-    diff = list(differ.compare(old_lines, new_lines))
+    diff = diff_configs(old_config, new_config)
     
     change_log = []
     change_log.append(f"Change Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     change_log.append("=" * 50)
     
-    for line in diff:
-        if line.startswith('  '):
-            change_log.append(f"  {line[2:]}")
-        elif line.startswith('- '):
-            change_log.append(f"-REMOVED: {line[2:]}")
-        elif line.startswith('+ '):
-            change_log.append(f"+ADDED: {line[2:]}")
+    for block in diff.blocks:
+        if block.kind == 'unchanged':
+            change_log.extend(f"  {line}" for line in block.new_block.lines)
+        elif block.kind == 'removed':
+            change_log.extend(f"-REMOVED: {line}" for line in block.old_block.lines)
+        elif block.kind == 'added':
+            change_log.extend(f"+ADDED: {line}" for line in block.new_block.lines)
+        else:
+            change_log.append(f"  {block.new_block.header}")
+            for op, line in block.line_ops:
+                if op == ' ':
+                    change_log.append(f"  {line}")
+                elif op == '-':
+                    change_log.append(f"-REMOVED: {line}")
+                else:
+                    change_log.append(f"+ADDED: {line}")
     
     return '\n'.join(change_log)
 
@@ -221,18 +214,16 @@ def calculate_network_stats(configs: List[str]) -> Dict[str, Any]:
     }
     
     for config in configs:
-        lines = config.split('\n')
-        stats['total_lines'] += len(lines)
+        tree = parse_config_tree(config)
+        stats['total_lines'] += len(tree)
         
         # IPアドレスの抽出
-        ip_pattern = r'ip address (\d+\.\d+\.\d+\.\d+/\d+)'
-        ip_matches = re.findall(ip_pattern, config)
-        stats['ip_addresses'].extend(ip_matches)
+        for _, match in tree.search(STATS_IP_PATTERN, tree.find('ip address')):
+            stats['ip_addresses'].append(match.group(1))
         
         # プロトコルの抽出
-        protocol_pattern = r'router (\w+)'
-        protocol_matches = re.findall(protocol_pattern, config)
-        for protocol in protocol_matches:
+        for _, match in tree.search(STATS_PROTOCOL_PATTERN, tree.blocks('router')):
+            protocol = match.group(1)
             if protocol not in stats['protocols']:
                 stats['protocols'][protocol] = 0
             stats['protocols'][protocol] += 1
@@ -264,7 +255,7 @@ def get_file_size(file_path: str) -> int:
     """ファイルサイズの取得"""
     try:
         return os.path.getsize(file_path)
-    except:
+    except OSError:
         return 0
 
 def format_file_size(size_bytes: int) -> str:
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# validation.py
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
+from dataclasses import dataclass
+from .ipaddr import is_private_ip
+from .config_parser import ConfigTree, iter_config_lines
+
+# 旧実装（NetworkConfigGenerator._validate_*）と同じパターン
+SYNTAX_PATTERN = re.compile(r'^\w+(\s+\S+)*$')
+IP_ADDRESS_PATTERN = re.compile(r'ip address (\d+\.\d+\.\d+\.\d+/\d+)')
+OSPF_NETWORK_PATTERN = re.compile(r'network (\d+\.\d+\.\d+\.\d+/\d+) area (\d+)')
+
+
+@dataclass
+class ConfigLine:
+    """トークン化したコンフィグの1行"""
+    number: int
+    text: str
+    stripped: str
+    indent: int
+    block: Optional[str]
+
+    @property
+    def is_comment(self) -> bool:
+        return self.stripped.startswith('!')
+
+
+class LineChunk:
+    """行ストリームの一区切り（ルールはチャンク単位で呼ばれる）
+
+    ルールごとに必要な表現（生の行、strip済みの行、キーワードと引数への分割、
+    キーワード索引、連結テキスト、ConfigLine）は最初に参照されたときに1回だけ作られ、
+    全ルールで共有される。特定のコマンドだけを見るルールは select で該当行だけを取り出す。
+    """
+
+    def __init__(self, texts: List[str], start_number: int, block: Optional[str],
+                 stripped: Optional[List[str]] = None):
+        self.texts = texts
+        self.start_number = start_number
+        self.initial_block = block
+        self._stripped = stripped
+        self._text = None
+        self._lines = None
+        self._words = None
+        self._keyword_index = None
+
+    @property
+    def stripped(self) -> List[str]:
+        """strip済みの行"""
+        if self._stripped is None:
+            self._stripped = [text.strip() for text in self.texts]
+        return self._stripped
+
+    @property
+    def words(self) -> List[Tuple[str, str]]:
+        """各行の (キーワード, 引数)（先頭の空白で1回だけ分割、空行は ('', '')）"""
+        if self._words is None:
+            self._words = [(parts[0], parts[1] if len(parts) > 1 else '') if parts else ('', '')
+                           for parts in (stripped.split(None, 1) for stripped in self.stripped)]
+        return self._words
+
+    @property
+    def keyword_index(self) -> Dict[str, List[int]]:
+        """キーワード→チャンク内の行位置（行の順、キーワードは大文字・小文字を区別する）"""
+        if self._keyword_index is None:
+            index = {}
+            for offset, (keyword, _) in enumerate(self.words):
+                if keyword:
+                    index.setdefault(keyword, []).append(offset)
+            self._keyword_index = index
+        return self._keyword_index
+
+    def select(self, keywords: Iterable[str]) -> List[int]:
+        """キーワードで始まる行の位置（行の順）"""
+        index = self.keyword_index
+        offsets = [offset for keyword in keywords for offset in index.get(keyword, ())]
+        return sorted(offsets)
+
+    @property
+    def text(self) -> str:
+        """チャンク内の行を改行で連結したテキスト（正規表現の一括適用用）"""
+        if self._text is None:
+            self._text = '\n'.join(self.texts)
+        return self._text
+
+    @property
+    def lines(self) -> List[ConfigLine]:
+        """行番号・インデント・所属ブロック付きの行"""
+        if self._lines is None:
+            self._lines = []
+            block = self.initial_block
+            for offset, (text, stripped) in enumerate(zip(self.texts, self.stripped)):
+                indent = len(text) - len(text.lstrip()) if stripped else 0
+                if stripped and not indent and not stripped.startswith('!'):
+                    block = stripped
+                self._lines.append(ConfigLine(
+                    number=self.start_number + offset, text=text,
+                    stripped=stripped, indent=indent, block=block
+                ))
+        return self._lines
+
+    @property
+    def last_block(self) -> Optional[str]:
+        """チャンク末尾時点の所属ブロック"""
+        for text, stripped in zip(reversed(self.texts), reversed(self.stripped)):
+            if stripped and not text[:1].isspace() and not stripped.startswith('!'):
+                return stripped
+        return self.initial_block
+
+
+def tokenize_config(lines: Iterable[str], chunk_lines: int = 4096) -> Iterator[LineChunk]:
+    """行の列を一定行数ごとのLineChunkに区切る"""
+    buffer = []
+    number = 1
+    block = None
+    for text in lines:
+        buffer.append(text)
+        if len(buffer) >= chunk_lines:
+            chunk = LineChunk(buffer, number, block)
+            yield chunk
+            block = chunk.last_block
+            number += len(buffer)
+            buffer = []
+    if buffer:
+        yield LineChunk(buffer, number, block)
+
+
+def tokenize_tree(tree: ConfigTree, chunk_lines: int = 4096) -> Iterator[LineChunk]:
+    """解析済みのツリーの行をLineChunkに区切る（strip済みの行はツリーのものを使う）"""
+    block = None
+    for start in range(0, len(tree.texts), chunk_lines):
+        chunk = LineChunk(tree.texts[start:start + chunk_lines], start + 1, block,
+                          tree.stripped[start:start + chunk_lines])
+        yield chunk
+        block = chunk.last_block
+
+
+class RuleVisitor:
+    """行ストリームを1回走査する間に呼ばれる検証ルール
+
+    インスタンスは検証1回ごとに生成されるため、状態はインスタンスに持たせてよい。
+    既定の visit_chunk は各行について visit を呼ぶ。特定のコマンドだけを見るルールは
+    visit_chunk を上書きし、チャンクのキーワード索引（LineChunk.select）から該当行だけを
+    取り出して処理する（ルールを追加しても全行の走査は増えない）。
+    severityが 'error' のルールが不合格になるとコンフィグ全体が不合格となり、
+    'warning' のルールは警告のみを追加する。reportedなルールの結果は
+    validation_rules[name] に格納される。scopeが 'config' のルールは
+    コンフィグ全体を必要とするため、セクション単位の検証では実行されない。
+    """
+    name = 'rule'
+    severity = 'error'
+    reported = True
+    scope = 'line'
+
+    def visit_chunk(self, chunk: LineChunk):
+        """チャンクごとの処理"""
+        for line in chunk.lines:
+            self.visit(line)
+
+    def visit(self, line: ConfigLine):
+        """1行ごとの処理"""
+        pass
+
+    def finish(self) -> Dict[str, Any]:
+        """走査終了時のルール別結果"""
+        return {'is_valid': True, 'errors': [], 'warnings': []}
+
+    def results(self) -> List[Tuple[str, str, bool, Dict[str, Any]]]:
+        """(ルール名, severity, reported, 結果) の一覧（複数ルールをまとめたビジター用）"""
+        return [(self.name, self.severity, self.reported, self.finish())]
+
+
+class SyntaxRule(RuleVisitor):
+    """基本的なコマンド形式のチェック"""
+    name = 'syntax'
+    reported = False
+
+    def __init__(self):
+        self.is_valid = True
+
+    def visit_chunk(self, chunk: LineChunk):
+        # 先頭語が \w+ なら行全体が SYNTAX_PATTERN に一致するため、キーワードごとに1回だけ判定する
+        if not self.is_valid:
+            return
+        match = SYNTAX_PATTERN.match
+        for keyword in chunk.keyword_index:
+            if not keyword.startswith(('!', 'interface')) and not match(keyword):
+                self.is_valid = False
+                return
+
+    def finish(self) -> Dict[str, Any]:
+        errors = [] if self.is_valid else ["Invalid configuration syntax"]
+        return {'is_valid': self.is_valid, 'errors': errors, 'warnings': []}
+
+
+class IPAddressRule(RuleVisitor):
+    """IPアドレスの抽出とパブリックIPアドレスの警告（`ip` で始まる行のみ）"""
+    name = 'ip_validation'
+    keywords = ('ip',)
+
+    def __init__(self):
+        self.result = {'is_valid': True, 'errors': [], 'warnings': [], 'ip_addresses': []}
+
+    def visit_chunk(self, chunk: LineChunk):
+        stripped = chunk.stripped
+        for offset in chunk.select(self.keywords):
+            for ip in IP_ADDRESS_PATTERN.findall(stripped[offset]):
+                self.result['ip_addresses'].append(ip)
+                if not is_private_ip(ip):
+                    self.result['warnings'].append(f"Public IP address detected: {ip}")
+
+    def finish(self) -> Dict[str, Any]:
+        return self.result
+
+
+class OSPFRule(RuleVisitor):
+    """OSPFエリアの抽出とバックボーンエリアの警告（`network` で始まる行のみ）"""
+    name = 'ospf_validation'
+    severity = 'warning'
+    keywords = ('network',)
+
+    def __init__(self):
+        self.result = {'is_valid': True, 'errors': [], 'warnings': [], 'areas': []}
+
+    def visit_chunk(self, chunk: LineChunk):
+        stripped = chunk.stripped
+        for offset in chunk.select(self.keywords):
+            for network, area in OSPF_NETWORK_PATTERN.findall(stripped[offset]):
+                self.result['areas'].append({'network': network, 'area': area})
+                if area == '0':
+                    self.result['warnings'].append(f"Network {network} is in Area 0 (backbone)")
+
+    def finish(self) -> Dict[str, Any]:
+        return self.result
+
+
+# 既定で登録されるルール（実行順）
+DEFAULT_RULES = [SyntaxRule, IPAddressRule, OSPFRule]
+
+
+class ConfigValidator:
+    """コンフィグを1回だけトークン化し、登録されたルールを同じ行ストリーム上で実行する"""
+
+    def __init__(self, rules: Optional[List[Callable[[], RuleVisitor]]] = None, compiled_rules: Any = None):
+        self.rules = list(rules) if rules is not None else list(DEFAULT_RULES)
+        # validation-rules.yaml から生成したルール（CompiledRuleSet）
+        self.compiled_rules = compiled_rules
+
+    def register(self, rule: Callable[[], RuleVisitor]):
+        """ルールの追加（RuleVisitorのサブクラスまたはファクトリ）"""
+        self.rules.append(rule)
+
+    def set_compiled_rules(self, compiled_rules: Any):
+        """コンパイル済みルールの差し替え"""
+        self.compiled_rules = compiled_rules
+
+    def validate(self, config: Union[str, Iterable[str], ConfigTree], device_type: Optional[str] = None,
+                 scope: str = 'all') -> Dict[str, Any]:
+        """コンフィグの検証（結果の形式は従来の _validate_config と同じ＋rule_timings）
+
+        configには文字列のほか、ファイルオブジェクトなど任意の行イテレータを渡せる。
+        行はチャンク単位で処理するため、メモリ使用量はコンフィグの大きさによらない。
+        解析済みのConfigTreeを渡すと、その行をそのまま使う。
+        scopeに 'line' を指定すると行単位のルールのみ、'config' を指定すると
+        コンフィグ全体を対象とするルールのみを実行する。
+        """
+        if isinstance(config, ConfigTree):
+            chunks = tokenize_tree(config)
+        else:
+            chunks = tokenize_config(iter_config_lines(config))
+        visitors = [rule() for rule in self.rules]
+        if self.compiled_rules is not None:
+            visitors.append(self.compiled_rules.create_visitor(device_type, scope))
+        if scope != 'all':
+            visitors = [visitor for visitor in visitors if visitor.scope in (scope, 'all')]
+        timings = {visitor.name: 0.0 for visitor in visitors}
+        clock = time.perf_counter
+
+        for chunk in chunks:
+            for visitor in visitors:
+                started = clock()
+                visitor.visit_chunk(chunk)
+                timings[visitor.name] += clock() - started
+
+        validation_result = {
+            'is_valid': True,
+            'errors': [],
+            'warnings': [],
+            'validation_rules': {}
+        }
+
+        for visitor in visitors:
+            started = clock()
+            rule_results = visitor.results()
+            timings[visitor.name] += clock() - started
+
+            for name, severity, reported, rule_result in rule_results:
+                if reported:
+                    validation_result['validation_rules'][name] = rule_result
+                if rule_result['is_valid']:
+                    continue
+                if severity == 'error':
+                    validation_result['is_valid'] = False
+                    validation_result['errors'].extend(rule_result['errors'])
+                else:
+                    validation_result['warnings'].extend(rule_result['warnings'])
+
+        validation_result['rule_timings'] = timings
+        return validation_result
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# validation_cache.py
+import copy
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Any
+from .build_cache import BuildCache
+from .utils import compute_content_hash
+
+# cache_dir 配下の検証キャッシュ用の領域（ビルドキャッシュなどと同じディレクトリを共有できる）
+VALIDATION_CACHE_SUBDIR = "validation"
+# ルールのハッシュごとの領域のディレクトリ名の接頭辞（これに一致するディレクトリだけを削除する）
+PARTITION_PREFIX = "rules-"
+
+
+def hash_config_file(path: str, block_size: int = 1024 * 1024) -> str:
+    """コンフィグファイルのコンテンツハッシュ（ファイル全体を読み込まずに計算）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ValidationCache:
+    """検証結果のキャッシュ
+
+    キーは (コンフィグのコンテンツハッシュ, デバイスタイプ, スコープ) で、
+    検証ルールのハッシュごとに領域を分けて保存する。ルールが変わると
+    以前の領域（メモリ・ディスクとも）を破棄するため、古い結果が返ることはない。
+    ディスク上の領域は cache_dir/validation/rules-<ハッシュ先頭16文字> で、
+    削除するのはこの名前のディレクトリだけ（cache_dir の他の内容には触れない）。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_entries: int = 1024):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_memory_entries = max_memory_entries
+        self.rules_hash = None
+        self._store = None
+        self._lock = threading.Lock()
+        self._stats = {'rule_changes': 0}
+
+    @staticmethod
+    def make_key(content_hash: str, device_type: Optional[str] = None, scope: str = 'all') -> str:
+        """キャッシュキーの計算（content_hashはコンフィグ本文のハッシュ）"""
+        return compute_content_hash({
+            'content': content_hash,
+            'device_type': device_type,
+            'scope': scope
+        })
+
+    def get(self, rules_hash: str, key: str) -> Optional[Dict[str, Any]]:
+        """検証結果の取得（呼び出し元が変更しても影響しないようコピーを返す）"""
+        result = self._partition(rules_hash).get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def put(self, rules_hash: str, key: str, result: Dict[str, Any]):
+        """検証結果の保存"""
+        self._partition(rules_hash).put(key, copy.deepcopy(result))
+
+    def clear(self):
+        """キャッシュ全体のクリア"""
+        with self._lock:
+            if self._store is not None:
+                self._store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュ統計の取得"""
+        with self._lock:
+            stats = self._store.get_stats() if self._store is not None else {}
+            stats.update(self._stats)
+            stats['rules_hash'] = self.rules_hash
+        return stats
+
+    def _partition(self, rules_hash: str) -> BuildCache:
+        """検証ルールのハッシュに対応する領域（ルールが変わったら作り直す）"""
+        with self._lock:
+            if self._store is not None and rules_hash == self.rules_hash:
+                return self._store
+
+            partition_dir = None
+            if self.cache_dir:
+                namespace_dir = self.cache_dir / VALIDATION_CACHE_SUBDIR
+                partition_dir = namespace_dir / f"{PARTITION_PREFIX}{rules_hash[:16] or 'default'}"
+                # 古いルールでの結果は二度と使われないので削除する
+                if namespace_dir.exists():
+                    for old_dir in namespace_dir.iterdir():
+                        if (old_dir.is_dir() and old_dir.name.startswith(PARTITION_PREFIX)
+                                and old_dir != partition_dir):
+                            shutil.rmtree(old_dir, ignore_errors=True)
+
+            if self._store is not None:
+                self._stats['rule_changes'] += 1
+            self.rules_hash = rules_hash
+            self._store = BuildCache(str(partition_dir) if partition_dir else None, self.max_memory_entries)
+            return self._store
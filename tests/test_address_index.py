@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# test_address_index.py
+import random
+
+from src.address_index import AddressEntry, AddressIndex, extract_addresses
+from src.ipaddr import ip_to_int
+
+CONFIG_R1 = """hostname R1
+interface GigabitEthernet0/0
+ ip address 10.0.0.1 255.255.255.0
+ standby 1 ip 10.0.0.254
+interface GigabitEthernet0/1
+ ip address 10.1.0.1 255.255.0.0
+"""
+
+CONFIG_R2 = """hostname R2
+interface GigabitEthernet0/0
+ ip address 10.0.0.2 255.255.255.0
+ standby 1 ip 10.0.0.254
+interface GigabitEthernet0/1
+ ip address 10.1.2.1 255.255.255.0
+interface Loopback0
+ ip address 10.0.0.1 255.255.255.255
+"""
+
+
+def _entry(device_name, interface, address, prefix_len, kind='interface'):
+    return AddressEntry(device_name, interface, ip_to_int(address), prefix_len, kind=kind)
+
+
+def _conflict_set(conflicts):
+    return {(c.kind, frozenset((c.entry.location, c.other.location))) for c in conflicts}
+
+
+def test_extract_addresses():
+    entries = list(extract_addresses('R1', CONFIG_R1))
+    assert [(e.interface, e.ip, e.prefix_len, e.kind) for e in entries] == [
+        ('GigabitEthernet0/0', '10.0.0.1', 24, 'interface'),
+        ('GigabitEthernet0/0', '10.0.0.254', 24, 'hsrp'),
+        ('GigabitEthernet0/1', '10.1.0.1', 16, 'interface'),
+    ]
+
+
+def test_find_conflicts():
+    index = AddressIndex()
+    index.add_config('R1', CONFIG_R1)
+    index.add_config('R2', CONFIG_R2)
+    conflicts = _conflict_set(index.find_conflicts())
+
+    # 同じ /24 を共有するアドレスと同じHSRPグループは競合にしない
+    assert ('subnet_overlap', frozenset(('R1/GigabitEthernet0/0', 'R2/GigabitEthernet0/0'))) not in conflicts
+    assert not any(kind == 'hsrp_conflict' for kind, _ in conflicts)
+    # R2の Loopback0 は R1 Gi0/0 と同じアドレス
+    assert ('duplicate_ip', frozenset(('R1/GigabitEthernet0/0', 'R2/Loopback0'))) in conflicts
+    # R2の 10.1.2.0/24 は R1 の 10.1.0.0/16 に含まれる
+    assert ('subnet_overlap', frozenset(('R2/GigabitEthernet0/1', 'R1/GigabitEthernet0/1'))) in conflicts
+
+
+def test_check_matches_find_conflicts():
+    rng = random.Random(7)
+    entries = []
+    for i in range(200):
+        prefix_len = rng.choice([16, 20, 24, 24, 28, 30, 32])
+        address = ip_to_int('10.0.0.0') + rng.randrange(1 << 18)
+        entries.append(AddressEntry(f"D{i % 40}", f"Gi0/{i}", address, prefix_len))
+
+    all_conflicts = _conflict_set(AddressIndex(entries).find_conflicts())
+    assert all_conflicts
+    for position in range(0, len(entries), 10):
+        entry = entries[position]
+        index = AddressIndex(entries[:position] + entries[position + 1:])
+        expected = {conflict for conflict in all_conflicts if entry.location in conflict[1]}
+        assert _conflict_set(index.check(entry)) == expected
+
+
+def test_check_excludes_device():
+    index = AddressIndex([_entry('R1', 'Gi0/0', '192.168.1.1', 24)])
+    new = _entry('R2', 'Gi0/0', '192.168.1.1', 24)
+    assert [c.kind for c in index.check(new)] == ['duplicate_ip']
+    assert index.check(new, exclude_device='R1') == []
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# test_build_cache.py
+from pathlib import Path
+
+from src.build_cache import BuildCache
+from src.config_generator import NetworkConfigGenerator
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+QUERY = "R1のOSPF設定を生成してください"
+
+
+def _entry(device_name, content="hostname R1\n"):
+    return {'device_name': device_name, 'config_type': 'ospf', 'config_content': content,
+            'validation_result': {'is_valid': True}}
+
+
+def test_make_key_inputs():
+    key = BuildCache.make_key("p1", "t1", "r1", "R1の OSPF設定")
+
+    # 要件は前後・連続の空白を正規化してからキーにする
+    assert BuildCache.make_key("p1", "t1", "r1", "  R1の  OSPF設定 ") == key
+    assert BuildCache.make_key("p2", "t1", "r1", "R1の OSPF設定") != key
+    assert BuildCache.make_key("p1", "t2", "r1", "R1の OSPF設定") != key
+    assert BuildCache.make_key("p1", "t1", "r2", "R1の OSPF設定") != key
+    assert BuildCache.make_key("p1", "t1", "r1", "R1の OSPF設定", backend="model-a") != key
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = BuildCache(str(tmp_path), max_memory_entries=1)
+    cache.put("aa01", _entry("R1"))
+    cache.put("bb02", _entry("R2"))
+
+    # メモリから追い出されたエントリはディスクから読み、メモリに昇格する
+    assert cache.get("bb02")['device_name'] == "R2"
+    assert cache.get("aa01")['device_name'] == "R1"
+    assert cache.get("cc03") is None
+    stats = cache.get_stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['disk_entries'] == 2
+
+    # 別インスタンス（再起動後）でもディスクのエントリを使う
+    assert BuildCache(str(tmp_path)).get("bb02") == _entry("R2")
+
+
+def test_invalidate_by_key_and_device(tmp_path):
+    cache = BuildCache(str(tmp_path))
+    cache.put("aa01", _entry("R1"))
+    cache.put("aa02", _entry("R1", "hostname R1\nrouter ospf 1\n"))
+    cache.put("bb03", _entry("R2"))
+
+    assert cache.invalidate(key="bb03") == 1
+    assert cache.get("bb03") is None
+    assert cache.invalidate(device_name="R1") == 2
+    assert cache.get("aa01") is None and cache.get("aa02") is None
+    # メモリにないエントリもディスクから削除される
+    cache.put("cc04", _entry("R3"))
+    assert BuildCache(str(tmp_path)).invalidate(device_name="R3") == 1
+    assert cache.clear() == 1
+    assert cache.get_stats()['disk_entries'] == 0
+
+
+def test_generator_hit_and_invalidate():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+
+    first = generator.generate_config(QUERY)
+    second = generator.generate_config(QUERY)
+
+    assert first.metadata['build_cache'] == 'miss'
+    assert second.metadata['build_cache'] == 'hit'
+    assert second.config_content == first.config_content
+    assert second.validation_result == first.validation_result
+
+    assert generator.invalidate_build_cache(first.device_name) == 1
+    assert generator.generate_config(QUERY).metadata['build_cache'] == 'miss'
+    stats = generator.get_build_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# test_command_grammar.py
+import io
+from pathlib import Path
+
+import pytest
+
+from src.command_grammar import compile_command_grammar, load_command_grammar
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+CONFIGS = sorted((KB_DIR / "devices" / "device_configs").glob("*_running_config_*.txt"))
+
+BAD_CONFIG = """hostname R1
+interface GigabitEthernet0/0
+ ip address 10.0.0.300 255.255.255.0
+ ip address 10.0.0.1 255.0.255.0
+ ip address 10.0.0.1
+ mtu 20000
+router ospf 1
+ network 10.0.0.0 0.0.0.255 area x.y
+foo
+"""
+
+
+@pytest.fixture(scope="module")
+def grammar():
+    return load_command_grammar(KB_DIR / "automation" / "command-grammar.yaml")
+
+
+def test_bad_address_line_and_column(grammar):
+    errors = grammar.check(BAD_CONFIG, 'ios')
+
+    # 桁はインデントを含む元の行での位置（1始まり）
+    assert [(error.line, error.column) for error in errors] == [(3, 13), (4, 22), (5, 21), (6, 6), (8, 34), (9, 1)]
+    assert BAD_CONFIG.split('\n')[2][12:].startswith("10.0.0.300")
+    assert errors[0].message == "Invalid input '10.0.0.300' (expected IPv4 address)"
+    assert str(errors[0]) == ("line 3, column 13: Invalid input '10.0.0.300' (expected IPv4 address): "
+                              "ip address 10.0.0.300 255.255.255.0")
+    assert errors[2].message == "Incomplete command (expected subnet mask)"
+
+
+def test_line_iterator_matches_string(grammar):
+    assert grammar.check(io.StringIO(BAD_CONFIG), 'ios') == grammar.check(BAD_CONFIG, 'ios')
+
+
+@pytest.mark.parametrize("path", CONFIGS, ids=lambda path: path.name)
+def test_kb_configs_are_clean(grammar, path):
+    assert grammar.check(path.read_text(encoding='utf-8'), 'ios') == []
+
+
+def test_small_grammar_features():
+    grammar = compile_command_grammar({
+        'default_platform': 'base',
+        'platforms': {
+            'base': {'modes': {
+                'global': ["hostname <word>", {'command': "interface <interface>", 'mode': 'interface'}],
+                'interface': ["shutdown", "speed {10|100|1000|auto}"],
+            }},
+            'child': {'inherits': 'base', 'modes': {'interface': ["mtu <uint:64-9216>"]}},
+        },
+    }, 'test')
+    config = "hostname R1\ninterface Gi0/0\n shut\n no shutdown\n speed AUTO\n mtu 20\n"
+
+    # 大文字・省略形・no 形式は受け付け、範囲外の値は位置付きのエラー
+    assert [(error.line, error.column, error.message) for error in grammar.check(config, 'child')] == [
+        (6, 6, "Invalid input '20' (expected number (64-9216))")
+    ]
+    # 継承元のプラットフォームには mtu がないため文法外（従来の判定で受け付ける）
+    assert grammar.check(config, 'base') == []
+    # 不明なプラットフォームは既定のプラットフォームで検査する
+    assert grammar.check(config + "bogus\n", 'unknown') == grammar.check(config + "bogus\n", 'base')
+    assert [error.line for error in grammar.check(config + "bogus\n", 'base')] == [7]
+
+    with pytest.raises(ValueError):
+        compile_command_grammar({'platforms': {'a': {'inherits': 'b'}, 'b': {'inherits': 'a'}}}, 'loop')
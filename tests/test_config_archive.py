@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# test_config_archive.py
+from pathlib import Path
+
+import pytest
+
+from src import config_generator
+from src.config_archive import DirectorySink, JSONLArchiveSink
+from src.config_generator import GeneratedConfig, NetworkConfigGenerator
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+
+
+def _config(device_name: str, content: str) -> GeneratedConfig:
+    return GeneratedConfig(
+        device_name=device_name,
+        config_type="general",
+        config_content=content,
+        validation_result={'is_valid': True},
+        metadata={'timestamp': '2025-01-01T00:00:00'}
+    )
+
+
+def test_write_record_rejects_existing_name(tmp_path):
+    with JSONLArchiveSink(str(tmp_path)) as sink:
+        sink.write_record("R1", {"R1.txt": "first"})
+        with pytest.raises(FileExistsError):
+            sink.write_record("R1", {"R1.txt": "second"})
+        assert sink.names() == ["R1"]
+        assert sink.read_record("R1") == {"R1.txt": "first"}
+
+
+def test_save_configs_keeps_every_record(tmp_path):
+    generator = NetworkConfigGenerator(str(KB_DIR), use_build_cache=False, use_validation_cache=False)
+    configs = [_config("R1", f"hostname R1\n! rev {i}\n") for i in range(3)] + [_config("R1", "hostname R1\n")] * 2
+
+    with JSONLArchiveSink(str(tmp_path)) as sink:
+        saved = generator.save_configs(configs, sink=sink)
+        names = sink.names()
+        records = list(sink.iter_records())
+
+    assert len(saved) == len(configs)
+    assert len(set(names)) == len(configs)
+    assert [record['name'] for record in records] == names
+    contents = [next(v for k, v in record['members'].items() if k.endswith('.txt')) for record in records]
+    assert [content.split('\n\n', 1)[1] for content in contents] == [config.config_content for config in configs]
+
+
+def test_directory_sink_rejects_existing_files(tmp_path):
+    sink = DirectorySink(str(tmp_path))
+    sink.write_record("R1", {"R1.txt": "first"})
+    (tmp_path / "R2_validation.json").write_text("other", encoding='utf-8')
+
+    with pytest.raises(FileExistsError):
+        sink.write_record("R1", {"R1.txt": "second"})
+    # 途中で衝突したレコードは書きかけのファイルを残さない
+    with pytest.raises(FileExistsError):
+        sink.write_record("R2", {"R2.txt": "new", "R2_validation.json": "new"})
+    assert (tmp_path / "R1.txt").read_text(encoding='utf-8') == "first"
+    assert not (tmp_path / "R2.txt").exists()
+
+
+def test_save_config_to_directory_adds_sequence(tmp_path, monkeypatch):
+    fixed = config_generator.datetime(2025, 1, 1, 12, 0, 0, 123456)
+
+    class FixedDatetime:
+        @staticmethod
+        def now():
+            return fixed
+
+    # 同じ時刻に保存しても前のファイルを上書きしない
+    monkeypatch.setattr(config_generator, 'datetime', FixedDatetime)
+    generator = NetworkConfigGenerator(str(KB_DIR), use_build_cache=False, use_validation_cache=False)
+    saved = [generator.save_config(_config("R1", f"hostname R1\n! rev {i}\n"), str(tmp_path)) for i in range(3)]
+
+    assert [Path(filepath).name for filepath, _ in saved] == [
+        "R1_general_20250101_120000_123456.txt",
+        "R1_general_20250101_120000_123456_2.txt",
+        "R1_general_20250101_120000_123456_3.txt",
+    ]
+    for i, (filepath, _) in enumerate(saved):
+        assert Path(filepath).read_text(encoding='utf-8').endswith(f"! rev {i}\n")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# test_config_diff.py
+from src.config_diff import diff_configs, generate_config_delta, myers_diff
+from src.config_parser import parse_config_blocks
+from src.utils import generate_change_log
+
+OLD = """hostname R1
+!
+interface GigabitEthernet0/0
+ description WAN
+ ip address 10.0.0.1 255.255.255.0
+ no shutdown
+!
+interface GigabitEthernet0/1
+ ip address 10.0.1.1 255.255.255.0
+!
+router ospf 1
+ network 10.0.0.0 0.0.0.255 area 0
+!
+ntp server 192.0.2.1
+"""
+
+NEW = """hostname R1
+!
+interface GigabitEthernet0/0
+ description WAN uplink
+ ip address 10.0.0.1 255.255.255.0
+ no shutdown
+!
+router ospf 1
+ network 10.0.0.0 0.0.0.255 area 0
+ network 10.0.2.0 0.0.0.255 area 0
+!
+interface Loopback0
+ ip address 10.255.0.1 255.255.255.255
+!
+ntp server 192.0.2.1
+"""
+
+BGP_OLD = """router bgp 65000
+ neighbor 10.0.0.2 remote-as 65001
+ address-family ipv4
+  neighbor 10.0.0.2 activate
+  network 10.1.0.0 mask 255.255.0.0
+ exit-address-family
+"""
+
+BGP_NEW = """router bgp 65000
+ neighbor 10.0.0.2 remote-as 65001
+ address-family ipv4
+  neighbor 10.0.0.2 activate
+  network 10.2.0.0 mask 255.255.0.0
+ exit-address-family
+ address-family ipv6
+  neighbor 2001:db8::2 activate
+ exit-address-family
+ bgp log-neighbor-changes
+"""
+
+
+def _apply(ops, keep):
+    return [line for op, line in ops if op in (' ', keep)]
+
+
+def test_myers_diff_reconstructs_both_sides():
+    old = ["a", "b", "c", "a", "b", "b", "a"]
+    new = ["c", "b", "a", "b", "a", "c"]
+    ops = myers_diff(old, new)
+
+    assert _apply(ops, '-') == old
+    assert _apply(ops, '+') == new
+    # 最短編集距離（この例では5）
+    assert sum(1 for op, _ in ops if op != ' ') == 5
+
+
+def test_diff_configs_block_kinds():
+    diff = diff_configs(OLD, NEW)
+    kinds = {block.key: block.kind for block in diff.blocks}
+
+    assert kinds == {
+        'hostname R1': 'unchanged',
+        'interface GigabitEthernet0/0': 'modified',
+        'interface GigabitEthernet0/1': 'removed',
+        'router ospf 1': 'modified',
+        'interface Loopback0': 'added',
+        'ntp server 192.0.2.1': 'unchanged',
+    }
+    # 並び替えだけでは変更にならない
+    assert not diff_configs(OLD, "ntp server 192.0.2.1\n" + OLD.replace("ntp server 192.0.2.1\n", "")).has_changes
+
+
+def test_change_log_round_trip():
+    log = generate_change_log(OLD, NEW).split('\n')[2:]
+
+    old_lines = [line[2:] if line.startswith('  ') else line[len('-REMOVED: '):]
+                 for line in log if not line.startswith('+ADDED: ')]
+    new_lines = [line[2:] if line.startswith('  ') else line[len('+ADDED: '):]
+                 for line in log if not line.startswith('-REMOVED: ')]
+
+    assert new_lines == [line for block in parse_config_blocks(NEW) for line in block.lines]
+    assert sorted(old_lines) == sorted(line for block in parse_config_blocks(OLD) for line in block.lines)
+    assert "-REMOVED:  description WAN" in log
+    assert "+ADDED:  description WAN uplink" in log
+
+
+def test_change_log_ignores_comments_and_blank_lines():
+    commented = OLD.replace("!\n", "! changed\n\n")
+    log = generate_change_log(OLD, commented)
+
+    assert "ADDED" not in log and "REMOVED" not in log
+
+
+def test_delta_exits_submode_before_block_commands():
+    delta = generate_config_delta(BGP_OLD, BGP_NEW).split('\n')
+
+    assert delta == [
+        "router bgp 65000",
+        " address-family ipv4",
+        "  no network 10.1.0.0 mask 255.255.0.0",
+        "  network 10.2.0.0 mask 255.255.0.0",
+        " exit-address-family",
+        " address-family ipv6",
+        "  neighbor 2001:db8::2 activate",
+        " exit-address-family",
+        " bgp log-neighbor-changes",
+        "!",
+        "end",
+    ]
+    assert generate_config_delta(BGP_NEW, BGP_OLD).split('\n') == [
+        "router bgp 65000",
+        " address-family ipv4",
+        "  no network 10.2.0.0 mask 255.255.0.0",
+        "  network 10.1.0.0 mask 255.255.0.0",
+        " exit-address-family",
+        " no address-family ipv6",
+        " no bgp log-neighbor-changes",
+        "!",
+        "end",
+    ]
+
+
+def test_delta_for_interfaces():
+    delta = generate_config_delta(OLD, NEW)
+
+    assert delta.split('\n') == [
+        "interface GigabitEthernet0/0",
+        " no description WAN",
+        " description WAN uplink",
+        "!",
+        "no interface GigabitEthernet0/1",
+        "router ospf 1",
+        " network 10.0.2.0 0.0.0.255 area 0",
+        "!",
+        "interface Loopback0",
+        " ip address 10.255.0.1 255.255.255.255",
+        "!",
+        "end",
+    ]
+    assert generate_config_delta(OLD, OLD) == ""
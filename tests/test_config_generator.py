@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# test_config_generator.py
+from pathlib import Path
+
+import pytest
+
+from src.config_generator import NetworkConfigGenerator
+from src.config_parser import parse_config_blocks
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+QUERY = "R1のOSPF設定を生成してください"
+
+
+def _sections(generator, query=QUERY):
+    stream = generator.generate_config_stream(query)
+    sections = []
+    while True:
+        try:
+            sections.append(next(stream))
+        except StopIteration as stop:
+            return sections, stop.value
+
+
+def test_policy_change_rerenders_dependent_sections_only():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+    first_sections, first = _sections(generator)
+    assert not any(section.reused for section in first_sections)
+
+    policy = generator.kb.get_device_policy("R1")
+    ospf_config = dict(policy.ospf_config, router_id="10.255.255.1")
+    assert generator.update_device_policy("R1", ospf_config=ospf_config, hostname=policy.hostname) == ['ospf_config']
+
+    sections, updated = _sections(generator)
+    rerendered = [section.name for section in sections if not section.reused]
+    assert rerendered == ['ospf']
+    assert updated.metadata['build_cache'] == 'miss'
+    assert updated.metadata['reused_sections'] == ['header', 'basic', 'interfaces', 'security', 'ha', 'monitoring']
+    assert "10.255.255.1" in sections[3].content
+    assert "10.255.255.1" not in first_sections[3].content
+    for before, after in zip(first_sections, sections):
+        if after.reused:
+            assert after.content == before.content
+            assert after.validation_result == before.validation_result
+
+    # 差分再生成の結果は最初から生成した結果と同じ
+    fresh = NetworkConfigGenerator(str(KB_DIR), use_build_cache=False)
+    fresh.update_device_policy("R1", ospf_config=ospf_config)
+    assert fresh.generate_config(QUERY).config_content == updated.config_content
+
+
+def test_unchanged_policy_update_is_noop():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+    policy = generator.kb.get_device_policy("R1")
+
+    assert generator.update_device_policy("R1", hostname=policy.hostname) == []
+    with pytest.raises(ValueError):
+        generator.update_device_policy("R1", no_such_field=1)
+    with pytest.raises(KeyError):
+        generator.update_device_policy("R9", hostname="R9")
+
+
+def _merge(running, delta):
+    """prune=False の差分を running-config にマージした結果（ブロック→行の集合）"""
+    merged = {block.key: set(block.lines) for block in parse_config_blocks(running)}
+    for block in parse_config_blocks(delta):
+        merged.setdefault(block.key, set()).update(block.lines)
+    return merged
+
+
+def test_delta_mode_against_running_config():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+    full = NetworkConfigGenerator(str(KB_DIR), use_build_cache=False).generate_config(QUERY)
+    delta = generator.generate_config(QUERY, mode="delta")
+    running = generator.kb.get_latest_running_config("R1")
+
+    assert delta.metadata['output_mode'] == 'delta'
+    assert delta.metadata['delta_base'] == running.path
+    assert delta.metadata['full_config_length'] == len(full.config_content)
+    assert delta.config_content.endswith("!\nend")
+    # running-configにしかない設定は取り消さず、生成したコンフィグの行だけを投入する
+    full_lines = set(full.config_content.split('\n'))
+    assert all(line in full_lines for line in delta.config_content.split('\n') if line not in ('!', 'end'))
+    merged = _merge(running.content, delta.config_content)
+    for block in parse_config_blocks(full.config_content):
+        assert set(block.lines) <= merged[block.key]
+    assert delta.metadata['changed_blocks'] == [block.key for block in parse_config_blocks(delta.config_content)
+                                                  if block.key != 'end']
+
+
+def test_delta_mode_without_running_config():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+    result = generator.generate_config("R2のOSPF設定を生成してください", mode="delta")
+
+    assert result.metadata['output_mode'] == 'full'
+    assert result.metadata['delta_base'] is None
+    assert result.config_content == generator.generate_config("R2のOSPF設定を生成してください").config_content
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# test_config_parser.py
+import io
+import shutil
+from pathlib import Path
+
+import pytest
+
+from knowledge_updater import NetworkRAGKnowledgeUpdater, parse_config_metadata
+from src import config_parser
+from src.config_parser import ConfigNodeStream, KeywordDispatcher, clear_config_tree_cache, parse_config_tree
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+CONFIGS = sorted((KB_DIR / "devices" / "device_configs").glob("*_running_config_*.txt"))
+
+
+def _without_timestamp(metadata):
+    return {key: value for key, value in metadata.items() if key != 'extracted_at'}
+
+
+@pytest.fixture
+def updater(tmp_path):
+    shutil.copytree(KB_DIR / "automation", tmp_path / "automation")
+    return NetworkRAGKnowledgeUpdater(str(tmp_path))
+
+
+def test_iterator_input_is_not_cached():
+    clear_config_tree_cache()
+    config = "hostname R1\ninterface Gi0/0\n ip address 10.0.0.1 255.255.255.0\n"
+
+    tree = parse_config_tree(io.StringIO(config))
+    assert len(config_parser._tree_cache) == 0
+    assert [node.text for node in parse_config_tree(config).nodes] == [node.text for node in tree.nodes]
+    assert len(config_parser._tree_cache) == 1
+
+
+def test_cache_is_bounded_by_chars(monkeypatch):
+    clear_config_tree_cache()
+    monkeypatch.setattr(config_parser, 'TREE_CACHE_MAX_CHARS', 100)
+    configs = [f"hostname R{i}\n" + "x" * 40 for i in range(5)]
+
+    for config in configs:
+        parse_config_tree(config)
+    assert config_parser._tree_cache_chars <= 100
+    assert len(config_parser._tree_cache) == 100 // len(configs[0])
+
+    # 上限を超える1件はキャッシュしない
+    parse_config_tree("hostname BIG\n" + "x" * 200)
+    assert config_parser._tree_cache_chars <= 100
+    clear_config_tree_cache()
+    assert config_parser._tree_cache_chars == 0
+
+
+def test_node_stream_matches_tree():
+    for path in CONFIGS:
+        text = path.read_text(encoding='utf-8')
+        tree = parse_config_tree(text)
+        stream = ConfigNodeStream(io.StringIO(text))
+        nodes = [(node.number, node.stripped, node.parent.number if node.parent else None) for node in stream]
+
+        assert nodes == [(node.number, node.stripped, node.parent.number if node.parent else None)
+                         for node in tree.nodes]
+        assert stream.content_lines == sum(1 for line in text.split('\n') if line.strip())
+
+
+def test_streaming_matches_tree_results(updater):
+    for path in CONFIGS:
+        text = path.read_text(encoding='utf-8')
+        with open(path, 'r', encoding='utf-8') as f:
+            streamed = parse_config_metadata(f)
+        assert _without_timestamp(streamed) == _without_timestamp(parse_config_metadata(text))
+
+        with open(path, 'r', encoding='utf-8') as f:
+            assert updater._extract_config_sections(f) == updater._extract_config_sections(text)
+        with open(path, 'r', encoding='utf-8') as f:
+            assert updater._check_config(f) == updater._check_config(text)
+
+
+@pytest.mark.parametrize("config", ["", "\n\nhostname R1\n\n", "interface Gi0/0\n shutdown\n",
+                                    "hostname R1\nfoo\n"])
+def test_streaming_check_edge_cases(updater, config):
+    assert updater._check_config(io.StringIO(config)) == updater._check_config(config)
+
+
+TREE_SAMPLE = """# device: R1
+
+hostname R1
+!
+interface GigabitEthernet0/0
+ description WAN
+ ip address 10.0.0.1 255.255.255.0
+!
+router bgp 65000
+ neighbor 10.0.0.2 remote-as 65001
+ address-family ipv4
+  neighbor 10.0.0.2 activate
+ exit-address-family
+ip access-list standard MGMT
+ permit 10.0.0.0 0.0.0.255
+
+"""
+
+
+def test_tree_structure_and_index():
+    tree = parse_config_tree(TREE_SAMPLE)
+
+    assert [root.stripped for root in tree.roots] == [
+        "hostname R1", "interface GigabitEthernet0/0", "router bgp 65000", "ip access-list standard MGMT"
+    ]
+    bgp = tree.blocks('router')[0]
+    assert [node.stripped for node in bgp.children] == [
+        "neighbor 10.0.0.2 remote-as 65001", "address-family ipv4", "exit-address-family"
+    ]
+    activate = bgp.children[1].children[0]
+    assert activate.number == 12
+    assert activate.parent is bgp.children[1]
+    assert activate.block is bgp
+    assert [node.stripped for node in bgp.descendants()][2] == "neighbor 10.0.0.2 activate"
+
+    # 1語・2語の索引（全階層とトップレベル）
+    assert [node.number for node in tree.find('neighbor')] == [10, 12]
+    assert tree.blocks('neighbor') == []
+    assert [node.number for node in tree.find('IP   Access-List')] == [14]
+    assert [node.number for node in tree.find('ip')] == [7, 14]
+    assert len(tree) == len(TREE_SAMPLE.split('\n')) and tree.span == 15
+    # 同じ内容の文字列は同じツリーを共有する
+    assert parse_config_tree(TREE_SAMPLE) is tree
+
+
+def _dispatcher():
+    dispatcher = KeywordDispatcher()
+    dispatcher.register('ip', r'^ip\s+(\S+)', 'ip_commands', lambda node, match: match.group(1))
+    dispatcher.register('ip address', r'address\s+(\S+)', 'addresses', lambda node, match: (node.number, match.group(1)))
+    dispatcher.register('Interface', r'^interface\s+(\S+)', 'interfaces', lambda node, match: match.group(1))
+    dispatcher.register('ntp server', r'server\s+(\S+)', 'ntp', lambda node, match: match.group(1))
+    return dispatcher
+
+
+def test_keyword_dispatcher_classify():
+    dispatcher = _dispatcher()
+
+    # 2語のキーが優先され、1語のキーとは重ならない
+    assert dispatcher.classify("ip address 10.0.0.1 255.255.255.0")[1] == 'addresses'
+    assert dispatcher.classify("ip route 0.0.0.0 0.0.0.0 10.0.0.2")[1] == 'ip_commands'
+    assert dispatcher.classify("INTERFACE Gi0/0")[1] == 'interfaces'
+    assert dispatcher.classify("ntp source Loopback0") is None
+    assert dispatcher.classify("hostname R1") is None
+
+
+def test_keyword_dispatcher_inputs_agree():
+    config = TREE_SAMPLE + "ip route 0.0.0.0 0.0.0.0 10.0.0.2\nntp server 192.0.2.1\nntp source Loopback0\n"
+    expected = [
+        ('ip_commands', 'access-list'),
+        ('ip_commands', 'route'),
+        ('addresses', (7, '10.0.0.1')),
+        ('interfaces', 'GigabitEthernet0/0'),
+        ('ntp', '192.0.2.1'),
+    ]
+    dispatcher = _dispatcher()
+
+    assert list(dispatcher.dispatch(config)) == expected
+    assert list(dispatcher.dispatch(parse_config_tree(config))) == expected
+    assert list(dispatcher.dispatch(io.StringIO(config))) == expected
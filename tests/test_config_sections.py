@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# test_config_sections.py
+import asyncio
+from pathlib import Path
+
+from src.config_generator import NetworkConfigGenerator
+from src.config_sections import SectionSplitter, split_config_sections
+from src.llm_backend import HTTPLLMBackend, StubLLMServer
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+QUERY = "R1のOSPF設定を生成してください"
+SECTION_NAMES = ['header', 'basic', 'interfaces', 'ospf', 'security', 'ha', 'monitoring']
+
+
+def _drain(stream):
+    """ストリームのセクションとジェネレーターの戻り値"""
+    sections = []
+    while True:
+        try:
+            sections.append(next(stream))
+        except StopIteration as stop:
+            return sections, stop.value
+
+
+def _reference_config():
+    return NetworkConfigGenerator(str(KB_DIR), use_build_cache=False).generate_config(QUERY).config_content
+
+
+def test_split_round_trip():
+    config = _reference_config()
+    sections = split_config_sections(config)
+
+    assert [name for name, _ in sections] == SECTION_NAMES
+    assert ''.join(text for _, text in sections) == config
+
+
+def test_splitter_matches_split_for_any_chunking():
+    config = _reference_config()
+    expected = split_config_sections(config)
+
+    for size in (1, 2, 7, 64, len(config)):
+        splitter = SectionSplitter()
+        sections = []
+        for start in range(0, len(config), size):
+            sections.extend(splitter.feed(config[start:start + size]))
+        sections.extend(splitter.flush())
+        assert sections == expected
+
+
+def test_stream_matches_generate_config():
+    generator = NetworkConfigGenerator(str(KB_DIR))
+    sections, generated = _drain(generator.generate_config_stream(QUERY))
+
+    assert [section.name for section in sections] == SECTION_NAMES
+    assert ''.join(section.content for section in sections) == generated.config_content
+    assert generated.config_content == _reference_config()
+    assert generator.get_generated_configs() == [generated]
+
+    # 2回目はビルドキャッシュから同じセクションを返す
+    cached_sections, cached = _drain(generator.generate_config_stream(QUERY))
+    assert cached.metadata['build_cache'] == 'hit'
+    assert [section.content for section in cached_sections] == [section.content for section in sections]
+
+
+def test_llm_stream_is_split_into_sections():
+    config = _reference_config()
+
+    with StubLLMServer(responder=lambda prompt: config) as server:
+        generator = NetworkConfigGenerator(str(KB_DIR), llm_backend=HTTPLLMBackend(server.url, max_retries=0))
+        try:
+            sections, generated = _drain(generator.generate_config_stream(QUERY))
+
+            async def collect():
+                return [section async for section in generator.agenerate_config_stream("R2の設定")]
+            async_sections = asyncio.run(collect())
+        finally:
+            generator.llm_backend.close()
+
+    assert [(section.name, section.content) for section in sections] == split_config_sections(config)
+    assert generated.config_content == config
+    assert [section.content for section in async_sections] == [section.content for section in sections]
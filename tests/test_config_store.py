@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# test_config_store.py
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.config_generator import GeneratedConfig, NetworkConfigGenerator
+from src.config_store import MemoryConfigStore, SQLiteConfigStore, TieredConfigStore
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+BASE = datetime(2026, 1, 1, 9, 0, 0)
+
+
+def _config(index, device_name="R1", config_type="ospf"):
+    return GeneratedConfig(
+        device_name=device_name,
+        config_type=config_type,
+        config_content=f"hostname {device_name}\n! {index}\n",
+        validation_result={'is_valid': True},
+        metadata={'timestamp': (BASE + timedelta(minutes=index)).isoformat(), 'index': index}
+    )
+
+
+def _indexes(configs):
+    return [config.metadata['index'] for config in configs]
+
+
+def test_memory_store_keeps_latest():
+    store = MemoryConfigStore(max_entries=3)
+    for i in range(5):
+        store.add(_config(i))
+
+    assert len(store) == 3
+    assert _indexes(store.recent()) == [2, 3, 4]
+    assert _indexes(store.recent(2)) == [3, 4]
+
+
+def test_sqlite_store_find_and_default_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.config_store.RECENT_LIMIT', 4)
+    store = SQLiteConfigStore(str(tmp_path / "configs.db"))
+    try:
+        for i in range(6):
+            store.add(_config(i, device_name="R1" if i % 2 else "R2", config_type="acl" if i < 3 else "ospf"))
+
+        assert len(store) == 6
+        # limit を省略しても全履歴は読まない
+        assert _indexes(store.recent()) == [2, 3, 4, 5]
+        assert _indexes(store.recent(10)) == [0, 1, 2, 3, 4, 5]
+        assert _indexes(store.find(device_name="R1")) == [1, 3, 5]
+        assert _indexes(store.find(config_type="acl", limit=2)) == [1, 2]
+        assert _indexes(store.find(since=BASE + timedelta(minutes=2), until=BASE + timedelta(minutes=4))) == [2, 3, 4]
+        assert store.recent()[0].validation_result == {'is_valid': True}
+    finally:
+        store.close()
+
+
+class CountingStore(SQLiteConfigStore):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.reads = 0
+
+    def find(self, *args, **kwargs):
+        self.reads += 1
+        return super().find(*args, **kwargs)
+
+
+def test_tiered_store_serves_recent_from_memory(tmp_path):
+    disk = CountingStore(str(tmp_path / "configs.db"))
+    store = TieredConfigStore(MemoryConfigStore(max_entries=3), disk)
+    try:
+        for i in range(2):
+            store.add(_config(i))
+
+        # メモリが埋まる前でも limit 省略時はディスクを読まない
+        assert _indexes(store.recent()) == [0, 1]
+        assert disk.reads == 0
+
+        for i in range(2, 5):
+            store.add(_config(i))
+        assert _indexes(store.recent()) == [2, 3, 4]
+        assert _indexes(store.recent(2)) == [3, 4]
+        assert disk.reads == 0
+
+        assert _indexes(store.recent(5)) == [0, 1, 2, 3, 4]
+        assert disk.reads == 1
+        assert len(store) == 5
+    finally:
+        store.close()
+
+
+def test_generated_configs_does_not_read_disk(tmp_path):
+    disk = CountingStore(str(tmp_path / "configs.db"))
+    store = TieredConfigStore(MemoryConfigStore(max_entries=10), disk)
+    generator = NetworkConfigGenerator(str(KB_DIR), config_store=store)
+    try:
+        store.add(_config(0))
+        assert _indexes(generator.generated_configs) == [0]
+        assert disk.reads == 0
+    finally:
+        store.close()
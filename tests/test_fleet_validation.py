@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# test_fleet_validation.py
+import sqlite3
+from pathlib import Path
+
+import yaml
+
+from src.fleet_validation import validate_many
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+
+
+def _rules():
+    with open(KB_DIR / "automation" / "validation-rules.yaml", 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def _inputs(tmp_path):
+    configs = sorted((KB_DIR / "devices" / "device_configs").glob("*_running_config_*.txt"))
+    return configs + [
+        ("PUB1", "hostname PUB1\ninterface Gi0/0\n ip address 203.0.113.1 255.255.255.0\n"),
+        ("OK1", "hostname OK1\ninterface Gi0/0\n ip address 10.0.0.1 255.255.255.0\n"),
+        tmp_path / "missing_running_config.txt",
+    ]
+
+
+def _without_timings(summary):
+    return {key: value for key, value in summary.items() if not key.endswith('time')}
+
+
+def test_summary_counts(tmp_path):
+    inputs = _inputs(tmp_path)
+    summary = validate_many(inputs, workers=1, validation_rules=_rules(), rules_hash='test')
+
+    assert summary['total'] == len(inputs)
+    assert summary['valid'] + summary['invalid'] + summary['failed'] == summary['total']
+    # 存在しないファイルはエラーとして数える
+    assert summary['failed'] == 1
+    assert summary['rule_failures']['ip_validation[1].check_private'] >= 1
+    worst = [device['device_name'] for device in summary['worst_devices']]
+    assert 'PUB1' in worst
+    assert 'OK1' not in worst
+
+
+def test_pool_matches_single_process(tmp_path):
+    inputs = _inputs(tmp_path)
+    rules = _rules()
+    single = validate_many(inputs, workers=1, validation_rules=rules, rules_hash='test')
+    pooled = validate_many(inputs, workers=2, validation_rules=rules, rules_hash='test',
+                           batch_size=1, max_pending=1)
+
+    assert _without_timings(pooled) == _without_timings(single)
+
+
+def test_report_rows(tmp_path):
+    inputs = _inputs(tmp_path)
+    report_path = str(tmp_path / "report.db")
+    summary = validate_many(inputs, workers=1, validation_rules=_rules(), rules_hash='test',
+                            report_path=report_path)
+
+    with sqlite3.connect(report_path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM validation_results").fetchone()[0]
+    assert rows == summary['total']
+
+
+def test_missing_path_string_is_reported(tmp_path):
+    missing = str(tmp_path / "R9_running_config_missing.txt")
+    inputs = [missing, "hostname R1\n", ("ONE", "hostname ONE")]
+    report_path = str(tmp_path / "report.db")
+    summary = validate_many(inputs, workers=1, validation_rules=_rules(), rules_hash='test',
+                            report_path=report_path)
+
+    # 存在しないパスはコンフィグ本文として検証せず、ファイルが見つからないエラーになる
+    assert summary['total'] == 3
+    assert summary['failed'] == 1
+    with sqlite3.connect(report_path) as conn:
+        status, source, errors = conn.execute(
+            "SELECT status, source, errors FROM validation_results WHERE device_name = 'R9'"
+        ).fetchone()
+    assert status == 'error'
+    assert source == missing
+    assert 'No such file' in errors
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# test_ipaddr.py
+import ipaddress
+import random
+
+import pytest
+
+from src import ipaddr
+from src.ipaddr import (
+    broadcast_address, int_to_ip, ip_to_int, is_private_ip, is_valid_mask, mask_to_prefix,
+    network_address, parse_address, parse_prefix, prefix_to_mask
+)
+
+INVALID = ["256.0.0.1", "1.2.3", "1.2.3.4.5", "a.b.c.d", "1.2.3.04444", "", " 1.2.3.4", "１.2.3.4"]
+
+
+def _random_addresses(count, seed=7):
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for _ in range(count)] + [0, ipaddr.MAX_ADDRESS]
+
+
+def test_scalar_matches_stdlib():
+    for value in _random_addresses(500):
+        text = int_to_ip(value)
+        assert text == str(ipaddress.IPv4Address(value))
+        assert ip_to_int(text) == value
+        prefix = value % 33
+        network = ipaddress.IPv4Network((value, prefix), strict=False)
+        assert network_address(value, prefix) == int(network.network_address)
+        assert broadcast_address(value, prefix) == int(network.broadcast_address)
+        assert is_private_ip(f"{text}/{prefix}") == any(
+            ipaddress.IPv4Address(value) in ipaddress.IPv4Network(net)
+            for net in ("10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16")
+        )
+
+
+@pytest.mark.parametrize("text", INVALID)
+def test_invalid_addresses(text):
+    with pytest.raises(ValueError):
+        ip_to_int(text)
+    assert not is_private_ip(text)
+
+
+def test_masks_and_prefixes():
+    for prefix in range(33):
+        mask = prefix_to_mask(prefix)
+        assert is_valid_mask(mask)
+        assert mask_to_prefix(mask) == prefix
+    assert mask_to_prefix(ip_to_int("255.0.255.0")) is None
+    with pytest.raises(ValueError):
+        prefix_to_mask(33)
+
+    assert parse_prefix("10.0.0.1/24") == (ip_to_int("10.0.0.1"), 24)
+    for text in ("10.0.0.1", "10.0.0.1/33", "10.0.0.1/", "10.0.0.1/２４"):
+        with pytest.raises(ValueError):
+            parse_prefix(text)
+    assert parse_address("10.0.0.1 255.255.255.0") == (ip_to_int("10.0.0.1"), 24)
+    assert parse_address("10.0.0.1") == (ip_to_int("10.0.0.1"), 32)
+    assert parse_address("10.0.0.1 255.0.255.0") is None
+    assert parse_address("10.0.0.1 255.255.255.0 extra") is None
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure-python"])
+def array_mode(request, monkeypatch):
+    if request.param and not ipaddr.NUMPY_AVAILABLE:
+        pytest.skip("NumPy is not installed")
+    if not request.param:
+        monkeypatch.setattr(ipaddr, 'NUMPY_AVAILABLE', False)
+    return request.param
+
+
+def test_array_versions_match_scalar(array_mode):
+    values = _random_addresses(300)
+    prefixes = [value % 33 for value in values]
+    texts = [int_to_ip(value) for value in values] + INVALID
+
+    parsed, valid = ipaddr.parse_ip_array(texts)
+    assert [int(value) for value in parsed] == values + [0] * len(INVALID)
+    assert [bool(flag) for flag in valid] == [True] * len(values) + [False] * len(INVALID)
+
+    masks = [prefix_to_mask(prefix) for prefix in prefixes]
+    assert [int(mask) for mask in ipaddr.prefix_to_mask_array(prefixes)] == masks
+    assert [int(value) for value in ipaddr.network_array(values, prefixes)] == [
+        network_address(value, prefix) for value, prefix in zip(values, prefixes)
+    ]
+    assert [int(value) for value in ipaddr.broadcast_array(values, prefixes)] == [
+        broadcast_address(value, prefix) for value, prefix in zip(values, prefixes)
+    ]
+    assert [bool(flag) for flag in ipaddr.is_valid_mask_array(masks + values)] == [
+        is_valid_mask(mask) for mask in masks + values
+    ]
+    assert [bool(flag) for flag in ipaddr.is_private_array(values)] == [
+        ipaddr.is_private(value) for value in values
+    ]
+
+
+def test_parse_ip_array_mixed_formats(array_mode):
+    parsed, valid = ipaddr.parse_ip_array(["10.0.0.1", "10.0.0.1/24", "192.168.1.1"])
+    assert [int(value) for value in parsed] == [ip_to_int("10.0.0.1"), 0, ip_to_int("192.168.1.1")]
+    assert [bool(flag) for flag in valid] == [True, False, True]
+    assert len(ipaddr.parse_ip_array([])[0]) == 0
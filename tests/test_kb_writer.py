@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# test_kb_writer.py
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from knowledge_updater import DeviceConfig, NetworkRAGKnowledgeUpdater
+from src.kb_writer import GENERATION_FILE, JOURNAL_FILE, PENDING_SUFFIX, KBWriter, read_kb_generation
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+R1_CONFIG = KB_DIR / "devices" / "device_configs" / "R1_running_config_2025-08-10.txt"
+
+
+def _files(root: Path):
+    return sorted(path.relative_to(root).as_posix() for path in root.rglob("*") if path.is_file())
+
+
+def test_batch_commits_once(tmp_path):
+    writer = KBWriter(tmp_path, durable=False)
+    with writer.batch():
+        writer.stage("a.txt", "a")
+        writer.stage_append("log.jsonl", "1\n")
+        with writer.batch():
+            writer.stage("sub/b.txt", "b")
+            writer.stage_append("log.jsonl", "2\n")
+        assert not (tmp_path / "a.txt").exists()
+        assert writer.read_text("log.jsonl") == "1\n2\n"
+
+    assert read_kb_generation(tmp_path) == 1
+    assert (tmp_path / "sub" / "b.txt").read_text() == "b"
+    assert (tmp_path / "log.jsonl").read_text() == "1\n2\n"
+    assert writer.pending == 0
+    assert not [name for name in _files(tmp_path) if name.endswith(PENDING_SUFFIX)]
+    assert not (tmp_path / JOURNAL_FILE).exists()
+
+
+def test_nested_batch_rolls_back_to_savepoint(tmp_path):
+    writer = KBWriter(tmp_path, durable=False)
+    with writer.batch():
+        writer.stage("kept.txt", "kept")
+        writer.stage_append("log.jsonl", "1\n")
+        with pytest.raises(RuntimeError):
+            with writer.batch():
+                writer.stage("kept.txt", "overwritten")
+                writer.stage("dropped.txt", "dropped")
+                writer.stage_append("log.jsonl", "2\n")
+                raise RuntimeError("injected")
+        assert writer.read_text("kept.txt") == "kept"
+        assert not writer.exists("dropped.txt")
+
+    assert _files(tmp_path) == sorted([GENERATION_FILE, "kept.txt", "log.jsonl"])
+    assert (tmp_path / "log.jsonl").read_text() == "1\n"
+    assert read_kb_generation(tmp_path) == 1
+
+
+def test_outer_failure_writes_nothing(tmp_path):
+    writer = KBWriter(tmp_path, durable=False)
+    with pytest.raises(RuntimeError):
+        with writer.batch():
+            writer.stage("a.txt", "a")
+            raise RuntimeError("injected")
+
+    assert _files(tmp_path) == []
+    assert read_kb_generation(tmp_path) == 0
+
+
+def _stage_three(writer):
+    writer.stage("a.txt", "new a")
+    writer.stage("sub/b.txt", "new b")
+    writer.stage_append("log.jsonl", "2\n")
+
+
+def _seed(tmp_path):
+    writer = KBWriter(tmp_path, durable=False)
+    with writer.batch():
+        writer.stage("a.txt", "old a")
+        writer.stage("sub/b.txt", "old b")
+        writer.stage_append("log.jsonl", "1\n")
+    return {name: (tmp_path / name).read_bytes() for name in _files(tmp_path)}
+
+
+def test_write_failure_keeps_kb_and_staging(tmp_path, monkeypatch):
+    before = _seed(tmp_path)
+    writer = KBWriter(tmp_path, durable=False)
+    write_file = KBWriter._write_file
+    calls = []
+
+    def fail_second(self, path, payload):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError("injected failure")
+        write_file(self, path, payload)
+    monkeypatch.setattr(KBWriter, '_write_file', fail_second)
+
+    with pytest.raises(OSError):
+        with writer.batch():
+            _stage_three(writer)
+
+    # 2つ目のファイルで失敗しても、KBは変わらずステージも残る
+    assert {name: (tmp_path / name).read_bytes() for name in _files(tmp_path)} == before
+    assert not [name for name in _files(tmp_path) if name.endswith(PENDING_SUFFIX)]
+    assert read_kb_generation(tmp_path) == 1
+    assert writer.pending == 3
+
+    # ステージが残っているので再度コミットできる
+    monkeypatch.setattr(KBWriter, '_write_file', write_file)
+    assert writer.commit() == ["a.txt", "log.jsonl", "sub/b.txt"]
+    assert (tmp_path / "a.txt").read_text() == "new a"
+    assert (tmp_path / "sub" / "b.txt").read_text() == "new b"
+    assert (tmp_path / "log.jsonl").read_text() == "1\n2\n"
+    assert read_kb_generation(tmp_path) == 2
+
+
+def test_interrupted_replace_is_completed_on_open(tmp_path, monkeypatch):
+    _seed(tmp_path)
+    writer = KBWriter(tmp_path, durable=False)
+    replace = os.replace
+    calls = []
+
+    def fail_second(src, dst):
+        calls.append(dst)
+        # ジャーナル自身の置き換えの後、2つ目のファイルの置き換えで止める
+        if len(calls) == 3:
+            raise OSError("injected failure")
+        replace(src, dst)
+    monkeypatch.setattr('src.kb_writer.os.replace', fail_second)
+
+    with pytest.raises(OSError):
+        with writer.batch():
+            _stage_three(writer)
+    assert (tmp_path / JOURNAL_FILE).exists()
+
+    monkeypatch.setattr('src.kb_writer.os.replace', replace)
+    KBWriter(tmp_path, durable=False)
+    assert not (tmp_path / JOURNAL_FILE).exists()
+    assert (tmp_path / "a.txt").read_text() == "new a"
+    assert (tmp_path / "sub" / "b.txt").read_text() == "new b"
+    assert (tmp_path / "log.jsonl").read_text() == "1\n2\n"
+    assert read_kb_generation(tmp_path) == 2
+    assert not [name for name in _files(tmp_path) if name.endswith(PENDING_SUFFIX)]
+
+
+def test_update_device_info_failure_writes_nothing(tmp_path, monkeypatch):
+    shutil.copytree(KB_DIR / "automation", tmp_path / "automation")
+    updater = NetworkRAGKnowledgeUpdater(str(tmp_path))
+    content = R1_CONFIG.read_text(encoding='utf-8')
+
+    first = updater.update_device_info(DeviceConfig("R1", "running_config", content, {}, datetime.now()))
+    assert first.success
+    generation = read_kb_generation(tmp_path)
+    before = {name: (tmp_path / name).read_bytes() for name in _files(tmp_path)}
+
+    # 装置ポリシー・テンプレートをステージした後のスナップショット保存で失敗させる
+    def fail(*args, **kwargs):
+        raise OSError("injected failure")
+    monkeypatch.setattr(updater.snapshot_store, 'put', fail)
+
+    changed = content.replace("hostname R1", "hostname R1\nntp server 192.0.2.1", 1)
+    result = updater.update_device_info(DeviceConfig("R1", "running_config", changed, {}, datetime.now()))
+
+    assert not result.success
+    assert "injected failure" in result.message
+    assert updater.writer.pending == 0
+    assert read_kb_generation(tmp_path) == generation
+    assert {name: (tmp_path / name).read_bytes() for name in _files(tmp_path)} == before
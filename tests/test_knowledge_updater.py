@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# test_knowledge_updater.py
+import io
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import knowledge_updater
+from knowledge_updater import DeviceConfig, NetworkRAGKnowledgeUpdater, OpenHandsKnowledgeUpdater
+from src.config_parser import config_fingerprint
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+R1_CONFIG = next((KB_DIR / "devices" / "device_configs").glob("R1_running_config_*.txt"))
+
+
+def _updater(tmp_path):
+    shutil.copytree(KB_DIR / "automation", tmp_path / "automation")
+    return NetworkRAGKnowledgeUpdater(str(tmp_path))
+
+
+def test_process_update_request_with_line_iterator(tmp_path, monkeypatch):
+    # OpenHands経由の処理（KBUpdaterによる実際の更新）を通す
+    monkeypatch.setattr(knowledge_updater, 'OPENHANDS_AVAILABLE', True)
+    kb_updater = _updater(tmp_path)
+    openhands_updater = OpenHandsKnowledgeUpdater(kb_updater)
+    content = R1_CONFIG.read_text(encoding='utf-8')
+
+    # 変更確認で読み終えた行イテレータが、そのまま更新に渡されないこと
+    device_config = DeviceConfig("R1", "running_config", io.StringIO(content), {}, datetime.now())
+    result = openhands_updater.process_update_request(device_config)
+
+    assert result.success
+    assert not result.unchanged
+    assert isinstance(device_config.config_content, str)
+    saved = kb_updater.snapshot_store.get(kb_updater.snapshot_store.latest("R1"))
+    assert config_fingerprint(saved) == config_fingerprint(content)
+    assert "hostname R1" in openhands_updater.create_update_prompt(device_config)
+
+    again = DeviceConfig("R1", "running_config", iter(content.splitlines()), {}, datetime.now())
+    assert openhands_updater.process_update_request(again).unchanged
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# test_llm_backend.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.llm_backend import HTTPLLMBackend, LLMBackendError, StubLLMServer
+
+
+def _backend(server, **kwargs):
+    options = {'max_retries': 3, 'backoff_base': 0.01, 'backoff_max': 0.05, 'timeout': 5.0}
+    options.update(kwargs)
+    return HTTPLLMBackend(server.url, **options)
+
+
+def test_retries_after_server_error():
+    with StubLLMServer(responder=lambda prompt: f"echo {prompt}", fail_first_n=2) as server:
+        backend = _backend(server)
+        try:
+            assert backend.generate("hostname R1") == "echo hostname R1"
+        finally:
+            backend.close()
+        assert len(server.requests) == 3
+
+
+def test_gives_up_after_max_retries():
+    with StubLLMServer(fail_first_n=10) as server:
+        backend = _backend(server, max_retries=1)
+        try:
+            with pytest.raises(LLMBackendError) as excinfo:
+                backend.generate("x")
+        finally:
+            backend.close()
+        assert excinfo.value.status == 503
+        assert len(server.requests) == 2
+
+
+def test_request_timeout():
+    with StubLLMServer(delay=1.0) as server:
+        backend = _backend(server, timeout=0.1, max_retries=0)
+        started = time.perf_counter()
+        try:
+            with pytest.raises(LLMBackendError) as excinfo:
+                backend.generate("x")
+        finally:
+            backend.close()
+        assert excinfo.value.retryable
+        assert time.perf_counter() - started < 0.9
+
+
+def test_in_flight_requests_stay_within_limit():
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def responder(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return prompt
+
+    with StubLLMServer(responder=responder) as server:
+        backend = _backend(server, max_concurrency=2)
+        threads = [threading.Thread(target=backend.generate, args=(str(i),)) for i in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            backend.close()
+        assert len(server.requests) == 8
+        assert peak[0] <= 2
+
+
+def test_astream_releases_slot_when_abandoned():
+    # 1チャンク0.02秒で200行（全体で約4秒）のストリームを1行だけ読んでやめる
+    text = "".join(f"line {i}\n" for i in range(200))
+
+    async def scenario(backend):
+        stream = backend.astream("x")
+        first = await stream.__anext__()
+        await stream.aclose()
+        started = time.perf_counter()
+        # 同時実行数1のスレッドプールが空いていれば、次の呼び出しはすぐに終わる
+        result = await backend.agenerate("y")
+        return first, result, time.perf_counter() - started
+
+    with StubLLMServer(responder=lambda prompt: text, delay=0.2) as server:
+        backend = _backend(server, max_concurrency=1)
+        try:
+            first, result, elapsed = asyncio.run(scenario(backend))
+        finally:
+            backend.close()
+
+    assert first == "line 0\n"
+    assert result == text
+    assert elapsed < 2.0
+
+
+def test_astream_reads_whole_stream():
+    text = "hostname R1\ninterface Gi0/0\n"
+
+    async def collect(backend):
+        return [chunk async for chunk in backend.astream("x")]
+
+    with StubLLMServer(responder=lambda prompt: text) as server:
+        backend = _backend(server, max_concurrency=1)
+        try:
+            assert asyncio.run(collect(backend)) == ["hostname R1\n", "interface Gi0/0\n"]
+            assert backend.generate("y") == text
+        finally:
+            backend.close()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# test_llm_cache.py
+import asyncio
+
+from src.llm_backend import HTTPLLMBackend, StubLLMServer
+from src.llm_cache import CachedLLMBackend, LLMResponseCache
+
+
+def test_cached_backend_calls_server_once(tmp_path):
+    db_path = str(tmp_path / "llm.db")
+    with StubLLMServer(responder=lambda prompt: f"echo {prompt}\n") as server:
+        backend = CachedLLMBackend(HTTPLLMBackend(server.url, max_retries=0), LLMResponseCache(db_path))
+        try:
+            assert backend.generate("hostname R1") == "echo hostname R1\n"
+            assert backend.generate("hostname R1") == "echo hostname R1\n"
+            # パラメータが違えば別のエントリ
+            assert backend.generate("hostname R1", temperature=0.5) == "echo hostname R1\n"
+            assert list(backend.stream("hostname R1")) == ["echo hostname R1\n"]
+            assert asyncio.run(backend.agenerate("hostname R1")) == "echo hostname R1\n"
+        finally:
+            backend.close()
+        assert len(server.requests) == 2
+
+        # 再起動後もディスクのエントリを使う
+        backend = CachedLLMBackend(HTTPLLMBackend(server.url, max_retries=0), LLMResponseCache(db_path))
+        try:
+            assert backend.generate("hostname R1") == "echo hostname R1\n"
+            assert backend.cache.get_stats()['entries'] == 2
+        finally:
+            backend.close()
+        assert len(server.requests) == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('src.llm_cache.time.time', lambda: now[0])
+    cache = LLMResponseCache(ttl_seconds=60)
+    cache.put("a", "response a")
+    cache.put("b", "response b")
+
+    now[0] += 30
+    assert cache.get("a") == "response a"
+    now[0] += 31
+    assert cache.get("a") is None
+    assert cache.purge_expired() == 1
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expired'], stats['entries']) == (1, 1, 2, 0)
+    cache.close()
+
+
+def test_evicts_least_recently_used(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('src.llm_cache.time.time', lambda: now[0])
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=None)
+    cache.put("a", "1")
+    now[0] += 1
+    cache.put("b", "2")
+    now[0] += 1
+    # 参照した a は最終アクセスが新しくなり、追い出されない
+    assert cache.get("a") == "1"
+    now[0] += 1
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.get_stats()['evictions'] == 1
+    cache.close()
+
+
+def test_evicts_by_total_bytes():
+    cache = LLMResponseCache(max_bytes=10, ttl_seconds=None)
+    cache.put("a", "x" * 6)
+    cache.put("b", "y" * 6)
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 1
+    assert stats['total_bytes'] == 6
+    assert cache.get("b") == "y" * 6
+    cache.close()
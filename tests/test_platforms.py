@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# test_platforms.py
+import pytest
+
+from src.platforms import PLATFORMS, detect_platform, get_platform
+
+NXOS_HEADER = """!Command: show running-config
+!Running configuration last done at: Mon Aug 11 10:00:00 2025
+version 10.2(3) Bios:version 05.47
+hostname N9K-1
+feature ospf
+feature interface-vlan
+vrf context management
+"""
+
+XR_HEADER = """!! IOS XR Configuration 7.5.2
+!! Last configuration change at Mon Aug 11 10:00:00 2025 by admin
+!
+hostname XR1
+interface Bundle-Ether1
+ ipv4 address 10.0.0.1 255.255.255.252
+!
+router static
+"""
+
+ASA_HEADER = """: Saved
+:
+ASA Version 9.16(3)
+!
+hostname ASA1
+interface GigabitEthernet0/0
+ nameif outside
+ security-level 0
+"""
+
+IOS_HEADER = """Current configuration : 1024 bytes
+!
+version 15.2
+hostname R1
+"""
+
+
+@pytest.mark.parametrize("config, expected", [
+    (NXOS_HEADER, 'nx_os'),
+    (XR_HEADER, 'ios_xr'),
+    (ASA_HEADER, 'ftd'),
+    (IOS_HEADER, 'ios'),
+    ("version 17.9\nhostname R1\n", 'ios_xe'),
+    ("hostname R1\n", 'ios'),
+])
+def test_detect_from_header(config, expected):
+    assert detect_platform(config).name == expected
+    # 行イテレータでも同じ判定になり、読んだ行は戻される
+    plugin, lines = PLATFORMS.detect_lines(config.splitlines())
+    assert plugin.name == expected
+    assert list(lines) == config.splitlines()
+
+
+def test_nxos_version_10_is_not_ios():
+    # NX-OS 10.x の version 行だけでも IOS と同点にならない
+    config = "version 10.3(1)\nhostname N9K-2\n"
+
+    assert PLATFORMS.fingerprint(config) == {'nx_os': 3}
+    assert detect_platform(config).name == 'nx_os'
+    assert detect_platform("version 10.3\nhostname R1\n").name == 'ios'
+
+
+def test_device_type_overrides_header():
+    assert detect_platform(IOS_HEADER, 'cisco_nxos_ssh').name == 'nx_os'
+    assert detect_platform(NXOS_HEADER, 'cisco_asa').name == 'ftd'
+    assert get_platform('IOS-XR').name == 'ios_xr'
+    assert get_platform('unknown') is None
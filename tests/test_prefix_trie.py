@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# test_prefix_trie.py
+import random
+
+from src.ipaddr import ip_to_int, network_address
+from src.knowledge_base import KnowledgeBase
+from src.prefix_trie import PrefixTrie
+
+
+def _brute_matches(prefixes, address, prefix_len):
+    """address/prefix_len を包含するプレフィックス（短い順）"""
+    return sorted(
+        (network, length) for network, length in prefixes
+        if length <= prefix_len and network_address(address, length) == network
+    )
+
+
+def _random_prefixes(rng, count):
+    prefixes = set()
+    while len(prefixes) < count:
+        length = rng.choice([0, 8, 12, 16, 20, 23, 24, 25, 30, 32])
+        address = ip_to_int('10.0.0.0') + rng.randrange(1 << 20)
+        prefixes.add((network_address(address, length), length))
+    return sorted(prefixes)
+
+
+def test_longest_match_examples():
+    trie = PrefixTrie()
+    trie.insert(ip_to_int('10.0.0.0'), 8, 'core')
+    trie.insert(ip_to_int('10.1.0.0'), 16, 'site')
+    trie.insert(ip_to_int('10.1.2.0'), 24, 'lan')
+    trie.insert(ip_to_int('10.1.2.1'), 32, 'gateway')
+
+    assert trie.longest_match(ip_to_int('10.1.2.1')).values == ['gateway']
+    assert trie.longest_match(ip_to_int('10.1.2.9')).prefix == '10.1.2.0/24'
+    assert trie.longest_match(ip_to_int('10.1.9.9')).prefix == '10.1.0.0/16'
+    assert trie.longest_match(ip_to_int('10.9.9.9')).prefix == '10.0.0.0/8'
+    assert trie.longest_match(ip_to_int('192.168.0.1')) is None
+    # プレフィックスで問い合わせた場合はそれを包含するものだけが一致する
+    assert trie.longest_match(ip_to_int('10.1.0.0'), 15).prefix == '10.0.0.0/8'
+    assert [match.prefix for match in trie.covered(ip_to_int('10.1.0.0'), 16)] == ['10.1.2.0/24', '10.1.2.1/32']
+    assert len(trie) == 4
+
+
+def test_matches_brute_force():
+    rng = random.Random(43)
+    prefixes = _random_prefixes(rng, 300)
+    trie = PrefixTrie()
+    for network, length in rng.sample(prefixes, len(prefixes)):
+        trie.insert(network, length, (network, length))
+
+    for _ in range(500):
+        address = ip_to_int('10.0.0.0') + rng.randrange(1 << 20)
+        prefix_len = rng.choice([16, 24, 28, 32])
+        expected = _brute_matches(prefixes, address, prefix_len)
+        found = [(match.network, match.prefix_len) for match in trie.matches(address, prefix_len)]
+        assert found == expected
+        longest = trie.longest_match(address, prefix_len)
+        assert (longest and (longest.network, longest.prefix_len)) == (expected[-1] if expected else None)
+
+        query = network_address(address, prefix_len)
+        covered = [(match.network, match.prefix_len) for match in trie.covered(address, prefix_len)]
+        assert covered == sorted(
+            (network, length) for network, length in prefixes
+            if length > prefix_len and network_address(network, prefix_len) == query
+        )
+
+
+def test_duplicate_prefix_keeps_all_values():
+    trie = PrefixTrie()
+    trie.insert(ip_to_int('10.0.0.1'), 24, 'R1')
+    trie.insert(ip_to_int('10.0.0.2'), 24, 'R2')
+    assert len(trie) == 1
+    assert trie.longest_match(ip_to_int('10.0.0.99')).values == ['R1', 'R2']
+
+
+def test_knowledge_base_lookup_address(tmp_path):
+    configs_dir = tmp_path / "devices" / "device_configs"
+    configs_dir.mkdir(parents=True)
+    (configs_dir / "R1_running_config_2025-01-01.txt").write_text(
+        "hostname R1\n"
+        "interface GigabitEthernet0/0\n"
+        " ip address 10.0.0.1 255.255.255.0\n"
+        " standby 1 ip 10.0.0.254\n"
+        "interface GigabitEthernet0/1\n"
+        " ip address 10.2.0.1 255.255.255.252\n",
+        encoding='utf-8'
+    )
+    (configs_dir / "R2_running_config_2025-01-01.txt").write_text(
+        "hostname R2\n"
+        "interface GigabitEthernet0/0\n"
+        " ip address 10.0.0.2 255.255.255.0\n",
+        encoding='utf-8'
+    )
+    kb = KnowledgeBase(str(tmp_path))
+
+    assert kb.lookup_address('10.0.0.2').device_names == ['R2']
+    subnet = kb.lookup_address('10.0.0.77')
+    assert subnet.matched_prefix == '10.0.0.0/24'
+    assert sorted(subnet.device_names) == ['R1', 'R2']
+    assert kb.lookup_address('10.0.0.254').owners[0].kind == 'hsrp'
+    summary = kb.lookup_address('10.2.0.0/16')
+    assert summary.matched_prefix is None
+    assert summary.device_names == ['R1']
+    assert kb.lookup_address('not-an-address') is None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# test_rule_compiler.py
+from src.rule_compiler import compile_validation_rules
+from src.validation import ConfigValidator
+
+RULES = {
+    'validation_rules': {
+        'subnet_validation': [
+            {'min_prefix': 16, 'message': "Prefix too short", 'severity': 'error'},
+            {'min_prefix': 24, 'message': "Prefix shorter than /24"},
+        ],
+        'ospf_validation': [
+            {'required_areas': [0], 'message': "Area 0 is required"},
+        ],
+        'device_validation': {
+            'router': [
+                {'required_interfaces': ["Loopback0"], 'message': "Router required interfaces missing"},
+                {'required_interfaces': ["GigabitEthernet0/0"], 'message': "Uplink missing"},
+            ],
+        },
+    }
+}
+
+CONFIG = """hostname R1
+interface GigabitEthernet0/1
+ ip address 10.0.0.1 255.0.0.0
+interface GigabitEthernet0/2
+ ip address 10.1.0.1/20
+router ospf 1
+ network 10.0.0.0 0.255.255.255 area 1
+"""
+
+
+def test_rule_names_are_unique_per_entry():
+    compiled = compile_validation_rules(RULES)
+    names = [rule.name for rule in compiled.rules_for('router')]
+
+    assert names == [
+        'subnet_validation[0].prefix_range',
+        'subnet_validation[1].prefix_range',
+        'ospf_validation[0].required_areas',
+        'device_validation.router[0].required_interfaces',
+        'device_validation.router[1].required_interfaces',
+    ]
+    assert len(compiled) == 5
+
+
+def test_compiled_rules_errors_and_warnings():
+    validator = ConfigValidator(rules=[], compiled_rules=compile_validation_rules(RULES))
+    result = validator.validate(CONFIG, device_type='ルーター')
+
+    assert not result['is_valid']
+    assert result['errors'] == ["Prefix too short: 10.0.0.1/8"]
+    assert result['warnings'] == [
+        "Prefix shorter than /24: 10.0.0.1/8",
+        "Prefix shorter than /24: 10.1.0.1/20",
+        "Area 0 is required: area 0",
+        "Router required interfaces missing: Loopback0",
+        "Uplink missing: GigabitEthernet0/0",
+    ]
+    rules = result['validation_rules']
+    assert rules['subnet_validation[0].prefix_range']['violations'] == ["10.0.0.1/8"]
+    assert rules['subnet_validation[1].prefix_range']['violations'] == ["10.0.0.1/8", "10.1.0.1/20"]
+
+
+def test_device_rules_only_for_matching_type():
+    validator = ConfigValidator(rules=[], compiled_rules=compile_validation_rules(RULES))
+    result = validator.validate(CONFIG, device_type='switch')
+
+    assert not any(name.startswith('device_validation') for name in result['validation_rules'])
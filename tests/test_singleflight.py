@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# test_singleflight.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.singleflight import SingleFlight
+
+
+def test_do_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+    lock = threading.Lock()
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return "config"
+
+    def caller():
+        result = flight.do("R1", work)
+        with lock:
+            results.append(result)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    assert started.wait(timeout=5)
+    followers = [threading.Thread(target=caller) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    # 後続の呼び出しがすべて待機に入るまで待ってから先行呼び出しを終わらせる
+    while flight.get_stats()['shared'] < 7:
+        time.sleep(0.001)
+    release.set()
+    leader.join(timeout=5)
+    for thread in followers:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("config", False)] + [("config", True)] * 7
+    assert flight.get_stats() == {'executions': 1, 'shared': 7, 'in_flight': 0}
+
+
+def test_do_shares_errors_and_runs_again_afterwards():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError("render failed")
+
+    def caller():
+        try:
+            flight.do("R1", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    assert started.wait(timeout=5)
+    follower = threading.Thread(target=caller)
+    follower.start()
+    while flight.get_stats()['shared'] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    # 完了後の呼び出しは新たに実行される
+    assert flight.do("R1", lambda: "ok") == ("ok", False)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("R1", lambda: 1) == (1, False)
+    assert flight.do("R2", lambda: 2) == (2, False)
+    assert flight.get_stats()['executions'] == 2
+
+
+def test_ado_coalesces_on_one_loop():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "config"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("R1", work) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(results) == [("config", False)] + [("config", True)] * 4
+
+
+def test_ado_propagates_error():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("R1", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.ado("R1", fail))
+    assert flight.get_stats()['in_flight'] == 0
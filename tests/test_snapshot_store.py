@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# test_snapshot_store.py
+import random
+from datetime import datetime, timedelta
+
+from src.kb_writer import KBWriter
+from src.snapshot_store import DELTA_SUFFIX, FULL_SUFFIX, SnapshotStore, apply_delta, encode_delta
+
+START = datetime(2025, 1, 1)
+
+
+def _config(revision: int, lines: int = 200) -> str:
+    body = [f"interface GigabitEthernet0/{i}\n description port {i}" for i in range(lines)]
+    body[revision % lines] += f"\n description rev {revision}"
+    return "hostname R1\n" + "\n".join(body)
+
+
+def test_delta_round_trip():
+    rng = random.Random(0)
+    words = ["a", "b", "c", "d", ""]
+    for _ in range(200):
+        old = [rng.choice(words) for _ in range(rng.randint(0, 15))]
+        new = [rng.choice(words) for _ in range(rng.randint(0, 15))]
+        assert apply_delta(old, encode_delta(old, new)) == new
+
+
+def test_delta_chain_round_trips_at_limit(tmp_path):
+    store = SnapshotStore(tmp_path, delta=True, max_delta_chain=3)
+    contents = [_config(revision) for revision in range(9)]
+    records = [store.put("R1", "running_config", content, timestamp=START + timedelta(days=i))
+               for i, content in enumerate(contents)]
+
+    # 本文1つと差分3つの連鎖を繰り返す
+    suffixes = [store.object_path(record.hash).suffix for record in records]
+    assert suffixes == [FULL_SUFFIX, DELTA_SUFFIX, DELTA_SUFFIX, DELTA_SUFFIX] * 2 + [FULL_SUFFIX]
+    assert max(store._delta_depth(record.hash) for record in records) == 3
+    for record, content in zip(records, contents):
+        assert store.get(record) == content
+
+    stats = store.stats()
+    assert stats['objects'] == len(contents)
+    assert stats['delta_objects'] == 6
+
+
+def test_put_deduplicates_and_at_latest(tmp_path):
+    store = SnapshotStore(tmp_path)
+    first = store.put("R1", "running_config", _config(1), timestamp=START)
+    again = store.put("R1", "running_config", _config(1), timestamp=START + timedelta(days=1))
+    second = store.put("R1", "running_config", _config(2), timestamp=START + timedelta(days=2))
+
+    assert again == first
+    assert len(store.timeline("R1")) == 2
+    assert store.latest("R1") == second
+    assert store.at("R1", START + timedelta(days=1)) == first
+    assert store.at("R1", START - timedelta(days=1)) is None
+    assert store.latest("R1", "startup_config") is None
+    assert store.devices() == ["R1"]
+
+
+def test_writer_stages_until_commit(tmp_path):
+    writer = KBWriter(tmp_path)
+    store = SnapshotStore(tmp_path / "store", delta=True, writer=writer)
+
+    with writer.batch():
+        first = store.put("R1", "running_config", _config(1), timestamp=START)
+        second = store.put("R1", "running_config", _config(2), timestamp=START + timedelta(days=1))
+        # コミット前もステージした内容を読める
+        assert store.get(second) == _config(2)
+        assert not store.timeline_path("R1").exists()
+        # 一覧・件数もステージ済みのタイムラインを含む
+        store.put("R2", "startup_config", _config(3), timestamp=START)
+        assert store.devices() == ["R1", "R2"]
+        assert store.devices("startup_config") == ["R2"]
+        assert store.stats()['snapshots'] == 3
+
+    assert [record.hash for record in store.timeline("R1")] == [first.hash, second.hash]
+    assert SnapshotStore(tmp_path / "store").get(second) == _config(2)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# test_validation.py
+import io
+import re
+from pathlib import Path
+
+import pytest
+
+from src.config_parser import parse_config_tree
+from src.ipaddr import is_private_ip
+from src.validation import ConfigValidator, LineChunk
+
+KB_DIR = Path(__file__).resolve().parent.parent / "knowledge-base"
+CONFIGS = sorted((KB_DIR / "devices" / "device_configs").glob("*_running_config_*.txt"))
+
+SAMPLE = """hostname R1
+!
+interface GigabitEthernet0/0
+ ip address 10.0.0.1/24
+ ip address 203.0.113.1/24 secondary
+interface GigabitEthernet0/1
+ ip address 192.168.1.1 255.255.255.0
+router ospf 1
+ network 10.0.0.0/24 area 0
+ network 192.168.1.0/24 area 10
+"""
+
+
+def legacy_validate_config(config_content: str):
+    """分割前の NetworkConfigGenerator._validate_config（比較用）"""
+    result = {'is_valid': True, 'errors': [], 'warnings': [], 'validation_rules': {}}
+
+    for line in config_content.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('!') and not line.startswith('interface'):
+            if not re.match(r'^\w+(\s+\S+)*$', line):
+                result['is_valid'] = False
+                result['errors'].append("Invalid configuration syntax")
+                break
+
+    ip_validation = {'is_valid': True, 'errors': [], 'warnings': [], 'ip_addresses': []}
+    for ip in re.findall(r'ip address (\d+\.\d+\.\d+\.\d+/\d+)', config_content):
+        ip_validation['ip_addresses'].append(ip)
+        if not is_private_ip(ip):
+            ip_validation['warnings'].append(f"Public IP address detected: {ip}")
+    result['validation_rules']['ip_validation'] = ip_validation
+
+    ospf_validation = {'is_valid': True, 'errors': [], 'warnings': [], 'areas': []}
+    for network, area in re.findall(r'network (\d+\.\d+\.\d+\.\d+/\d+) area (\d+)', config_content):
+        ospf_validation['areas'].append({'network': network, 'area': area})
+        if area == '0':
+            ospf_validation['warnings'].append(f"Network {network} is in Area 0 (backbone)")
+    result['validation_rules']['ospf_validation'] = ospf_validation
+    return result
+
+
+def _samples():
+    return [SAMPLE, SAMPLE + "bad-command here\n", "  \n!\n"] + [
+        path.read_text(encoding='utf-8') for path in CONFIGS
+    ]
+
+
+@pytest.mark.parametrize("config", _samples())
+def test_matches_legacy_validate_config(config):
+    expected = legacy_validate_config(config)
+    for source in (config, io.StringIO(config), parse_config_tree(config)):
+        result = ConfigValidator().validate(source)
+        timings = result.pop('rule_timings')
+        assert result == expected
+        assert set(timings) == {'syntax', 'ip_validation', 'ospf_validation'}
+        assert all(elapsed >= 0 for elapsed in timings.values())
+
+
+def test_chunk_keyword_index():
+    chunk = LineChunk(SAMPLE.split('\n'), 1, None)
+
+    assert chunk.words[3] == ('ip', 'address 10.0.0.1/24')
+    assert chunk.words[1] == ('!', '')
+    assert chunk.select(['network']) == [8, 9]
+    assert chunk.select(['router', 'interface']) == [2, 5, 7]
+    assert chunk.select(['vlan']) == []
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# test_validation_cache.py
+from src.build_cache import BuildCache
+from src.validation_cache import ValidationCache
+
+RESULT = {'is_valid': True, 'errors': [], 'warnings': []}
+
+
+def test_rules_change_discards_only_old_partitions(tmp_path):
+    unrelated = tmp_path / "keepme"
+    unrelated.mkdir()
+    (unrelated / "data.txt").write_text("keep")
+
+    cache = ValidationCache(str(tmp_path))
+    key = ValidationCache.make_key("content-hash", "router")
+    cache.put("a" * 64, key, RESULT)
+    assert cache.get("a" * 64, key) == RESULT
+
+    cache.put("b" * 64, key, RESULT)
+    partitions = [path.name for path in (tmp_path / "validation").iterdir()]
+    assert partitions == ["rules-" + "b" * 16]
+    assert (unrelated / "data.txt").read_text() == "keep"
+    assert ValidationCache(str(tmp_path)).get("a" * 64, key) is None
+
+
+def test_shared_build_cache_dir_survives(tmp_path):
+    build_cache = BuildCache(str(tmp_path))
+    build_cache.put("build-key", {'config': 'hostname R1'})
+    before = sorted(path.relative_to(tmp_path) for path in tmp_path.rglob("*") if path.is_file())
+
+    cache = ValidationCache(str(tmp_path))
+    cache.put("c" * 64, ValidationCache.make_key("content-hash"), RESULT)
+    cache.put("d" * 64, ValidationCache.make_key("content-hash"), RESULT)
+
+    after = sorted(path.relative_to(tmp_path) for path in tmp_path.rglob("*") if path.is_file())
+    assert set(before) <= set(after)
+    assert BuildCache(str(tmp_path)).get("build-key") == {'config': 'hostname R1'}